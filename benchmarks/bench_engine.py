@@ -0,0 +1,96 @@
+# Benchmark the native discovery engine against the ffuf/gobuster subprocess path.
+#
+#   python3 benchmarks/bench_engine.py --words 20000 --connections 50
+#
+# A local keep-alive HTTP server answers 200 for every tenth word and 404 for the rest.
+# Each run happens in a child process so its peak RSS can be read from wait4().
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class BenchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    found = set()
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this Nagle stalls every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        status = 200 if self.path.lstrip("/") in self.found else 404
+        body = f"<html><body>{status} {self.path}</body></html>".encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BenchHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def measure(command, cwd):
+    started = time.monotonic()
+    process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return time.monotonic() - started, usage.ru_maxrss, process.returncode
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the native discovery engine.")
+    parser.add_argument("--words", type=int, default=20000, help="Number of wordlist entries to request.")
+    parser.add_argument("--connections", type=int, default=50, help="Connections / threads for every engine.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="webscan-bench-")
+    wordlist = os.path.join(workdir, "words.txt")
+    with open(wordlist, "w") as output:
+        for index in range(args.words):
+            output.write(f"word{index}\n")
+    BenchHandler.found = {f"word{index}" for index in range(0, args.words, 10)}
+
+    server = start_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    native = [sys.executable, "-c",
+              "import sys; sys.path.insert(0, sys.argv[1]); import webscan; "
+              "webscan.run_native_discovery(sys.argv[2], 'bench', 0, sys.argv[3], 'gobuster', sys.argv[4], int(sys.argv[5]))",
+              REPO_DIR, url, workdir, wordlist, str(args.connections)]
+    runs = [("native", native)]
+
+    if shutil.which("ffuf"):
+        runs.append(("ffuf", ["ffuf", "-u", f"{url}/FUZZ", "-w", wordlist, "-t", str(args.connections), "-s"]))
+    if shutil.which("gobuster"):
+        runs.append(("gobuster", ["gobuster", "dir", "-q", "-u", url, "-w", wordlist, "-t", str(args.connections)]))
+
+    print(f"{'engine':<10} {'requests':>9} {'seconds':>8} {'req/s':>8} {'peak RSS':>10}")
+    for name, command in runs:
+        elapsed, max_rss, returncode = measure(command, workdir)
+        rate = args.words / elapsed if elapsed else 0
+        note = "" if returncode == 0 else f"  (exit {returncode})"
+        print(f"{name:<10} {args.words:>9} {elapsed:>8.2f} {rate:>8.0f} {max_rss / 1024:>8.1f}MB{note}")
+
+    for name in ("ffuf", "gobuster"):
+        if not shutil.which(name):
+            print(f"{name:<10} not installed, skipped")
+
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# End-to-end benchmark of a full webscan run against a local stand-in target, with fake binaries for the external tools.
+#
+#   python3 benchmarks/bench_scan.py --scenario baseline --scenario latency --words 2000 --compare
+#
+# Every scenario starts target_server.py with its own options, builds a scratch HOME with generated wordlists and a
+# PATH of shims that run fake_tools.py, and runs webscan.py --profile in it. Each run appends one JSON line with the
+# per-stage timings to benchmarks/results.jsonl, tagged with `git describe`, so --compare can show how the current tree
+# does against the last run of an older version and --fail-on-regression can gate on it.
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS = os.path.join(BENCH_DIR, "results.jsonl")
+TOOLS = ["nmap", "whatweb", "ffuf", "gobuster", "feroxbuster", "eyewitness", "aquatone"]
+
+sys.path.insert(0, BENCH_DIR)
+from target_server import TREE_FILE, site_layout, tree_names, word_names  # noqa: E402
+
+# Options of target_server.py for each scenario, whether the target is a domain (so the subdomain and vhost stages run),
+# and the options of dns_stub.py that subdomains are resolved against
+SCENARIOS = {
+    "baseline": {"server": [], "domain": False},
+    "latency": {"server": ["--latency", "20", "--jitter", "5"], "domain": False},
+    "wildcard": {"server": ["--wildcard"], "domain": False},
+    "vhosts": {"server": ["--vhosts", "dev,admin,staging"], "domain": True, "dns": ["--names", "dev,admin,staging", "--wildcard", "127.0.0.2"]},
+    "ratelimit": {"server": ["--rate", "300"], "domain": False},
+    "deep": {"server": ["--depth", "3", "--fanout", "2"], "domain": False},
+}
+
+def git_version():
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=REPO_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        return result.stdout.strip() if result.returncode == 0 else ""
+    return git("describe", "--tags", "--always", "--dirty"), git("rev-parse", "HEAD")
+
+def build_home(root, words, fanout):
+    # Wordlists where webscan expects them; the site only has pages for names that are in them
+    wordlists = os.path.join(root, ".local", "bin", "wordlists")
+    os.makedirs(wordlists)
+    names = word_names(words)
+    tree = tree_names(fanout) + [TREE_FILE]
+    contents = {
+        "common.txt": tree + names[:words // 4],
+        "big.txt": names[:words // 2],
+        "directory-list-2.3-medium.txt": names,
+        "dnslist.txt": ["www", "mail", "dev", "admin", "staging", "test", "api", "beta", "portal", "vpn"] + [f"host{index}" for index in range(words // 10)],
+    }
+    for name, entries in contents.items():
+        with open(os.path.join(wordlists, name), "w") as output:
+            output.writelines(f"{entry}\n" for entry in entries)
+
+    bin_dir = os.path.join(root, "bin")
+    os.makedirs(bin_dir)
+    for tool in TOOLS:
+        shim = os.path.join(bin_dir, tool)
+        with open(shim, "w") as output:
+            output.write(f"#!/bin/sh\nexec {sys.executable} {os.path.join(BENCH_DIR, 'fake_tools.py')} {tool} \"$@\"\n")
+        os.chmod(shim, 0o755)
+
+    scan_dir = os.path.join(root, "scan")
+    os.makedirs(scan_dir)
+    return bin_dir, scan_dir
+
+def start_server(script, options):
+    server = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, script), *options],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    line = server.stdout.readline()
+    if not line.startswith("listening on "):
+        server.kill()
+        raise RuntimeError(f"{script} did not start")
+    return server, int(line.split()[-1])
+
+def measure(command, cwd, env, timeout):
+    started = time.monotonic()
+    log = open(os.path.join(cwd, "webscan.log"), "w")
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                               start_new_session=True)
+    deadline = started + timeout
+    while True:
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            break
+        if time.monotonic() > deadline:
+            # Take the fake tools down with it
+            os.killpg(process.pid, 9)
+            _, status, usage = os.wait4(process.pid, 0)
+            break
+        time.sleep(0.05)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    log.close()
+    return time.monotonic() - started, usage.ru_maxrss * 1024, process.returncode
+
+def run_scenario(name, args):
+    scenario = SCENARIOS[name]
+    server_options = ["--words", str(args.words), *scenario["server"]]
+    def option(flag, default):
+        return int(server_options[server_options.index(flag) + 1]) if flag in server_options else default
+    depth, fanout = option("--depth", 0), option("--fanout", 2)
+    server, port = start_server("target_server.py", server_options)
+    dns_server = None
+    webscan_args = list(args.webscan_args)
+    if "dns" in scenario:
+        dns_server, dns_port = start_server("dns_stub.py", scenario["dns"])
+        webscan_args += ["--nameserver", f"127.0.0.1:{dns_port}"]
+    root = tempfile.mkdtemp(prefix=f"webscan-bench-{name}-")
+    try:
+        bin_dir, scan_dir = build_home(root, args.words, fanout)
+        env = dict(os.environ, HOME=root, PATH=f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+                   BENCH_CONNECT=f"127.0.0.1:{port}")
+        host = "localhost" if scenario["domain"] else "127.0.0.1"
+        command = [sys.executable, os.path.join(REPO_DIR, "webscan.py"), f"http://{host}:{port}", "--profile", ".", "--fresh",
+                   "-j", str(args.jobs), "--engine", args.engine, *webscan_args]
+        wall, max_rss, exit_code = measure(command, scan_dir, env, args.timeout)
+
+        stages = {}
+        profile_path = os.path.join(scan_dir, "webscan-profile.json")
+        if os.path.exists(profile_path):
+            with open(profile_path) as profile:
+                for stage in json.load(profile)["stages"]:
+                    rate = stage["requests"] / stage["wall"] if stage["wall"] else 0
+                    stages[stage["stage"]] = {"status": stage["status"], "wall": stage["wall"], "requests": stage["requests"],
+                                              "requests_per_second": round(rate, 1), "hits": stage["hits"]}
+        urls = 0
+        url_file = os.path.join(scan_dir, f"webscan-urls-{host}-{port}.md")
+        if os.path.exists(url_file):
+            with open(url_file) as found:
+                urls = sum(1 for line in found if line.strip())
+        if args.keep:
+            print(f"  {name}: scratch directory kept at {root}")
+    finally:
+        for process in (server, dns_server):
+            if process:
+                process.terminate()
+                process.wait()
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    # Every page but the home page is a URL the scan can find
+    return {"scenario": name, "engine": args.engine, "words": args.words, "expected_pages": len(site_layout(args.words, depth, fanout)) - 1,
+            "wall": round(wall, 3), "max_rss": max_rss, "exit_code": exit_code, "urls": urls, "stages": stages}
+
+def load_results():
+    if not os.path.exists(RESULTS):
+        return []
+    with open(RESULTS) as results:
+        return [json.loads(line) for line in results if line.strip()]
+
+def previous_result(history, record):
+    # The last run of the same scenario, engine and size from another version of the tree
+    for earlier in reversed(history):
+        if (earlier["scenario"], earlier["engine"], earlier["words"]) == (record["scenario"], record["engine"], record["words"]) \
+                and earlier["version"] != record["version"]:
+            return earlier
+    return None
+
+def compare(record, earlier, threshold):
+    # Lines describing the change against earlier, and whether the run or any stage got slower by more than threshold
+    def change(new, old):
+        return (new - old) / old if old else 0.0
+
+    regressed = False
+    run_change = change(record["wall"], earlier["wall"])
+    regressed |= run_change > threshold
+    lines = [f"  {record['scenario']}: {earlier['wall']:.2f}s ({earlier['version']}) -> {record['wall']:.2f}s ({run_change:+.0%})"
+             + ("  REGRESSION" if run_change > threshold else "")]
+    for stage, stats in record["stages"].items():
+        old = earlier["stages"].get(stage)
+        if not old or not old["wall"] or stats["wall"] is None:
+            continue
+        stage_change = change(stats["wall"], old["wall"])
+        # Stages under a second are mostly scheduling noise
+        slower = stage_change > threshold and stats["wall"] - old["wall"] > 1.0
+        regressed |= slower
+        if slower or (abs(stage_change) > threshold and abs(stats["wall"] - old["wall"]) > 0.1):
+            lines.append(f"    {stage:<20} {old['wall']:>7.2f}s -> {stats['wall']:>7.2f}s ({stage_change:+.0%})" + ("  REGRESSION" if slower else ""))
+    if record["urls"] < earlier["urls"]:
+        regressed = True
+        lines.append(f"    found {record['urls']} URLs, {earlier['urls']} before  REGRESSION")
+    return lines, regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full webscan runs against a local stand-in target.")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Scenario to run; repeat for several (default: all).")
+    parser.add_argument("--words", type=int, default=2000, help="Entries in the largest generated wordlist.")
+    parser.add_argument("--engine", choices=["external", "native"], default="external", help="webscan --engine to benchmark.")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="webscan --jobs.")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds before a run is killed.")
+    parser.add_argument("--compare", action="store_true", help="Compare every run with the last run of another version in the results file.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown that counts as a regression (default: 0.2, i.e. 20%%).")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when --compare finds a regression.")
+    parser.add_argument("--no-record", dest="record", action="store_false", help=f"Do not append the runs to {os.path.relpath(RESULTS, REPO_DIR)}.")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directories for inspection.")
+    parser.add_argument("webscan_args", nargs="*", help="Extra webscan options, after --.")
+    args = parser.parse_args()
+
+    version, commit = git_version()
+    history = load_results()
+    regressions = 0
+    print(f"{'scenario':<10} {'seconds':>8} {'peak RSS':>10} {'URLs':>6} {'pages':>6}  slowest stages")
+    for name in args.scenario or list(SCENARIOS):
+        record = {"version": version, "commit": commit, "timestamp": datetime.now().isoformat(timespec='seconds'), **run_scenario(name, args)}
+        slowest = sorted(((stats["wall"] or 0, stage) for stage, stats in record["stages"].items()), reverse=True)[:3]
+        note = "" if record["exit_code"] == 0 else f"  (exit {record['exit_code']})"
+        print(f"{name:<10} {record['wall']:>8.2f} {record['max_rss'] / 1048576:>8.1f}MB {record['urls']:>6} {record['expected_pages']:>6}  "
+              + ", ".join(f"{stage} {wall:.1f}s" for wall, stage in slowest) + note)
+        if args.compare:
+            earlier = previous_result(history, record)
+            if earlier:
+                lines, regressed = compare(record, earlier, args.threshold)
+                regressions += regressed
+                print("\n".join(lines))
+            else:
+                print(f"  {name}: no earlier version to compare with")
+        if args.record:
+            with open(RESULTS, "a") as results:
+                results.write(json.dumps(record) + "\n")
+            history.append(record)
+
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
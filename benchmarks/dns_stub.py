@@ -0,0 +1,89 @@
+# Stub authoritative DNS server for the webscan benchmarks: answers A queries for a fixed set of names under one domain,
+# optionally every other name with a wildcard address, and NXDOMAIN with an SOA record for the rest.
+#
+#   python3 benchmarks/dns_stub.py --domain localhost --names dev,admin,staging --wildcard 127.0.0.2
+#
+# Point webscan at it with --nameserver 127.0.0.1:PORT, PORT being the one printed on startup.
+import argparse
+import asyncio
+import socket
+import struct
+import sys
+
+TTL = 300
+SOA_MINIMUM = 60
+
+def read_question(data):
+    # Lower-cased name and the question section's end offset
+    labels = []
+    offset = 12
+    while data[offset]:
+        length = data[offset]
+        labels.append(data[offset + 1:offset + 1 + length].decode("ascii", "replace").lower())
+        offset += length + 1
+    return ".".join(labels), offset + 5
+
+class StubDns(asyncio.DatagramProtocol):
+    def __init__(self, args):
+        self.domain = args.domain.lower()
+        self.names = {f"{name}.{self.domain}" for name in args.names.split(",") if name}
+        self.address = socket.inet_aton(args.address)
+        self.wildcard = socket.inet_aton(args.wildcard) if args.wildcard else None
+        self.queries = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            query_id, _, _, _, _, _ = struct.unpack(">HHHHHH", data[:12])
+            name, end = read_question(data)
+            record_type, _ = struct.unpack(">HH", data[end - 4:end])
+        except (struct.error, IndexError):
+            return
+        self.queries += 1
+        question = data[12:end]
+        if name in self.names:
+            address = self.address
+        elif name.endswith(f".{self.domain}"):
+            address = self.wildcard
+        else:
+            address = None
+
+        if address and record_type == 1:
+            # Answer with a pointer back to the question's name
+            answer = struct.pack(">HHHIH", 0xC00C, 1, 1, TTL, 4) + address
+            header = struct.pack(">HHHHHH", query_id, 0x8580, 1, 1, 0, 0)
+            self.transport.sendto(header + question + answer, addr)
+            return
+        # NXDOMAIN, or NOERROR without records for other types of an existing name, with the zone's SOA
+        rcode = 0 if address else 3
+        zone = b"".join(bytes([len(label)]) + label.encode() for label in self.domain.split(".")) + b"\x00"
+        soa_data = b"\x02ns" + zone + b"\x05admin" + zone + struct.pack(">IIIII", 1, 3600, 600, 86400, SOA_MINIMUM)
+        soa = zone + struct.pack(">HHIH", 6, 1, TTL, len(soa_data)) + soa_data
+        header = struct.pack(">HHHHHH", query_id, 0x8580 | rcode, 1, 0, 1, 0)
+        self.transport.sendto(header + question + soa, addr)
+
+async def serve(args):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: StubDns(args), local_addr=(args.host, args.port))
+    # The harness reads the port from this line
+    print(f"listening on {transport.get_extra_info('sockname')[1]}", flush=True)
+    await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub DNS server for the webscan benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="UDP port to listen on (default: any free port).")
+    parser.add_argument("--domain", default="localhost", help="Zone the server is authoritative for.")
+    parser.add_argument("--names", default="", help="Comma-separated names under --domain that resolve to --address.")
+    parser.add_argument("--address", default="127.0.0.1", help="Address of the names in --names.")
+    parser.add_argument("--wildcard", metavar="ADDRESS", help="Resolve every other name under --domain to this address.")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+# Stand-ins for nmap, whatweb, ffuf, gobuster, feroxbuster, eyewitness and aquatone for the webscan benchmarks.
+# They take the options webscan passes, really request the target and print their results in each tool's format,
+# so the parsing, streaming and scheduling around the tools is measured without the real binaries.
+#
+#   python3 benchmarks/fake_tools.py ffuf -u http://127.0.0.1:8080/FUZZ -w words.txt -json
+#
+# bench_scan.py puts a shim for every tool on PATH. BENCH_CONNECT=host:port sends every request there whatever the
+# URL says, which is how subdomains of the benchmark domain reach the stand-in server.
+import base64
+import hashlib
+import http.client
+import json
+import os
+import random
+import re
+import string
+import struct
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urljoin
+
+RESOLVE_HEADER = "X-Bench-Resolve"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+FFUF_MATCH = {200, 201, 202, 203, 204, 301, 302, 307, 401, 403, 405, 500}
+
+local = threading.local()
+
+class Response:
+    __slots__ = ("url", "status", "body", "location", "duration")
+
+    def __init__(self, url, status, body, location, duration):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.location = location
+        self.duration = duration
+
+    @property
+    def words(self):
+        return len(self.body.split())
+
+    @property
+    def lines(self):
+        return self.body.count(b"\n") + 1
+
+def fetch(url, headers=None):
+    # One GET over this thread's keep-alive connection to the origin; None when the connection fails
+    parts = urlsplit(url)
+    connect = os.environ.get("BENCH_CONNECT") or parts.netloc
+    connections = local.__dict__.setdefault("connections", {})
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    started = time.monotonic()
+    for attempt in range(2):
+        connection = connections.get(connect)
+        if connection is None:
+            host, _, port = connect.rpartition(":") if ":" in connect else (connect, "", "")
+            connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+            connection = connections[connect] = connection_class(host, int(port) if port else None, timeout=10)
+        try:
+            connection.request("GET", path, headers={"Host": parts.netloc, **(headers or {})})
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            del connections[connect]
+            continue
+        return Response(url, response.status, body, response.getheader("Location", ""), time.monotonic() - started)
+    return None
+
+def read_words(path, extensions=()):
+    with open(path, errors="ignore") as wordlist:
+        for line in wordlist:
+            word = line.strip()
+            if not word or word.startswith("#"):
+                continue
+            yield word
+            for extension in extensions:
+                yield f"{word}.{extension}"
+
+def parse_options(argv, values, multi=()):
+    # Minimal getopt for the flags webscan passes; values and multi name the flags that take one or several arguments
+    options = {}
+    index = 0
+    while index < len(argv):
+        flag = argv[index]
+        if flag in multi:
+            collected = []
+            while index + 1 < len(argv) and not argv[index + 1].startswith("-"):
+                index += 1
+                collected.append(argv[index])
+            options[flag] = collected
+        elif flag in values and index + 1 < len(argv):
+            index += 1
+            options.setdefault(flag, []).append(argv[index])
+        else:
+            options[flag] = True
+        index += 1
+    return options
+
+def number_set(values):
+    return {int(value) for value in ",".join(values or []).split(",") if value.strip().isdigit()}
+
+class Pacer:
+    # Spaces requests at rate per second across threads
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(max(0, slot - now))
+
+def run_pool(threads, items, work):
+    # Runs work(item) on threads workers; results come back in completion order through the callback
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in pool.map(work, items):
+            pass
+
+def random_token(length=12):
+    return "".join(random.choices(string.ascii_lowercase + string.digits, k=length))
+
+def ffuf(argv):
+    options = parse_options(argv, {"-u", "-w", "-H", "-t", "-mc", "-fs", "-fw", "-fl", "-rate", "-o", "-of"})
+    url = options["-u"][0]
+    wordlist = options["-w"][0]
+    if not os.path.exists(wordlist) and wordlist.endswith(":FUZZ"):
+        wordlist = wordlist[:-len(":FUZZ")]
+    headers = dict(header.split(":", 1) for header in options.get("-H", []))
+    headers = {name.strip(): value.strip() for name, value in headers.items()}
+    threads = int(options.get("-t", ["40"])[0])
+    match_all = options.get("-mc", [""])[0] == "all"
+    match = FFUF_MATCH if not match_all else None
+    filters = {"size": number_set(options.get("-fs")), "words": number_set(options.get("-fw")), "lines": number_set(options.get("-fl"))}
+    json_output = "-json" in options
+    pacer = Pacer(int(options.get("-rate", ["0"])[0]))
+    host_fuzz = "FUZZ" in urlsplit(url).netloc
+
+    def request(word):
+        pacer.wait()
+        word_headers = {name: value.replace("FUZZ", word) for name, value in headers.items()}
+        if host_fuzz:
+            word_headers[RESOLVE_HEADER] = "1"
+        response = fetch(url.replace("FUZZ", word), word_headers)
+        if response and host_fuzz and response.status == 421:
+            return None
+        return response
+
+    if "-ac" in options:
+        for token in (random_token(8), random_token(16)):
+            response = request(token)
+            if response:
+                filters["size"].add(len(response.body))
+
+    words = list(read_words(wordlist))
+    lock = threading.Lock()
+    progress = {"done": 0, "errors": 0}
+    started = time.monotonic()
+    if not json_output:
+        sys.stderr.write(f"\n        /'___\\  /'___\\           /'___\\\n       /\\ \\__/ /\\ \\__/  __  __  /\\ \\__/\n\n"
+                         f" :: Method           : GET\n :: URL              : {url}\n :: Wordlist         : FUZZ: {wordlist}\n"
+                         f" :: Threads          : {threads}\n________________________________________________\n\n")
+
+    def report_progress(final=False):
+        elapsed = time.monotonic() - started
+        rate = int(progress["done"] / elapsed) if elapsed else 0
+        sys.stderr.write(f"\r:: Progress: [{progress['done']}/{len(words)}] :: Job [1/1] :: {rate} req/sec :: "
+                         f"Duration: [0:00:{int(elapsed):02d}] :: Errors: {progress['errors']} ::" + ("\n" if final else ""))
+        sys.stderr.flush()
+
+    def work(position_word):
+        position, word = position_word
+        response = request(word)
+        with lock:
+            progress["done"] += 1
+            if response is None:
+                progress["errors"] += 1
+            if progress["done"] % 100 == 0:
+                report_progress()
+        if response is None or (match is not None and response.status not in match):
+            return
+        if len(response.body) in filters["size"] or response.words in filters["words"] or response.lines in filters["lines"]:
+            return
+        if json_output:
+            record = {"input": {"FUZZ": base64.b64encode(word.encode()).decode()}, "position": position, "status": response.status,
+                      "length": len(response.body), "words": response.words, "lines": response.lines, "content-type": "text/html",
+                      "redirectlocation": response.location, "url": response.url, "duration": int(response.duration * 1e9),
+                      "host": urlsplit(response.url).netloc}
+            line = json.dumps(record)
+        else:
+            line = (f"{word:<25} [Status: {response.status}, Size: {len(response.body)}, Words: {response.words}, "
+                    f"Lines: {response.lines}, Duration: {int(response.duration * 1000)}ms]")
+        with lock:
+            print(line, flush=True)
+
+    run_pool(threads, enumerate(words, 1), work)
+    report_progress(final=True)
+
+def gobuster(argv):
+    options = parse_options(argv[1:], {"-u", "-w", "-x", "-t", "--delay", "--exclude-length"})
+    url = options["-u"][0].rstrip("/")
+    extensions = [extension for extension in options.get("-x", [""])[0].split(",") if extension]
+    threads = int(options.get("-t", ["10"])[0])
+    delay = float(options.get("--delay", ["0ms"])[0].rstrip("ms") or 0) / 1000
+    excluded = number_set(options.get("--exclude-length"))
+    lock = threading.Lock()
+
+    # Like gobuster, refuse to run against a server that answers made-up paths unless that answer's length is excluded
+    probe = fetch(f"{url}/{random_token(36)}")
+    if probe and probe.status != 404 and len(probe.body) not in excluded:
+        sys.stderr.write(f"Error: the server returns a status code that matches the provided options for non existing urls. "
+                         f"{url}/{random_token(36)} => {probe.status} (Length: {len(probe.body)}).\n")
+        sys.exit(1)
+
+    def work(word):
+        if delay:
+            time.sleep(delay)
+        response = fetch(f"{url}/{word}")
+        if response is None or response.status == 404 or len(response.body) in excluded:
+            return
+        shown = response.url if "-e" in options else f"/{word}"
+        redirect = f" [--> {response.location}]" if response.location else ""
+        with lock:
+            print(f"{shown:<40} (Status: {response.status}) [Size: {len(response.body)}]{redirect}", flush=True)
+
+    run_pool(threads, read_words(options["-w"][0], extensions), work)
+
+def feroxbuster(argv):
+    options = parse_options(argv, {"-u", "--wordlist", "-w", "-x", "--threads", "-t", "--depth", "-o", "--rate-limit",
+                                   "--filter-size", "--filter-words", "--filter-lines"}, multi={"-s"})
+    url = options["-u"][0].rstrip("/")
+    wordlist = (options.get("--wordlist") or options.get("-w"))[0]
+    extensions = [extension for extension in ",".join(options.get("-x", [])).split(",") if extension]
+    threads = int((options.get("--threads") or options.get("-t") or ["50"])[0])
+    statuses = number_set(options.get("-s")) or {200, 204, 301, 302, 307, 308, 401, 403, 405, 500}
+    depth = 1 if "--no-recursion" in options or "-n" in options else int(options.get("--depth", ["4"])[0])
+    filters = {"size": number_set(options.get("--filter-size")), "words": number_set(options.get("--filter-words")),
+               "lines": number_set(options.get("--filter-lines"))}
+    pacer = Pacer(int(options.get("--rate-limit", ["0"])[0]))
+    words = list(read_words(wordlist, extensions))
+    lock = threading.Lock()
+    records = open(options["-o"][0], "w") if "-o" in options else None
+
+    def scan(base, level):
+        found = []
+
+        def work(word):
+            pacer.wait()
+            response = fetch(f"{base}/{word}")
+            if response is None or response.status not in statuses:
+                return
+            if len(response.body) in filters["size"] or response.words in filters["words"] or response.lines in filters["lines"]:
+                return
+            with lock:
+                print(f"{response.status:<8} GET {response.lines:>8}l {response.words:>8}w {len(response.body):>8}c {response.url}", flush=True)
+                if records:
+                    records.write(json.dumps({"type": "response", "url": response.url, "path": urlsplit(response.url).path,
+                                              "status": response.status, "content_length": len(response.body),
+                                              "word_count": response.words, "line_count": response.lines, "method": "GET"}) + "\n")
+                    records.flush()
+                if response.status in (301, 302) and response.location.endswith("/"):
+                    found.append(urljoin(response.url, response.location).rstrip("/"))
+
+        run_pool(threads, words, work)
+        if depth == 0 or level < depth:
+            for directory in found:
+                scan(directory, level + 1)
+
+    try:
+        scan(url, 1)
+    finally:
+        if records:
+            records.close()
+
+def png_image(seed, width=64, height=48):
+    # Grayscale PNG of 8x6 blocks whose shades come from seed, so identical pages give identical screenshots
+    digest = hashlib.sha512(seed).digest()
+    rows = []
+    for y in range(height):
+        row = bytes(digest[(y * 6 // height) * 8 + x * 8 // width] for x in range(width))
+        rows.append(b"\x00" + row)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    return (PNG_SIGNATURE + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"".join(rows))) + chunk(b"IEND", b""))
+
+def screenshot(url, directory):
+    response = fetch(url)
+    name = re.sub(r"[^A-Za-z0-9.]+", ".", url.split("://", 1)[-1]).strip(".")
+    with open(os.path.join(directory, f"http.{name}.png"), "wb") as image:
+        image.write(png_image(response.body if response else url.encode()))
+
+def eyewitness(argv):
+    options = parse_options(argv, {"-f", "-d", "--timeout", "--threads"})
+    output_dir = options["-d"][0]
+    screens = os.path.join(output_dir, "screens")
+    os.makedirs(screens, exist_ok=True)
+    with open(options["-f"][0]) as url_file:
+        urls = [line.strip() for line in url_file if line.strip()]
+    run_pool(4, urls, lambda url: screenshot(url, screens))
+    with open(os.path.join(output_dir, "report.html"), "w") as report:
+        report.write("<html><body>" + "".join(f"<p>{url}</p>" for url in urls) + "</body></html>\n")
+
+def aquatone(argv):
+    options = parse_options(argv, {"-out", "-threads"})
+    output_dir = options.get("-out", ["."])[0]
+    screens = os.path.join(output_dir, "screenshots")
+    os.makedirs(screens, exist_ok=True)
+    urls = []
+    for line in sys.stdin:
+        if line.strip():
+            urls.append(line.strip())
+            screenshot(line.strip(), screens)
+    with open(os.path.join(output_dir, "aquatone_urls.txt"), "w") as url_file:
+        url_file.writelines(url + "\n" for url in urls)
+
+def nmap(argv):
+    options = parse_options(argv, {"-script", "-oN", "-p"})
+    target = argv[-1]
+    port = options.get("-p", ["80"])[0]
+    response = fetch(f"http://{target}:{port}/")
+    state = "open" if response else "closed"
+    title = re.search(rb"<title>(.*?)</title>", response.body or b"") if response else None
+    report = (f"# Nmap 7.94 scan initiated as: nmap {' '.join(argv)}\nNmap scan report for {target}\nHost is up (0.00010s latency).\n\n"
+              f"PORT     STATE SERVICE VERSION\n{port}/tcp {state}  http    bench httpd\n"
+              f"|_http-title: {(title.group(1).decode(errors='replace') if title else 'Site does not have a title')}\n\n"
+              f"# Nmap done: 1 IP address (1 host up) scanned\n")
+    sys.stdout.write(report)
+    if "-oN" in options:
+        with open(options["-oN"][0], "w") as output:
+            output.write(report)
+
+def whatweb(argv):
+    url = argv[-1]
+    response = fetch(url)
+    status = response.status if response else "Unreachable"
+    print(f"WhatWeb report for \x1b[1m\x1b[34m{url}\x1b[0m\nStatus    : {status}\nTitle     : \x1b[1m\x1b[33m<None>\x1b[0m\n"
+          f"IP        : 127.0.0.1\nCountry   : \x1b[1m\x1b[31mRESERVED, ZZ\x1b[0m\n\nSummary   : \x1b[1mHTTPServer\x1b[0m[\x1b[1m\x1b[36mbench\x1b[0m]\n")
+
+TOOLS = {"ffuf": ffuf, "gobuster": gobuster, "feroxbuster": feroxbuster, "eyewitness": eyewitness,
+         "aquatone": aquatone, "nmap": nmap, "whatweb": whatweb}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in TOOLS:
+        sys.exit(f"usage: {sys.argv[0]} {{{','.join(TOOLS)}}} [tool options]")
+    try:
+        TOOLS[sys.argv[1]](sys.argv[2:])
+    except BrokenPipeError:
+        pass
@@ -0,0 +1,150 @@
+# Stand-in target for the webscan benchmarks: a keep-alive HTTP/1.1 server with injected latency, soft-404 pages,
+# virtual hosts, a rate limit and a directory tree deep enough for recursive discovery.
+#
+#   python3 benchmarks/target_server.py --port 8080 --words 2000 --latency 20 --wildcard --vhosts dev,admin --rate 300 --depth 3
+#
+# The paths that exist are derived from the same names bench_scan.py writes into the wordlists (word_names(),
+# tree_names()), so every run of a scenario has the same number of URLs to find.
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+FOUND_EVERY = 25
+TREE_FILE = "secret"
+RESOLVE_HEADER = "x-bench-resolve"
+
+def word_names(count):
+    return [f"word{index}" for index in range(count)]
+
+def tree_names(fanout):
+    return [f"tree{index}" for index in range(fanout)]
+
+def site_layout(words, depth=0, fanout=0):
+    # Every FOUND_EVERY-th word exists as a page at the top level, and every tree directory down to depth
+    # has a listing of its children and a secret.php
+    pages = {"/": []}
+    for word in word_names(words)[::FOUND_EVERY]:
+        pages[f"/{word}"] = None
+        pages["/"].append(f"/{word}")
+
+    directories = [""]
+    for _ in range(depth):
+        directories = [f"{parent}/{name}" for parent in directories for name in tree_names(fanout)]
+        for directory in directories:
+            parent = directory.rsplit("/", 1)[0] + "/"
+            pages.setdefault(parent, []).append(f"{directory}/")
+            pages[f"{directory}/"] = [f"{directory}/{TREE_FILE}.php"]
+            pages[f"{directory}/{TREE_FILE}.php"] = None
+    return pages
+
+class TokenBucket:
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class TargetServer:
+    def __init__(self, args):
+        self.args = args
+        self.pages = site_layout(args.words, args.depth, args.fanout)
+        self.vhosts = {f"{name}.{args.domain}" for name in args.vhosts.split(",") if name}
+        self.bucket = TokenBucket(args.rate) if args.rate else None
+        self.counts = {"requests": 0, "limited": 0}
+
+    def respond(self, path, host, headers):
+        # Returns status, extra headers and body for one request
+        self.counts["requests"] += 1
+        if self.bucket and not self.bucket.take():
+            self.counts["limited"] += 1
+            return 429, [("Retry-After", "1")], b"slow down"
+        if path == "/_stats":
+            return 200, [], repr(self.counts).encode()
+
+        host = host.rsplit(":", 1)[0] if not host.endswith("]") else host
+        if host in self.vhosts:
+            return 200, [], f"<html><body>virtual host {host}</body></html>".encode()
+        # A subdomain the server does not know stands in for one that would not resolve
+        if host.endswith(f".{self.args.domain}") and headers.get(RESOLVE_HEADER):
+            return 421, [], b""
+
+        path = path.split("?", 1)[0]
+        if path in self.pages:
+            links = self.pages[path]
+            if links is None:
+                return 200, [("Content-Type", "text/html")], f"<html><body>page {path}</body></html>".encode()
+            body = "".join(f'<a href="{link}">{link}</a>\n' for link in links)
+            return 200, [("Content-Type", "text/html")], f"<html><body>\n{body}</body></html>".encode()
+        if f"{path}/" in self.pages:
+            return 301, [("Location", f"{path}/")], b""
+        if self.args.wildcard:
+            return 200, [("Content-Type", "text/html")], f"<html><body>Nothing at {path}, try the home page</body></html>".encode()
+        return 404, [("Content-Type", "text/html")], b"<html><body>Not Found</body></html>"
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, path = request_line.split(" ")[:2]
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                if self.args.latency or self.args.jitter:
+                    await asyncio.sleep(max(0, self.args.latency + random.uniform(-self.args.jitter, self.args.jitter)) / 1000)
+
+                status, extra, body = self.respond(path, headers.get("host", ""), headers)
+                closing = headers.get("connection", "").lower() == "close"
+                response = [f"HTTP/1.1 {status} Bench", f"Content-Length: {len(body)}", *(f"{name}: {value}" for name, value in extra)]
+                if closing:
+                    response.append("Connection: close")
+                writer.write(("\r\n".join(response) + "\r\n\r\n").encode("latin-1") + (b"" if method == "HEAD" else body))
+                await writer.drain()
+                if closing:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(args):
+    target = TargetServer(args)
+    server = await asyncio.start_server(target.handle, args.host, args.port, backlog=1024)
+    # The harness reads the port from this line
+    print(f"listening on {server.sockets[0].getsockname()[1]}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in target server for the webscan benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="Port to listen on (default: any free port).")
+    parser.add_argument("--words", type=int, default=2000, help="Size of the generated wordlist the site is laid out from.")
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds added to every response.")
+    parser.add_argument("--jitter", type=float, default=0, help="Random +/- milliseconds on top of --latency.")
+    parser.add_argument("--wildcard", action="store_true", help="Answer unknown paths with a 200 soft-404 page that echoes the path.")
+    parser.add_argument("--domain", default="localhost", help="Domain the virtual hosts live under.")
+    parser.add_argument("--vhosts", default="", help="Comma-separated virtual host names under --domain.")
+    parser.add_argument("--rate", type=int, default=0, help="Requests per second before answering 429.")
+    parser.add_argument("--depth", type=int, default=0, help="Levels of the directory tree.")
+    parser.add_argument("--fanout", type=int, default=2, help="Subdirectories per tree directory.")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -30,7 +30,7 @@ def create_local_bin_directory():
         print(f"Directory already exists: {local_bin_dir}")
 
 def copy_webscan_script():
-    """Copy webscan.py to the ~/.local/bin directory and make it executable."""
+    """Copy webscan.py and the webscan_*.py modules it imports to the ~/.local/bin directory and make webscan.py executable."""
     # Get the current user's home directory
     home_dir = Path.home()
     
@@ -45,8 +45,11 @@ def copy_webscan_script():
         print(f"Error: {source_file} not found.")
         return
     
-    # Copy the file and set permissions
+    # Copy the files and set permissions; the modules have to sit next to webscan.py to be importable
     try:
+        for module in sorted(repo_dir.glob('webscan_*.py')):
+            shutil.copy2(module, local_bin_dir / module.name)
+            print(f"Copied {module} to {local_bin_dir / module.name}.")
         shutil.copy2(source_file, destination_file)
         destination_file.chmod(0o755)
         print(f"Copied {source_file} to {destination_file} and made it executable.")
@@ -55,7 +58,7 @@ def copy_webscan_script():
 
 def install_requirements():
     # Define the pip packages to install
-    packages = ["wfuzz", "ansi2html"]
+    packages = ["wfuzz"]
     
     # Use subprocess to run the pip install command
     try:
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+import webscan
+
+
+def sgr(params, style=None):
+    style = dict(style or {})
+    webscan.apply_sgr(style, params)
+    return style
+
+
+class ApplySgrTest(unittest.TestCase):
+    def test_basic_and_bright_colours(self):
+        self.assertEqual(sgr("31"), {"color": "#aa0000"})
+        self.assertEqual(sgr("92;44"), {"color": "#55ff55", "background-color": "#0000aa"})
+        self.assertEqual(sgr("103"), {"background-color": "#ffff55"})
+
+    def test_bold_and_its_reset(self):
+        self.assertEqual(sgr("1;33"), {"font-weight": "bold", "color": "#aa5500"})
+        self.assertEqual(sgr("22", {"font-weight": "bold", "opacity": "0.6", "color": "#aa5500"}), {"color": "#aa5500"})
+        self.assertEqual(sgr("24", {"text-decoration": "underline"}), {})
+
+    def test_reset(self):
+        style = {"color": "#aa0000", "font-weight": "bold"}
+        self.assertEqual(sgr("0", style), {})
+        self.assertEqual(sgr("", style), {})
+        self.assertEqual(sgr("39", {"color": "#aa0000", "background-color": "#000000"}), {"background-color": "#000000"})
+
+    def test_256_and_true_colour(self):
+        self.assertEqual(sgr("38;5;196"), {"color": "#ff0000"})
+        self.assertEqual(sgr("48;5;244"), {"background-color": "#808080"})
+        self.assertEqual(sgr("38;5;9"), {"color": "#ff5555"})
+        self.assertEqual(sgr("38;2;18;52;86;1"), {"color": "#123456", "font-weight": "bold"})
+
+    def test_truncated_extended_colour_is_ignored(self):
+        self.assertEqual(sgr("38;5"), {})
+        self.assertEqual(sgr("38;2;1;2"), {})
+
+
+class RenderAnsiLineTest(unittest.TestCase):
+    def test_plain_text_is_escaped(self):
+        self.assertEqual(webscan.render_ansi_line('<a href="x">&</a>', {}), '<a href="x">&amp;</a>'.replace("<", "&lt;").replace(">", "&gt;"))
+
+    def test_coloured_span(self):
+        line = "\x1b[33m{+}\x1b[0m \x1b[2;37mRunning <Nmap>: \x1b[0mnmap -p 80"
+        self.assertEqual(webscan.render_ansi_line(line, {}),
+                         '<span style="color: #aa5500">{+}</span> '
+                         '<span style="opacity: 0.6; color: #aaaaaa">Running &lt;Nmap&gt;: </span>nmap -p 80')
+
+    def test_style_carries_over_to_the_next_line(self):
+        style = {}
+        self.assertEqual(webscan.render_ansi_line("\x1b[1mbold", style), '<span style="font-weight: bold">bold</span>')
+        self.assertEqual(webscan.render_ansi_line("still\x1b[m plain", style), '<span style="font-weight: bold">still</span> plain')
+
+    def test_other_escape_sequences_are_dropped(self):
+        self.assertEqual(webscan.render_ansi_line("\x1b[2K\x1b[1Gprogress\x1b[?25l", {}), "progress")
+
+
+class AnsiToHtmlTest(unittest.TestCase):
+    def test_document(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "scan.md")
+            with open(source, 'w') as output:
+                output.write("\x1b[31mred & <b>\n\x1b[0mplain\n")
+            target = webscan.convert_md_to_html(source, directory)
+            self.assertEqual(target, os.path.join(directory, "scan.html"))
+            with open(target) as rendered:
+                document = rendered.read()
+        self.assertTrue(document.startswith(webscan.ANSI_HTML_HEADER) and document.endswith(webscan.ANSI_HTML_FOOTER))
+        body = document[len(webscan.ANSI_HTML_HEADER):-len(webscan.ANSI_HTML_FOOTER)]
+        self.assertEqual(body, '<span style="color: #aa0000">red &amp; &lt;b&gt;</span>\nplain\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import contextlib
+import io
+import time
+import unittest
+from unittest import mock
+
+import webscan
+
+
+class ParseDurationTest(unittest.TestCase):
+    def test_formats(self):
+        self.assertEqual(webscan.parse_duration("20m"), 1200)
+        self.assertEqual(webscan.parse_duration("1h30m"), 5400)
+        self.assertEqual(webscan.parse_duration("2h"), 7200)
+        self.assertEqual(webscan.parse_duration(" 90 "), 90)
+        self.assertEqual(webscan.parse_duration("1m0.5s"), 60.5)
+        self.assertEqual(webscan.parse_duration("0.001"), 0.001)
+
+    def test_zero_and_nonsense(self):
+        for value in ("0", "0s", "0h0m", "0.0", "", "s", "abc", "1.5h", "-5", "5 m", "1m1h"):
+            with self.assertRaises(ValueError, msg=value):
+                webscan.parse_duration(value)
+
+    def test_format_duration(self):
+        self.assertEqual([webscan.format_duration(seconds) for seconds in (0, 0.4, 59.6, 61, 5400)], ["0s", "0s", "1m00s", "1m01s", "1h30m"])
+
+
+class BudgetArgumentTest(unittest.TestCase):
+    def parse(self, *argv):
+        with mock.patch.object(webscan.sys, "argv", ["webscan", "http://127.0.0.1:8080/", *argv]), \
+                contextlib.redirect_stderr(io.StringIO()):
+            return webscan.parse_arguments()
+
+    def test_budget_in_seconds(self):
+        self.assertEqual(self.parse("--budget", "1h30m").budget, 5400)
+        self.assertEqual(self.parse("--budget", "1").budget, 1)
+        self.assertIsNone(self.parse().budget)
+
+    def test_rejected_budgets(self):
+        for value in ("0", "", "0.5", "0.001", "soon"):
+            with self.assertRaises(SystemExit, msg=value):
+                self.parse("--budget", value)
+
+
+class StageBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.scan = webscan.ScanBudget("host", 100, 2, {"ffuf": 100.0})
+        self.output = contextlib.redirect_stdout(io.StringIO())
+        self.output.__enter__()
+        self.addCleanup(self.output.__exit__, None, None, None)
+
+    def test_stage_without_rate_history_keeps_everything(self):
+        stage = self.scan.stage("gobuster", lambda: 10 ** 6)
+        stage.begin()
+        self.assertIsNone(stage.fit(10 ** 6))
+        self.assertEqual((stage.kept, stage.available, stage.cut), (10 ** 6, 10 ** 6, False))
+
+    def test_cut_to_what_the_rate_allows(self):
+        stage = self.scan.stage("ffuf", lambda: 10 ** 6)
+        stage.begin()
+        stage.deadline = time.monotonic() + 10
+        keep = stage.fit(5000)
+        self.assertIn(keep, (999, 1000))
+        self.assertEqual((stage.kept, stage.available, stage.cut), (keep, 5000, True))
+
+    def test_everything_fits(self):
+        stage = self.scan.stage("ffuf", lambda: 500)
+        stage.begin()
+        self.assertIsNone(stage.fit(500))
+        self.assertEqual(stage.kept, 500)
+        self.assertFalse(stage.cut)
+
+    def test_past_the_deadline_keeps_nothing(self):
+        stage = self.scan.stage("ffuf", lambda: 500)
+        stage.begin()
+        stage.deadline = time.monotonic() - 1
+        self.assertEqual(stage.fit(500), 0)
+
+    def test_stage_without_estimate_gets_the_whole_budget(self):
+        report = self.scan.stage("report")
+        report.begin()
+        self.assertIsNone(report.share)
+        self.assertEqual(report.deadline, self.scan.deadline)
+        self.assertEqual(self.scan.discovery_deadline - self.scan.started, 100 * (1 - webscan.BUDGET_RESERVE))
+        # A later discovery stage is planned without it
+        ffuf = self.scan.stage("ffuf", lambda: 100)
+        ffuf.begin()
+        self.assertLessEqual(ffuf.deadline, self.scan.discovery_deadline)
+
+
+class ScanBudgetPlanTest(unittest.TestCase):
+    def budget(self, slots, estimates, seconds=100):
+        scan = webscan.ScanBudget("host", seconds, slots, {name: 100.0 for name in estimates})
+        stages = {name: scan.stage(name, lambda count=count: count) for name, count in estimates.items()}
+        scan.start(1000.0)
+        return scan, stages
+
+    def test_spare_time_is_spread_over_the_stages(self):
+        # Needs of 1s, 10s and 100s in a 75s window over two slots: the largest is capped at the window, and the
+        # others get an even part of the 64s nobody needs
+        scan, stages = self.budget(2, {"a": 100, "b": 1000, "c": 10000})
+        scan.plan(1000.0, stages["c"])
+        self.assertEqual(stages["c"].share, 75)
+        scan.plan(1000.0, stages["a"])
+        self.assertAlmostEqual(stages["a"].share, 1 + 64 / 3)
+        self.assertEqual([stage.candidates for stage in stages.values()], [100, 1000, 10000])
+
+    def test_over_budget_stages_split_the_window_evenly(self):
+        scan, stages = self.budget(1, {"a": 5000, "b": 5000, "c": 5000})
+        for stage in stages.values():
+            scan.plan(1000.0, stage)
+            self.assertEqual(stage.share, 25)
+
+    def test_running_stages_take_their_slots(self):
+        scan, stages = self.budget(2, {"a": 5000, "b": 5000, "c": 5000})
+        stages["a"].started = 1000.0
+        scan.plan(1000.0, stages["b"])
+        self.assertEqual(stages["b"].share, 37.5)
+        # Once it is done, both waiting stages fit and split what is left over
+        stages["a"].finished = 1001.0
+        scan.plan(1000.0, stages["b"])
+        self.assertEqual(stages["b"].share, 75)
+
+    def test_skipped_and_unestimated_stages_are_left_out(self):
+        scan, stages = self.budget(1, {"a": 5000, "b": 10000})
+        scan.stage("report")
+        stages["b"].outcome = "skipped, no time left"
+        scan.plan(1000.0, stages["a"])
+        self.assertEqual(stages["a"].share, 75)
+        stages["b"].outcome = None
+        scan.plan(1000.0, stages["a"])
+        self.assertEqual(stages["a"].share, 37.5)
+
+    def test_nothing_left_of_the_window(self):
+        scan, stages = self.budget(2, {"a": 5000, "b": 0})
+        scan.plan(1000.0 + 80, stages["a"])
+        self.assertEqual(stages["a"].share, 0)
+        scan.plan(1000.0 + 80, stages["b"])
+        self.assertEqual(stages["b"].share, 0)
+
+    def test_borrowing_spare_time(self):
+        scan, _ = self.budget(1, {"a": 100})
+        scan.give(5)
+        scan.give(-3)
+        self.assertEqual(scan.borrow(0.5), 0)
+        self.assertEqual(scan.borrow(60), 5)
+        self.assertEqual((scan.spare, scan.lent), (0, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import webscan
+import webscan_http
+
+
+def probe(status, body, reflected=''):
+    return (status, len(body), len(body.split()), body.count(b"\n") + 1, webscan.body_digest(body, reflected))
+
+
+class ReflectingHandler(BaseHTTPRequestHandler):
+    # Soft-404 page that echoes the requested name, so its size changes with every probe
+    def do_GET(self):
+        name = self.path.rstrip("/").rsplit("/", 1)[-1]
+        body = f"<html><p>Sorry, {name} was not found</p></html>\n".encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class BuildSignaturesTest(unittest.TestCase):
+    def test_constant_fields_are_kept_per_status(self):
+        probes = [probe(404, b"not found"), probe(404, b"not found"), probe(302, b""), probe(302, b"moved\n")]
+        signatures = webscan.Calibration.build_signatures(probes)
+        self.assertEqual([signature["status"] for signature in signatures], [302, 404])
+        moved, missing = signatures
+        self.assertEqual((missing["size"], missing["words"], missing["lines"]), (9, 2, 1))
+        self.assertEqual(len(missing["digests"]), 1)
+        self.assertEqual((moved["size"], moved["words"], moved["lines"]), (None, None, None))
+        self.assertEqual(len(moved["digests"]), 2)
+
+    def test_no_probes(self):
+        self.assertEqual(webscan.Calibration.build_signatures([]), [])
+
+
+class MatchesTest(unittest.TestCase):
+    def setUp(self):
+        self.calibration = webscan.Calibration()
+        self.calibration.signatures["paths"] = webscan.Calibration.build_signatures([probe(200, b"catch all"), probe(200, b"catch all")])
+
+    def test_same_status_and_size(self):
+        self.assertTrue(self.calibration.matches(200, 9))
+        self.assertTrue(self.calibration.matches(200, 9, 2, 1))
+        self.assertFalse(self.calibration.matches(200, 10))
+        self.assertFalse(self.calibration.matches(301, 9))
+        self.assertFalse(self.calibration.matches(200, 9, kind="vhosts"))
+
+    def test_unknown_fields_do_not_match(self):
+        self.assertFalse(self.calibration.matches(200, None))
+
+    def test_hit(self):
+        self.assertTrue(self.calibration.matches_hit(webscan.Hit("http://h/x", 200, 9, 2, 1)))
+        self.assertFalse(self.calibration.matches_hit(webscan.Hit("http://h/x", 200, 900, 2, 1)))
+
+    def test_reflected_word(self):
+        # Sizes vary with the name, so only the digest with the name taken out can match
+        calibration = webscan.Calibration()
+        calibration.signatures["paths"] = webscan.Calibration.build_signatures(
+            [probe(200, f"no {token} here".encode(), token) for token in ("abcdefgh", "abcdefghijklmnop")])
+        self.assertIsNone(calibration.signatures["paths"][0]["size"])
+        response = webscan_http.HttpResponse(200, {}, b"no admin here", True)
+        self.assertTrue(calibration.matches_response(response, "admin"))
+        self.assertFalse(calibration.matches_response(webscan_http.HttpResponse(200, {}, b"admin panel", True), "admin"))
+
+    def test_filters_skip_404_for_paths(self):
+        self.calibration.signatures["paths"] += webscan.Calibration.build_signatures([probe(404, b"missing page")])
+        self.assertEqual(self.calibration.tool_args("ffuf"), ["-fs", "9"])
+        self.assertEqual(self.calibration.tool_args("gobuster"), ["--exclude-length", "9"])
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "calibration", "host-80.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip_keeps_its_age(self):
+        calibration = webscan.Calibration()
+        calibration.signatures["vhosts"] = webscan.Calibration.build_signatures([probe(200, b"default site")])
+        calibration.save(self.path)
+        loaded = webscan.Calibration()
+        self.assertTrue(loaded.load(self.path))
+        self.assertEqual((loaded.signatures, loaded.created), (calibration.signatures, calibration.created))
+
+    def test_expired(self):
+        calibration = webscan.Calibration()
+        calibration.created = time.time() - 10
+        calibration.save(self.path)
+        self.assertFalse(webscan.Calibration().load(self.path, max_age=5))
+        self.assertFalse(webscan.Calibration().load(os.path.join(self.directory.name, "missing.json")))
+
+
+class ProbeCalibrationTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ReflectingHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reflecting_catch_all(self):
+        calibration = webscan.run_async(webscan.probe_calibration(self.base_url))
+        signature, = calibration.signatures["paths"]
+        self.assertEqual((signature["status"], signature["size"]), (200, None))
+        self.assertEqual(len(signature["digests"]), 1)
+        body = b"<html><p>Sorry, backup was not found</p></html>\n"
+        self.assertTrue(calibration.matches_response(webscan_http.HttpResponse(200, {}, body, True), "backup"))
+        self.assertEqual(calibration.signatures["vhosts"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
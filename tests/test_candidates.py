@@ -0,0 +1,98 @@
+import functools
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import webscan
+from tests import test_wordlists
+
+
+class PlanDiscoveryCandidatesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.wordlists = os.path.join(self.directory.name, "wordlists")
+        os.makedirs(self.wordlists)
+        self.write("common.txt", ["admin", "# comment", "", "login"])
+        self.write("big.txt", ["admin", "backup"])
+        self.write("directory-list-2.3-medium.txt", ["login", "admin.php", "images", "backup"])
+        hit_stats = functools.partial(webscan.HitStats, os.path.join(self.directory.name, "hit-stats.db"))
+        for name, value in (("WORDLIST_DIR", self.wordlists), ("CACHE_DIR", os.path.join(self.directory.name, "cache")),
+                            ("HitStats", hit_stats)):
+            patcher = mock.patch.object(webscan, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, words):
+        with open(os.path.join(self.wordlists, name), 'w') as wordlist:
+            wordlist.write("\n".join(words) + "\n")
+
+    def record_hits(self, urls):
+        stats = webscan.HitStats()
+        try:
+            stats.record("example", urls)
+        finally:
+            stats.close()
+
+    def shares(self, **kwargs):
+        shares = {}
+        for tool, path in webscan.plan_discovery_candidates(**kwargs).items():
+            with open(path) as share:
+                shares[tool] = share.read().split()
+        return shares
+
+    def test_candidates_go_to_the_first_tool_that_has_them(self):
+        shares = self.shares()
+        self.assertEqual(shares["feroxbuster"], ["admin", "admin.php", "admin.html", "login", "login.php", "login.html"])
+        self.assertEqual(shares["gobuster"], ["admin.txt", "admin.jpg", "backup", "backup.php", "backup.txt", "backup.html", "backup.jpg"])
+        self.assertEqual(shares["ffuf"], ["images"])
+
+    def test_without_dedup_every_tool_keeps_its_wordlist(self):
+        shares = self.shares(dedup=False)
+        self.assertEqual(shares["ffuf"], ["login", "admin.php", "images", "backup"])
+        self.assertEqual(len(shares["gobuster"]), 10)
+
+    def test_unchanged_plan_is_reused(self):
+        paths = webscan.plan_discovery_candidates()
+        modified = os.path.getmtime(paths["ffuf"]) - 10
+        os.utime(paths["ffuf"], (modified, modified))
+        os.utime(f"{paths['ffuf']}.idx", (modified + 5, modified + 5))
+        webscan.plan_discovery_candidates()
+        self.assertEqual(os.path.getmtime(paths["ffuf"]), modified)
+
+    def test_changed_wordlist_is_planned_again(self):
+        self.shares()
+        self.write("directory-list-2.3-medium.txt", ["login", "images", "uploads"])
+        self.assertEqual(self.shares()["ffuf"], ["images", "uploads"])
+
+    def test_share_offsets_match_the_lines(self):
+        for path in webscan.plan_discovery_candidates().values():
+            with open(path, 'rb') as share:
+                data = share.read()
+            offsets = test_wordlists.read_offsets(path)
+            self.assertEqual(offsets[-1], len(data))
+            self.assertEqual([data[start:end] for start, end in zip(offsets, offsets[1:])], data.splitlines(keepends=True))
+
+    def test_past_hits_move_up(self):
+        self.record_hits(["http://example/images/", "http://example/backup"])
+        shares = self.shares()
+        self.assertEqual(shares["gobuster"][0], "backup")
+        self.assertEqual(shares["ffuf"], ["images"])
+
+    def test_new_hits_keep_the_order_when_not_reordering(self):
+        before = self.shares()
+        self.record_hits(["http://example/backup.jpg"])
+        self.assertEqual(self.shares(reorder=False), before)
+        self.assertEqual(self.shares()["gobuster"][0], "backup.jpg")
+
+    def test_missing_wordlist(self):
+        os.remove(os.path.join(self.wordlists, "big.txt"))
+        with self.assertRaises(FileNotFoundError):
+            webscan.plan_discovery_candidates()
+
+
+if __name__ == "__main__":
+    unittest.main()
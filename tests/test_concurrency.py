@@ -0,0 +1,79 @@
+import unittest
+
+import webscan
+import webscan_http
+
+
+class ConcurrencyControllerTest(unittest.TestCase):
+    def setUp(self):
+        self.controller = webscan_http.ConcurrencyController(maximum=20)
+        self.controller.limit = 10.0
+
+    def window(self, latency, count=webscan_http.AIMD_WINDOW):
+        for _ in range(count):
+            self.controller.record(latency)
+
+    def test_nothing_changes_inside_a_window(self):
+        self.window(0.01, webscan_http.AIMD_WINDOW - 1)
+        self.assertEqual((self.controller.limit, self.controller.p50), (10.0, None))
+
+    def test_steady_latency_grows_the_limit_by_one(self):
+        self.window(0.01)
+        self.assertEqual((self.controller.limit, self.controller.baseline, self.controller.backoffs), (11.0, 0.01, 0))
+        self.window(0.01)
+        self.assertEqual(self.controller.limit, 12.0)
+
+    def test_limit_stays_below_the_maximum(self):
+        self.controller.limit = 20.0
+        self.window(0.01)
+        self.assertEqual(self.controller.limit, 20.0)
+
+    def test_latency_spike_halves_the_limit(self):
+        self.window(0.01)
+        self.window(0.01 * webscan_http.AIMD_LATENCY_FACTOR + 0.001)
+        self.assertEqual((self.controller.limit, self.controller.backoffs), (5.5, 1))
+
+    def test_slower_host_drifts_the_baseline_up(self):
+        self.window(0.01)
+        self.window(0.015)
+        self.assertAlmostEqual(self.controller.baseline, 0.011)
+        self.assertEqual((self.controller.limit, self.controller.backoffs), (12.0, 0))
+
+    def test_failures_close_the_window_early(self):
+        self.window(0.01, 10)
+        self.window(None, 3)
+        self.assertEqual((self.controller.limit, self.controller.backoffs), (5.0, 1))
+        self.assertAlmostEqual(self.controller.error_rate, 3 / 13)
+        self.assertEqual((self.controller.latencies, self.controller.failures), ([], 0))
+
+    def test_recovers_after_backing_off(self):
+        self.window(None, 3)
+        self.window(0.01)
+        self.window(0.01)
+        self.assertEqual(self.controller.limit, 7.0)
+
+    def test_limit_never_drops_below_one(self):
+        for _ in range(10):
+            self.window(None, 3)
+        self.assertEqual(self.controller.limit, 1.0)
+        self.assertEqual(self.controller.share(4), 1)
+
+    def test_share_is_split_between_users(self):
+        self.controller.join()
+        self.controller.join()
+        self.assertEqual(self.controller.share(), 5)
+        self.assertEqual(self.controller.share(3), 3)
+        self.controller.leave()
+        self.assertEqual(self.controller.share(), 10)
+
+    def test_describe(self):
+        self.window(0.01)
+        self.assertEqual(self.controller.describe(), "limit 11/20, p50 10ms, p95 10ms, 0.0% errors/429/503, 0 backoffs")
+
+    def test_tool_threads(self):
+        self.assertEqual(webscan.tool_threads(None, 150), 150)
+        self.assertEqual(webscan.tool_threads(self.controller, 150), 10 // webscan.DISCOVERY_TOOLS_PER_HOST)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import asyncio
+import socket
+import struct
+import unittest
+
+import webscan_dns
+
+DNS_TYPE_CNAME = 5
+
+
+def question(name, record_type=webscan_dns.DNS_TYPE_A):
+    return webscan_dns.encode_dns_name(name) + struct.pack(">HH", record_type, 1)
+
+
+def record(name, record_type, ttl, data):
+    # name is raw wire bytes, so records can use compression pointers
+    return name + struct.pack(">HHIH", record_type, 1, ttl, len(data)) + data
+
+
+def response(query_id, asked, answers=(), authorities=(), rcode=0):
+    header = struct.pack(">HHHHHH", query_id, 0x8180 | rcode, 1, len(answers), len(authorities), 0)
+    return header + asked + b"".join(answers) + b"".join(authorities)
+
+
+def soa(minimum):
+    return b"\x02ns\xc0\x0c" + b"\x05admin\xc0\x0c" + struct.pack(">IIIII", 1, 7200, 900, 86400, minimum)
+
+
+# Pointer to the question name, which always starts right after the header
+QUESTION_NAME = b"\xc0\x0c"
+
+
+class EncodeDnsNameTest(unittest.TestCase):
+    def test_labels(self):
+        self.assertEqual(webscan_dns.encode_dns_name("www.example.com"), b"\x03www\x07example\x03com\x00")
+        self.assertEqual(webscan_dns.encode_dns_name("example.com."), b"\x07example\x03com\x00")
+        self.assertEqual(webscan_dns.encode_dns_name("_dmarc.x-y.example"), b"\x06_dmarc\x03x-y\x07example\x00")
+
+    def test_invalid_names(self):
+        for name in ("-www.example.com", "www-.example.com", "a..b", "with space.example", "ünicode.example",
+                     "a" * 64 + ".example", ".".join(["abcdefghi"] * 26)):
+            self.assertIsNone(webscan_dns.encode_dns_name(name), name)
+
+
+class ParseDnsResponseTest(unittest.TestCase):
+    asked = question("www.example.com")
+
+    def test_addresses_and_smallest_ttl(self):
+        data = response(1, self.asked, [record(QUESTION_NAME, webscan_dns.DNS_TYPE_A, 300, socket.inet_aton("10.0.0.2")),
+                                        record(QUESTION_NAME, webscan_dns.DNS_TYPE_A, 60, socket.inet_aton("10.0.0.1")),
+                                        record(QUESTION_NAME, webscan_dns.DNS_TYPE_AAAA, 120, socket.inet_pton(socket.AF_INET6, "::1"))])
+        self.assertEqual(webscan_dns.parse_dns_response(data), (0, ["10.0.0.1", "10.0.0.2", "::1"], 60))
+
+    def test_cname_chain(self):
+        # www -> web.example.com -> edge.example.net, with the later names compressed against the earlier ones
+        web = b"\x03web" + b"\xc0\x10"
+        web_offset = 12 + len(self.asked) + 12
+        chain = [record(QUESTION_NAME, DNS_TYPE_CNAME, 600, web),
+                 record(struct.pack(">H", 0xC000 | web_offset), DNS_TYPE_CNAME, 600, b"\x04edge\x07example\x03net\x00"),
+                 record(b"\x04edge\x07example\x03net\x00", webscan_dns.DNS_TYPE_A, 30, socket.inet_aton("192.0.2.7"))]
+        self.assertEqual(webscan_dns.parse_dns_response(response(1, self.asked, chain)), (0, ["192.0.2.7"], 30))
+
+    def test_cname_without_addresses(self):
+        data = response(1, self.asked, [record(QUESTION_NAME, DNS_TYPE_CNAME, 600, b"\x04gone\xc0\x10")])
+        self.assertEqual(webscan_dns.parse_dns_response(data), (0, [], webscan_dns.DNS_NEGATIVE_TTL))
+
+    def test_nxdomain_takes_the_soa_minimum(self):
+        data = response(1, self.asked, authorities=[record(b"\xc0\x10", webscan_dns.DNS_TYPE_SOA, 900, soa(120))], rcode=webscan_dns.DNS_NXDOMAIN)
+        self.assertEqual(webscan_dns.parse_dns_response(data), (webscan_dns.DNS_NXDOMAIN, [], 120))
+        data = response(1, self.asked, authorities=[record(b"\xc0\x10", webscan_dns.DNS_TYPE_SOA, 60, soa(3600))], rcode=webscan_dns.DNS_NXDOMAIN)
+        self.assertEqual(webscan_dns.parse_dns_response(data)[2], 60)
+
+    def test_bad_address_lengths_are_skipped(self):
+        data = response(1, self.asked, [record(QUESTION_NAME, webscan_dns.DNS_TYPE_A, 60, b"\x01\x02\x03")])
+        self.assertEqual(webscan_dns.parse_dns_response(data)[1], [])
+
+    def test_truncated_packets_raise_parse_errors(self):
+        data = response(1, self.asked, [record(QUESTION_NAME, webscan_dns.DNS_TYPE_A, 60, socket.inet_aton("10.0.0.1"))])
+        for cut in (5, 14, len(data) - 16, len(data) - 12):
+            with self.assertRaises((struct.error, IndexError, ValueError)):
+                webscan_dns.parse_dns_response(data[:cut])
+
+
+class StubNameserver(asyncio.DatagramProtocol):
+    # Answers by the first label of the question: known names get an address, "missing" NXDOMAIN, "broken*" malformed
+    # replies of different kinds, "silent" nothing at all; anything else is the domain's wildcard
+    def __init__(self):
+        self.queries = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query_id, = struct.unpack(">H", data[:2])
+        end = data.index(b"\x00", 12) + 5
+        asked = data[12:end]
+        record_type, = struct.unpack(">H", asked[-4:-2])
+        label = asked[1:1 + asked[0]].decode()
+        self.queries.append((label, record_type))
+        if label == "silent":
+            return
+        if label == "missing":
+            reply = response(query_id, asked, authorities=[record(b"\xc0\x10", webscan_dns.DNS_TYPE_SOA, 300, soa(300))], rcode=webscan_dns.DNS_NXDOMAIN)
+        elif label == "broken1":
+            reply = response(query_id, asked, [record(QUESTION_NAME, webscan_dns.DNS_TYPE_A, 60, socket.inet_aton("10.0.0.9"))])[:-6]
+        elif label == "broken2":
+            reply = struct.pack(">HHHHHH", query_id, 0x8180, 1, 40, 0, 0) + asked
+        elif label == "broken3":
+            reply = data[:2]
+        elif label == "broken4":
+            reply = response(query_id, question("other.example.com"), [record(QUESTION_NAME, webscan_dns.DNS_TYPE_A, 60, socket.inet_aton("10.0.0.9"))])
+        elif label == "refused":
+            reply = response(query_id, asked, rcode=5)
+        elif record_type == webscan_dns.DNS_TYPE_AAAA:
+            reply = response(query_id, asked)
+        elif label in ("www", "mail"):
+            reply = response(query_id, asked, [record(QUESTION_NAME, webscan_dns.DNS_TYPE_A, 300, socket.inet_aton(f"10.0.1.{len(label)}"))])
+        else:
+            reply = response(query_id, asked, [record(QUESTION_NAME, webscan_dns.DNS_TYPE_A, 300, socket.inet_aton("10.0.0.100"))])
+        self.transport.sendto(reply, addr)
+
+
+class ResolveSubdomainsTest(unittest.TestCase):
+    def resolve(self, labels, cache=None):
+        async def run():
+            loop = asyncio.get_running_loop()
+            transport, nameserver = await loop.create_datagram_endpoint(StubNameserver, local_addr=("127.0.0.1", 0))
+            try:
+                resolver = webscan_dns.DnsResolver(transport.get_extra_info("sockname"), timeout=0.05, attempts=2)
+                return await webscan_dns.resolve_subdomains("example.com", labels, resolver, {} if cache is None else cache), nameserver
+            finally:
+                transport.close()
+        return asyncio.run(run())
+
+    def test_sorting(self):
+        cache = {}
+        result, _ = self.resolve(["www", "mail", "anything", "missing", "silent", "refused"], cache)
+        self.assertEqual(result["resolved"], {"www": ["10.0.1.3"], "mail": ["10.0.1.4"]})
+        self.assertEqual(result["wildcard"], ["anything"])
+        self.assertEqual(result["missing"], ["missing"])
+        self.assertEqual(sorted(result["failed"]), ["refused", "silent"])
+        self.assertEqual(result["wildcard_addresses"], ["10.0.0.100"])
+        self.assertFalse(result["unreachable"])
+        self.assertNotIn("silent", cache)
+        self.assertEqual(cache["missing"][1], [])
+
+    def test_malformed_replies_count_as_failed_lookups(self):
+        labels = ["broken1", "broken2", "broken3", "broken4", "www"]
+        result, nameserver = self.resolve(labels)
+        self.assertEqual(sorted(result["failed"]), labels[:4])
+        self.assertEqual(result["resolved"], {"www": ["10.0.1.3"]})
+        # Every malformed reply was asked again before giving up
+        self.assertEqual(sum(1 for label, _ in nameserver.queries if label == "broken1"), 2)
+
+    def test_fresh_cache_entries_need_no_query(self):
+        cache = {"www": [4102444800, ["10.9.9.9"]], "*": [4102444800, []]}
+        result, nameserver = self.resolve(["www"], cache)
+        self.assertEqual(result["resolved"], {"www": ["10.9.9.9"]})
+        self.assertEqual(nameserver.queries, [])
+
+    def test_name_without_a_record_asks_for_aaaa(self):
+        async def run():
+            loop = asyncio.get_running_loop()
+            transport, nameserver = await loop.create_datagram_endpoint(StubNameserver, local_addr=("127.0.0.1", 0))
+            resolver = webscan_dns.DnsResolver(transport.get_extra_info("sockname"), timeout=0.05, attempts=2)
+            await resolver.open()
+            try:
+                return await resolver.resolve("refused.example.com"), await resolver.resolve("missing.example.com"), nameserver
+            finally:
+                resolver.close()
+                transport.close()
+        refused, missing, nameserver = asyncio.run(run())
+        self.assertIsNone(refused)
+        self.assertEqual(missing, ([], 300))
+        self.assertEqual([record_type for label, record_type in nameserver.queries if label == "missing"], [webscan_dns.DNS_TYPE_A])
+
+
+if __name__ == "__main__":
+    unittest.main()
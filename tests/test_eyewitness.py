@@ -0,0 +1,148 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import webscan
+
+# Stands in for EyeWitness: writes two screenshots, leaving time for screens/ to be watched first, and then exits
+FAKE_EYEWITNESS = f"""#!{sys.executable}
+import os, sys, time
+output_dir = sys.argv[sys.argv.index("-d") + 1]
+screens = os.path.join(output_dir, "screens")
+os.makedirs(screens)
+for index in range(2):
+    time.sleep(0.2)
+    with open(os.path.join(screens, f"http.127.0.0.1.{{index}}.png"), "wb") as screen:
+        screen.write(b"screenshot %d" % index)
+"""
+
+
+def inotify_available():
+    try:
+        webscan.InotifyWatcher().close()
+    except OSError:
+        return False
+    return True
+
+
+@unittest.skipUnless(inotify_available(), "inotify is not available")
+class InotifyWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.watcher = webscan.InotifyWatcher()
+        self.addCleanup(self.watcher.close)
+
+    def test_events_name_the_watched_directory(self):
+        self.watcher.add(self.directory.name, webscan.INOTIFY_CREATE | webscan.INOTIFY_CLOSE_WRITE)
+        self.watcher.add(self.directory.name, webscan.INOTIFY_CREATE)
+        self.assertEqual(len(self.watcher.watches), 1)
+        with open(os.path.join(self.directory.name, "screen.png"), 'w') as screen:
+            screen.write("png")
+        events = self.watcher.wait(1)
+        self.assertEqual(events, [(self.directory.name, "screen.png"), (self.directory.name, "screen.png")])
+
+    def test_moved_in_files(self):
+        source = os.path.join(self.directory.name, "partial")
+        os.makedirs(os.path.join(self.directory.name, "screens"))
+        with open(source, 'w'):
+            pass
+        screens = os.path.join(self.directory.name, "screens")
+        self.watcher.add(screens, webscan.INOTIFY_CLOSE_WRITE | webscan.INOTIFY_MOVED_TO)
+        os.rename(source, os.path.join(screens, "done.png"))
+        self.assertEqual(self.watcher.wait(1), [(screens, "done.png")])
+
+    def test_timeout_and_wake(self):
+        self.watcher.add(self.directory.name, webscan.INOTIFY_CREATE)
+        started = time.monotonic()
+        self.assertEqual(self.watcher.wait(0.05), [])
+        read_end, write_end = os.pipe()
+        self.addCleanup(os.close, read_end)
+        self.addCleanup(os.close, write_end)
+        os.write(write_end, b"x")
+        self.assertEqual(self.watcher.wait(5, [read_end]), [])
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_missing_directory(self):
+        with self.assertRaises(OSError):
+            self.watcher.add(os.path.join(self.directory.name, "missing"), webscan.INOTIFY_CREATE)
+
+
+class InotifyUnavailableTest(unittest.TestCase):
+    def test_no_libc(self):
+        with mock.patch.object(webscan.ctypes.util, "find_library", return_value=None):
+            with self.assertRaises(OSError):
+                webscan.InotifyWatcher()
+
+
+class RunEyewitnessTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.directory.name)
+        bin_dir = os.path.join(self.directory.name, "bin")
+        os.makedirs(bin_dir)
+        with open(os.path.join(bin_dir, "eyewitness"), 'w') as script:
+            script.write(FAKE_EYEWITNESS)
+        os.chmod(os.path.join(bin_dir, "eyewitness"), 0o755)
+        environment = mock.patch.dict(os.environ, {"PATH": bin_dir + os.pathsep + os.environ.get("PATH", "")})
+        environment.start()
+        self.addCleanup(environment.stop)
+        with open("webscan-screen-urls-host-80.md", 'w') as urls:
+            urls.write("http://127.0.0.1/\n")
+        self.notebook = os.path.join(self.directory.name, "notebook")
+
+    def run_eyewitness(self):
+        started = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            webscan.run_eyewitness("host", 80, self.notebook)
+        return time.monotonic() - started
+
+    def check_screens(self):
+        destination = os.path.join(self.notebook, "00-eyewitness-host-80")
+        self.assertEqual(sorted(os.listdir(destination)), ["http.127.0.0.1.0.png", "http.127.0.0.1.1.png", "screenshot-clusters.md"])
+        with open(os.path.join(destination, "http.127.0.0.1.1.png"), 'rb') as screen:
+            self.assertEqual(screen.read(), b"screenshot 1")
+
+    @unittest.skipUnless(inotify_available() and hasattr(os, "pidfd_open"), "inotify or pidfd_open is not available")
+    def test_exit_ends_the_last_wait(self):
+        copies = []
+
+        def copy_screen(path, *args):
+            copies.append(os.path.basename(path))
+            webscan_copy_screen(path, *args)
+
+        webscan_copy_screen = webscan.copy_screen
+        with mock.patch.object(webscan, "copy_screen", copy_screen):
+            elapsed = self.run_eyewitness()
+        self.check_screens()
+        # The screenshots were picked up from their close-write events, and the wait ended with the process
+        self.assertEqual(copies, ["http.127.0.0.1.0.png", "http.127.0.0.1.1.png"])
+        self.assertLess(elapsed, 1)
+
+    def test_polling_without_inotify(self):
+        with mock.patch.object(webscan, "InotifyWatcher", side_effect=OSError("inotify is not available")):
+            self.run_eyewitness()
+        self.check_screens()
+
+    def test_without_pidfd(self):
+        with mock.patch.object(webscan.os, "pidfd_open", side_effect=OSError(38, "Function not implemented"), create=True):
+            self.run_eyewitness()
+        self.check_screens()
+
+    def test_old_output_is_removed(self):
+        os.makedirs("eyewitness-host-80/screens")
+        with open("eyewitness-host-80/screens/stale.png", 'wb') as stale:
+            stale.write(b"old run")
+        self.run_eyewitness()
+        self.check_screens()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import base64
+import json
+import unittest
+
+import webscan
+
+
+class HitTest(unittest.TestCase):
+    def test_json_round_trip(self):
+        hit = webscan.Hit("http://example.com/a?b=1", 301, 169, 5, 8, "ffuf")
+        copy = webscan.Hit.from_json(hit.to_json())
+        self.assertEqual([getattr(copy, name) for name in webscan.Hit.__slots__], ["http://example.com/a?b=1", 301, 169, 5, 8, "ffuf"])
+        self.assertNotIn("\n", hit.to_json())
+
+    def test_missing_fields_are_none(self):
+        hit = webscan.Hit.from_json('{"url": "http://example.com/", "extra": 1}')
+        self.assertEqual((hit.url, hit.status, hit.length, hit.source), ("http://example.com/", None, None, None))
+
+
+class ParseFeroxRecordTest(unittest.TestCase):
+    def test_response(self):
+        line = json.dumps({"type": "response", "url": "http://example.com/admin", "status": 200, "content_length": 1234,
+                           "word_count": 56, "line_count": 7, "method": "GET"})
+        hit = webscan.parse_ferox_record(line)
+        self.assertEqual((hit.url, hit.status, hit.length, hit.words, hit.lines, hit.source),
+                         ("http://example.com/admin", 200, 1234, 56, 7, "feroxbuster"))
+
+    def test_other_records_are_skipped(self):
+        for line in ('{"type": "statistics", "requests": 10}', '{"type": "configuration", "url": "http://example.com"}',
+                     '{"type": "response"}', '[1, 2]', 'not json', ''):
+            self.assertIsNone(webscan.parse_ferox_record(line), line)
+
+
+class ParseFfufRecordTest(unittest.TestCase):
+    def test_record_and_input(self):
+        line = json.dumps({"url": "http://example.com/login", "status": 302, "length": 0, "words": 1, "lines": 1,
+                           "input": {"FUZZ": base64.b64encode(b"login").decode()}})
+        hit = webscan.parse_ffuf_record(line)
+        self.assertEqual((hit.url, hit.status, hit.source), ("http://example.com/login", 302, "ffuf"))
+        self.assertEqual(webscan.ffuf_record_input(line), "login")
+
+    def test_plain_input(self):
+        # Older ffuf releases write the value as it is
+        self.assertEqual(webscan.ffuf_record_input('{"input": {"FUZZ": "a-b"}}'), "a-b")
+
+
+class ParseGobusterLineTest(unittest.TestCase):
+    def test_hit_with_size(self):
+        hit = webscan.parse_gobuster_line("http://example.com/images        (Status: 301) [Size: 169] [--> http://example.com/images/]\n")
+        self.assertEqual((hit.url, hit.status, hit.length, hit.source), ("http://example.com/images", 301, 169, "gobuster"))
+
+    def test_hit_without_size(self):
+        hit = webscan.parse_gobuster_line("http://example.com/.htaccess (Status: 403)")
+        self.assertEqual((hit.url, hit.status, hit.length), ("http://example.com/.htaccess", 403, None))
+
+    def test_other_lines_are_skipped(self):
+        for line in ("", "Progress: 1000 / 20476 (4.88%)", "[ERROR] context deadline exceeded", "/admin"):
+            self.assertIsNone(webscan.parse_gobuster_line(line), line)
+
+    def test_formatted_hit_parses_back(self):
+        hit = webscan.Hit("http://example.com/a", 200, 42)
+        parsed = webscan.parse_gobuster_line(webscan.format_gobuster_hit(hit))
+        self.assertEqual((parsed.url, parsed.status, parsed.length), ("http://example.com/a", 200, 42))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+import webscan
+import webscan_http
+
+
+def response(body, status=200, location=None):
+    headers = {"location": location} if location else {}
+    return webscan_http.HttpResponse(status, headers, body.encode(), True)
+
+
+class HostSignatureTest(unittest.TestCase):
+    def test_requested_name_is_taken_out(self):
+        first = webscan.host_signature(response("<h1>Welcome to dev.example.com</h1>"), "dev.example.com")
+        second = webscan.host_signature(response("<h1>Welcome to www.example.com</h1>"), "www.example.com")
+        self.assertEqual(first, second)
+
+    def test_tokens_and_timestamps_do_not_count(self):
+        first = webscan.host_signature(response("<p>Served at 10:41:07, request 1a2b3c4d5e6f7a8b9c0d</p>"), "a.example.com")
+        second = webscan.host_signature(response("<p>Served at 10:41:09, request 9f8e7d6c5b4a39281706</p>"), "b.example.com")
+        self.assertEqual(first, second)
+
+    def test_whitespace_does_not_count(self):
+        first = webscan.host_signature(response("<p>\n  Default site\n</p>"), "a.example.com")
+        second = webscan.host_signature(response("<p> Default site </p>"), "b.example.com")
+        self.assertEqual(first, second)
+
+    def test_status_body_and_redirect_tell_sites_apart(self):
+        signature = webscan.host_signature(response("Default site"), "a.example.com")
+        self.assertNotEqual(signature, webscan.host_signature(response("Default site", 403), "a.example.com"))
+        self.assertNotEqual(signature, webscan.host_signature(response("Admin panel"), "a.example.com"))
+        redirect = webscan.host_signature(response("", 302, "https://a.example.com/login"), "a.example.com")
+        self.assertEqual(redirect, webscan.host_signature(response("", 302, "https://b.example.com/login"), "b.example.com"))
+        self.assertNotEqual(redirect, webscan.host_signature(response("", 302, "https://sso.example.net/"), "a.example.com"))
+
+
+class ClusterHostsTest(unittest.TestCase):
+    def probes(self, pages, calibration=None):
+        return {label: webscan.HostProbe(response(body), f"{label}.example.com", calibration) if body is not None else None
+                for label, body in pages.items()}
+
+    def test_page_most_names_get_is_the_default_site(self):
+        pages = {label: f"Default page for {label}.example.com" for label in ("www", "mail", "ftp", "test")}
+        pages.update({"dev": "Dev site", "admin": "Admin panel", "down": None})
+        probes = self.probes(pages)
+        default, clusters = webscan.cluster_hosts(probes)
+        self.assertEqual(default, {probes["www"].signature})
+        self.assertEqual(clusters[probes["www"].signature], 4)
+        self.assertEqual(sum(clusters.values()), 6)
+
+    def test_small_groups_stay_virtual_hosts(self):
+        # Two aliases of one site, below HOST_CLUSTER_SIZE
+        probes = self.probes({"shop": "Shop", "store": "Shop", "dev": "Dev site"})
+        default, clusters = webscan.cluster_hosts(probes)
+        self.assertEqual(default, set())
+        self.assertEqual(clusters[probes["shop"].signature], 2)
+
+    def test_calibrated_page_is_the_default_site(self):
+        calibration = webscan.Calibration()
+        catch_all = response("Catch-all")
+        calibration.signatures["vhosts"] = webscan.Calibration.build_signatures(
+            [(catch_all.status, len(catch_all.body), catch_all.words, catch_all.lines, webscan.body_digest(catch_all.body))])
+        probes = self.probes({"random": "Catch-all", "dev": "Dev site"}, calibration)
+        self.assertTrue(probes["random"].calibrated)
+        self.assertFalse(probes["dev"].calibrated)
+        default, _ = webscan.cluster_hosts(probes)
+        self.assertEqual(default, {probes["random"].signature})
+
+    def test_probe_keeps_the_counts_and_not_the_body(self):
+        probe = webscan.HostProbe(response("one two\nthree"), "dev.example.com")
+        self.assertEqual((probe.status, probe.size, probe.words, probe.lines), (200, 13, 3, 2))
+        self.assertFalse(hasattr(probe, "body"))
+        self.assertEqual(webscan.host_line("dev", probe), f"{'dev':<25} [Status: 200, Size: 13, Words: 3, Lines: 2]\n")
+        self.assertEqual(webscan.host_line("down", None, " -> 10.0.0.1"), f"{'down':<25} [no response] -> 10.0.0.1\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
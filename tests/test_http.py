@@ -0,0 +1,114 @@
+import asyncio
+import unittest
+
+import webscan_http
+
+
+class ScriptedServer:
+    # Answers each request on any connection with the next canned response; a response wrapped in a tuple closes the connection
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while self.responses:
+                head = await reader.readuntil(b"\r\n\r\n")
+                self.requests.append(head.decode("latin-1"))
+                response = self.responses.pop(0)
+                close = isinstance(response, tuple)
+                writer.write(response[0] if close else response)
+                await writer.drain()
+                if close:
+                    break
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+
+class HttpConnectionPoolTest(unittest.TestCase):
+    def exchange(self, responses, paths, method="GET", controller=None):
+        server = ScriptedServer(responses)
+
+        async def run():
+            listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            pool = webscan_http.HttpConnectionPool(f"http://127.0.0.1:{port}", 1, timeout=5, controller=controller)
+            try:
+                return [await pool.request(path, method) for path in paths], pool
+            finally:
+                await pool.close()
+                listener.close()
+                await listener.wait_closed()
+
+        responses, pool = asyncio.run(run())
+        return responses, pool, server
+
+    def test_content_length_and_keep_alive(self):
+        body = b"hello world\nsecond line"
+        reply = b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: 23\r\n\r\n" + body
+        (first, second), pool, server = self.exchange([reply, reply], ["/a", "/b?x=1"])
+        self.assertEqual((first.status, first.body, first.words, first.lines), (200, body, 4, 2))
+        self.assertEqual(first.headers["content-type"], "text/plain")
+        self.assertTrue(first.keep_alive)
+        self.assertEqual(server.connections, 1)
+        self.assertTrue(server.requests[1].startswith("GET /b?x=1 HTTP/1.1\r\n"))
+        self.assertIn("\r\nHost: 127.0.0.1:", server.requests[0])
+        self.assertIn(f"\r\nUser-Agent: {webscan_http.ENGINE_USER_AGENT}\r\n", server.requests[0])
+        self.assertEqual((pool.requests_sent, pool.errors), (2, 0))
+
+    def test_chunked_body_with_extensions_and_trailers(self):
+        reply = (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                 b"5;name=value\r\nhello\r\n7\r\n, world\r\n0\r\nExpires: never\r\n\r\n")
+        (response,), _, _ = self.exchange([reply], ["/"])
+        self.assertEqual(response.body, b"hello, world")
+        self.assertTrue(response.keep_alive)
+
+    def test_body_until_close(self):
+        (response,), _, _ = self.exchange([(b"HTTP/1.1 200 OK\r\n\r\nall of it",)], ["/"])
+        self.assertEqual(response.body, b"all of it")
+        self.assertFalse(response.keep_alive)
+
+    def test_responses_without_a_body(self):
+        replies = [b"HTTP/1.1 204 No Content\r\n\r\n", b"HTTP/1.1 304 Not Modified\r\nContent-Length: 10\r\n\r\n",
+                   b"HTTP/1.1 301 Moved\r\nLocation: /next/\r\nContent-Length: 0\r\n\r\n"]
+        responses, _, server = self.exchange(replies, ["/a", "/b", "/c"])
+        self.assertEqual([(response.status, response.body) for response in responses], [(204, b""), (304, b""), (301, b"")])
+        self.assertEqual(responses[2].headers["location"], "/next/")
+        self.assertEqual(server.connections, 1)
+
+    def test_head_has_no_body(self):
+        (response,), _, server = self.exchange([b"HTTP/1.1 200 OK\r\nContent-Length: 1000\r\n\r\n"], ["/"], method="HEAD")
+        self.assertEqual((response.status, response.body), (200, b""))
+        self.assertTrue(server.requests[0].startswith("HEAD / HTTP/1.1"))
+
+    def test_connection_close_and_http_1_0(self):
+        replies = [b"HTTP/1.1 200 OK\r\nConnection: close\r\nContent-Length: 2\r\n\r\nok",
+                   b"HTTP/1.0 200 OK\r\nContent-Length: 2\r\n\r\nok",
+                   b"HTTP/1.0 200 OK\r\nConnection: Keep-Alive\r\nContent-Length: 2\r\n\r\nok"]
+        responses, _, _ = self.exchange(replies, ["/a", "/b", "/c"])
+        self.assertEqual([response.keep_alive for response in responses], [False, False, True])
+
+    def test_stale_connection_is_retried_on_a_new_one(self):
+        # The server drops the kept-alive connection after the first response
+        replies = [(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok",), b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n"]
+        (first, second), pool, server = self.exchange(replies, ["/a", "/b"])
+        self.assertEqual((first.status, second.status), (200, 404))
+        self.assertEqual(server.connections, 2)
+        self.assertEqual(pool.errors, 0)
+
+    def test_malformed_status_line_raises(self):
+        with self.assertRaises(ValueError):
+            self.exchange([(b"HTTP/1.1 abc OK\r\n\r\n",)], ["/"])
+
+    def test_back_off_status_is_reported_as_a_failure(self):
+        controller = webscan_http.ConcurrencyController(maximum=4)
+        self.exchange([b"HTTP/1.1 429 Too Many Requests\r\nContent-Length: 0\r\n\r\n", b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n"],
+                      ["/a", "/b"], controller=controller)
+        self.assertEqual((controller.failures, len(controller.latencies), controller.users), (1, 1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+
+import webscan
+
+
+def write_file(path, content):
+    with open(path, 'w') as output:
+        output.write(content)
+
+
+class StageJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "journal.json")
+        self.output = os.path.join(self.directory.name, "output.md")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def stage(self, *args):
+        def scan(*args):
+            pass
+        return webscan.Stage("scan", scan, *args, files=[self.output])
+
+    def test_completed_stage_survives_a_reload(self):
+        write_file(self.output, "results")
+        webscan.StageJournal(self.path).mark_complete(self.stage("http://target"))
+        journal = webscan.StageJournal(self.path)
+        self.assertTrue(journal.resuming)
+        self.assertTrue(journal.is_complete(self.stage("http://target")))
+
+    def test_changed_parameters_run_again(self):
+        write_file(self.output, "results")
+        journal = webscan.StageJournal(self.path)
+        journal.mark_complete(self.stage("http://target", 100))
+        self.assertFalse(journal.is_complete(self.stage("http://target", 200)))
+
+    def test_objects_are_reduced_to_their_type(self):
+        self.assertEqual(self.stage("url", 1, None, object()).params(), ["scan", "url", 1, None, "object"])
+
+    def test_changed_or_missing_outputs_run_again(self):
+        write_file(self.output, "results")
+        journal = webscan.StageJournal(self.path)
+        journal.mark_complete(self.stage())
+        write_file(self.output, "other results")
+        self.assertFalse(journal.is_complete(self.stage()))
+        os.remove(self.output)
+        self.assertFalse(journal.is_complete(self.stage()))
+
+    def test_stage_without_its_files_is_not_marked(self):
+        journal = webscan.StageJournal(self.path)
+        journal.mark_complete(self.stage())
+        self.assertFalse(journal.is_complete(self.stage()))
+        self.assertFalse(journal.resuming)
+
+    def test_fresh_forgets_everything(self):
+        write_file(self.output, "results")
+        journal = webscan.StageJournal(self.path)
+        journal.mark_complete(self.stage())
+        journal.save_offset("ffuf", 1200)
+        journal = webscan.StageJournal(self.path, fresh=True)
+        self.assertFalse(journal.is_complete(self.stage()))
+        self.assertEqual(journal.offset("ffuf"), 0)
+
+    def test_offsets_are_dropped_once_the_stage_completes(self):
+        write_file(self.output, "results")
+        journal = webscan.StageJournal(self.path)
+        journal.checkpoint("scan").update(300, force=True)
+        self.assertEqual(webscan.StageJournal(self.path).offset("scan"), 300)
+        journal.mark_complete(self.stage())
+        self.assertEqual(webscan.StageJournal(self.path).offset("scan"), 0)
+
+
+class RunStagesTest(unittest.TestCase):
+    # plan -> discover -> report, where plan writes the file discover reads, like plan-candidates and the brute-forcers
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.directory.name, "journal.json")
+        self.files = {name: os.path.join(self.directory.name, f"{name}.txt") for name in ("plan", "discover", "report")}
+        self.plan_content = "words"
+        self.ran = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_once(self):
+        journal = webscan.StageJournal(self.journal_path)
+
+        def plan():
+            self.ran.append("plan")
+            write_file(self.files["plan"], self.plan_content)
+
+        def discover():
+            self.ran.append("discover")
+            with open(self.files["plan"]) as words:
+                write_file(self.files["discover"], words.read().upper())
+
+        def report():
+            self.ran.append("report")
+            write_file(self.files["report"], "done")
+
+        stages = [
+            webscan.Stage("plan", plan, outputs=["words"], files=[self.files["plan"]]),
+            webscan.Stage("discover", discover, inputs=["words"], outputs=["hits"], files=[self.files["discover"]]),
+            webscan.Stage("report", report, inputs=["hits"], files=[self.files["report"]]),
+        ]
+        for stage in stages:
+            stage.group = "target"
+            stage.journal = journal
+        self.ran = []
+        completed, failed = webscan.run_stages(stages, max_jobs=2)
+        self.assertFalse(failed)
+        self.assertEqual(len(completed), 3)
+        return self.ran
+
+    def test_second_run_skips_completed_stages(self):
+        self.assertEqual(self.run_once(), ["plan", "discover", "report"])
+        self.assertEqual(self.run_once(), [])
+
+    def test_stage_after_one_that_ran_again_runs_too(self):
+        self.run_once()
+        write_file(self.files["plan"], "stale")
+        # discover comes out as before, so report has nothing new to work with
+        self.assertEqual(self.run_once(), ["plan", "discover"])
+
+    def test_changed_output_of_a_later_stage_only_reruns_that_stage(self):
+        self.run_once()
+        os.remove(self.files["report"])
+        self.assertEqual(self.run_once(), ["report"])
+
+    def test_incomplete_stage_is_left_out_of_the_journal(self):
+        journal = webscan.StageJournal(self.journal_path)
+
+        def cut_short():
+            write_file(self.files["discover"], "partial")
+            return False
+
+        stage = webscan.Stage("discover", cut_short, files=[self.files["discover"]])
+        stage.journal = journal
+        completed, _ = webscan.run_stages([stage], max_jobs=1)
+        self.assertIn(stage, completed)
+        self.assertFalse(webscan.StageJournal(self.journal_path).is_complete(stage))
+
+
+if __name__ == "__main__":
+    unittest.main()
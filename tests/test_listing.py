@@ -0,0 +1,90 @@
+import hashlib
+import io
+import json
+import os
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+import webscan
+
+
+class HumanSizeTest(unittest.TestCase):
+    def test_bytes(self):
+        self.assertEqual([webscan.human_size(size) for size in (0, 1, 1023)], ["0", "1", "1023"])
+
+    def test_rounds_up_like_ls(self):
+        self.assertEqual(webscan.human_size(1024), "1.0K")
+        self.assertEqual(webscan.human_size(1025), "1.1K")
+        self.assertEqual(webscan.human_size(1536), "1.5K")
+        self.assertEqual(webscan.human_size(10 * 1024 - 1), "10K")
+        self.assertEqual(webscan.human_size(10 * 1024 + 1), "11K")
+        self.assertEqual(webscan.human_size(1024 ** 2 - 1), "1.0M")
+        self.assertEqual(webscan.human_size(1024 ** 2), "1.0M")
+        self.assertEqual(webscan.human_size(5 * 1024 ** 3), "5.0G")
+
+
+class ListDirectoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.directory.name, "host:80")
+        os.makedirs(os.path.join(self.root, "b", "c"))
+        self.write("index.html", b"<!DOCTYPE html><p>hi</p>")
+        self.write("b/logo", b"\x89PNG\r\n\x1a\n" + b"\0" * 100)
+        self.write("b/c/notes.txt", b"plain")
+        os.symlink("index.html", os.path.join(self.root, "link"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, data):
+        with open(os.path.join(self.root, name), 'wb') as output:
+            output.write(data)
+
+    def list(self):
+        listing, manifest = io.StringIO(), io.StringIO()
+        webscan.list_directory(self.root, listing, manifest)
+        return listing.getvalue(), [json.loads(line) for line in manifest.getvalue().splitlines()]
+
+    def test_directories_are_listed_depth_first(self):
+        listing, _ = self.list()
+        headers = [line[:-1] for line in listing.splitlines() if line.endswith(":")]
+        self.assertEqual(headers, [self.root, os.path.join(self.root, "b"), os.path.join(self.root, "b", "c")])
+        self.assertEqual(listing.count("\ntotal "), 3)
+
+    def test_rows(self):
+        listing, _ = self.list()
+        section = listing.split("\n\n")[0].splitlines()
+        self.assertEqual([row.split()[-1] for row in section[2:]], [".", "..", "b", "index.html", "index.html"])
+        self.assertTrue(section[-1].startswith("l") and section[-1].endswith("link -> index.html"))
+        index = next(row for row in section if row.endswith(" index.html") and row.startswith("-"))
+        self.assertEqual(index.split()[0], stat.filemode(os.stat(os.path.join(self.root, "index.html")).st_mode))
+        self.assertEqual(index.split()[4], "24")
+
+    def test_manifest_has_every_regular_file(self):
+        _, records = self.list()
+        self.assertEqual([os.path.relpath(record["path"], self.root) for record in records], ["index.html", "b/logo", "b/c/notes.txt"])
+        logo = records[1]
+        self.assertEqual((logo["size"], logo["mime"]), (108, "image/png"))
+        self.assertEqual(logo["sha256"], hashlib.sha256(b"\x89PNG\r\n\x1a\n" + b"\0" * 100).hexdigest())
+        self.assertEqual([record["mime"] for record in records], ["text/html", "image/png", "text/plain"])
+        self.assertEqual(list(records[0]), ["path", "size", "mtime", "sha256", "mime"])
+
+    def test_run_ls_and_tee_writes_the_listing_and_manifest(self):
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.directory.name)
+        with mock.patch.object(webscan, "convert_md_to_html") as convert:
+            webscan.run_ls_and_tee("host:80", "host", 80, self.directory.name)
+        convert.assert_called_once_with("022-webscan-host-80-wget-directory-output.md", self.directory.name)
+        records = list(webscan.iter_manifest("022-webscan-host-80-wget-manifest.jsonl"))
+        self.assertEqual(len(records), 3)
+        with open("022-webscan-host-80-wget-directory-output.md") as listing:
+            self.assertTrue(listing.read().startswith("host:80:\ntotal "))
+
+    def test_missing_directory(self):
+        self.assertFalse(webscan.run_ls_and_tee(os.path.join(self.directory.name, "missing"), "host", 80, self.directory.name))
+
+
+if __name__ == "__main__":
+    unittest.main()
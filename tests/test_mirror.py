@@ -0,0 +1,111 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import webscan
+
+SITE = {
+    "/app/": ("text/html", b'<a href="page?id=1">p</a><a href="/app/sub/">s</a><a href="http://other.example/x">o</a>'
+                           b'<a href="/outside">out</a>'),
+    "/app/page?id=1": ("text/html", b"<p>page</p>"),
+    "/app/sub/": ("text/html", b'<img src="../logo.png">'),
+    "/app/logo.png": ("image/png", b"\x89PNG"),
+    "/outside": ("text/html", b"<p>outside</p>"),
+}
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in SITE:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        content_type, body = SITE[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MirrorPathTest(unittest.TestCase):
+    def test_directories_get_an_index(self):
+        self.assertEqual(webscan.mirror_path("root", "/", "", "text/html"), os.path.join("root", "index.html"))
+        self.assertEqual(webscan.mirror_path("root", "/a/b/", "", "text/html"), os.path.join("root", "a", "b", "index.html"))
+
+    def test_query_stays_in_the_file_name(self):
+        self.assertEqual(webscan.mirror_path("root", "/search", "q=1&p=2", "text/html"), os.path.join("root", "search?q=1&p=2.html"))
+        self.assertEqual(webscan.mirror_path("root", "/data.json", "v=3", "application/json"), os.path.join("root", "data.json?v=3"))
+
+    def test_html_and_css_get_their_extension(self):
+        self.assertEqual(webscan.mirror_path("root", "/page.HTM", "", "text/html"), os.path.join("root", "page.HTM"))
+        self.assertEqual(webscan.mirror_path("root", "/style", "", "text/css"), os.path.join("root", "style.css"))
+        self.assertEqual(webscan.mirror_path("root", "/logo.png", "", "image/png"), os.path.join("root", "logo.png"))
+
+    def test_dot_segments_stay_inside_the_root(self):
+        self.assertEqual(webscan.mirror_path("root", "/../../etc/passwd", "", "text/plain"), os.path.join("root", "etc", "passwd"))
+        self.assertEqual(webscan.mirror_path("root", "/a/%2e%2e/%2e%2e/b", "", "text/plain"), os.path.join("root", "b"))
+        self.assertEqual(webscan.mirror_path("root", "/a/./b/../c", "", "text/plain"), os.path.join("root", "a", "c"))
+
+
+class ExtractLinksTest(unittest.TestCase):
+    def test_links_forms_and_requisites(self):
+        body = (b'<a href="/a">a</a><form action="login.php"></form><img src="i.png" srcset="s1.png 1x, s2.png 2x">'
+                b'<div style="background: url(bg.png)"></div><style>p { background: url("/p.png") }</style>')
+        self.assertEqual(webscan.extract_links(body, "text/html"), ["/a", "login.php", "i.png", "s1.png", "s2.png", "bg.png", "/p.png"])
+
+    def test_css_urls(self):
+        self.assertEqual(webscan.extract_links(b"a { b: url(x.png) } c { d: url( 'y.gif' ) }", "text/css"), ["x.png", "y.gif"])
+
+    def test_broken_markup(self):
+        self.assertEqual(webscan.extract_links(b'<a href="/ok">x</a><a href=', "text/html"), ["/ok"])
+
+
+class SiteMirrorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(webscan, "CACHE_DIR", os.path.join(self.directory.name, "cache"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.origin = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def test_scope(self):
+        mirror = webscan.SiteMirror(self.origin + "/app/index.php", self.directory.name)
+        base = self.origin + "/app/index.php"
+        self.assertEqual(mirror._resolve(base, "sub/x#top"), self.origin + "/app/sub/x")
+        self.assertIsNone(mirror._resolve(base, "/outside"))
+        self.assertEqual(mirror._resolve(base, "/static/site.css", requisite=True), self.origin + "/static/site.css")
+        self.assertIsNone(mirror._resolve(base, "http://other.example/app/x", requisite=True))
+        self.assertIsNone(mirror._resolve(base, "mailto:someone@example.com"))
+
+    def test_crawl_stays_below_the_start_directory(self):
+        root = os.path.join(self.directory.name, "mirror")
+        counts = webscan.run_async(webscan.SiteMirror(self.origin + "/app/", root, connections=2).crawl())
+        saved = sorted(os.path.relpath(os.path.join(path, name), root) for path, _, names in os.walk(root) for name in names)
+        self.assertEqual(saved, ["app/index.html", "app/logo.png", "app/page?id=1.html", "app/sub/index.html"])
+        self.assertEqual(counts["saved"], 4)
+
+    def test_run_mirror_returns_its_directory(self):
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.directory.name)
+        root = webscan.run_mirror(self.origin + "/app/", connections=2)
+        self.assertEqual(root, f"127.0.0.1:{self.server.server_address[1]}")
+        self.assertTrue(os.path.isfile(os.path.join(root, "app", "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
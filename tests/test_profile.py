@@ -0,0 +1,146 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import webscan
+
+# Grows to about 64MB, burns some CPU, complains on stderr and fails
+HUNGRY_CHILD = """
+import sys, time
+block = bytearray(64 * 1024 * 1024)
+for index in range(0, len(block), 4096):
+    block[index] = 1
+end = time.process_time() + 0.1
+while time.process_time() < end:
+    pass
+sys.stderr.write("x" * 5000 + "out of patience")
+sys.exit(3)
+"""
+
+
+def stage_profile(name, group=None):
+    stage = webscan.Stage(name, print)
+    stage.group = group
+    return webscan.StageProfile(stage)
+
+
+class ProfiledPopenTest(unittest.TestCase):
+    def setUp(self):
+        self.profile = stage_profile("ffuf", "host-80")
+        webscan.STAGE_CONTEXT.profile = self.profile
+        self.addCleanup(setattr, webscan.STAGE_CONTEXT, "profile", None)
+
+    def test_rusage_is_charged_to_the_stage(self):
+        process = webscan.ProfiledPopen([sys.executable, "-c", HUNGRY_CHILD], stdout=subprocess.DEVNULL, stderr=webscan.STDERR_TAIL)
+        self.assertIn(process, webscan.RUNNING_PROCESSES)
+        self.assertEqual(process.wait(), 3)
+        self.assertNotIn(process, webscan.RUNNING_PROCESSES)
+        self.assertGreaterEqual(self.profile.child_max_rss, 64 * 1024 * 1024)
+        self.assertGreaterEqual(self.profile.child_user + self.profile.child_system, 0.1)
+        command, = self.profile.commands
+        self.assertEqual(command["exit_code"], 3)
+        self.assertEqual(command["max_rss"], self.profile.child_max_rss)
+        self.assertTrue(command["command"].startswith(sys.executable + " -c"))
+        self.assertEqual(len(command["stderr"]), webscan.PROFILE_STDERR_TAIL)
+        self.assertTrue(command["stderr"].endswith("out of patience"))
+        self.assertEqual(self.profile.to_dict(0)["failed_commands"], 1)
+
+    def test_children_add_up(self):
+        for _ in range(2):
+            self.assertEqual(webscan.run_process([sys.executable, "-c", "pass"]).returncode, 0)
+        process = webscan.ProfiledPopen("exit 1", shell=True)
+        while process.poll() is None:
+            pass
+        self.assertEqual(process.poll(), 1)
+        self.assertEqual([command["exit_code"] for command in self.profile.commands], [0, 0, 1])
+        self.assertEqual(self.profile.commands[2]["command"], "exit 1")
+
+    def test_wait_with_timeout(self):
+        process = webscan.ProfiledPopen([sys.executable, "-c", "import time; time.sleep(5)"])
+        with self.assertRaises(subprocess.TimeoutExpired):
+            process.wait(0.1)
+        process.kill()
+        self.assertEqual(process.wait(5), -9)
+        self.assertEqual(len(self.profile.commands), 1)
+
+    def test_unprofiled_threads_are_not_charged(self):
+        webscan.STAGE_CONTEXT.profile = None
+        webscan.run_process([sys.executable, "-c", "pass"])
+        self.assertEqual(self.profile.commands, [])
+
+    def test_nothing_starts_once_stopping(self):
+        webscan.STOP.set()
+        self.addCleanup(webscan.STOP.clear)
+        with self.assertRaises(OSError):
+            webscan.ProfiledPopen([sys.executable, "-c", "pass"])
+
+
+class RunProfileTest(unittest.TestCase):
+    def setUp(self):
+        self.run = webscan.RunProfile("profile")
+        self.run.started, self.run.started_at, self.run.finished = 100.0, 1700000000.0, 112.5
+        scan = webscan.Stage("ffuf", print)
+        scan.group = 'host "a"\\b'
+        finished = self.run.add(scan)
+        finished.status = "finished"
+        finished.ready, finished.started, finished.finished = 101.0, 101.5, 111.0
+        finished.thread_cpu, finished.child_user, finished.child_system = 0.25, 3.5, 0.5
+        finished.child_max_rss, finished.requests, finished.hits = 1048576, 4000, 7
+        finished.commands = [{"exit_code": 0}, {"exit_code": 1}]
+        self.run.add(webscan.Stage("report", print))
+        self.run.sample(2, 1)
+        self.run.sample(1, 3)
+
+    def test_prometheus_text_format(self):
+        text = self.run.prometheus()
+        self.assertTrue(text.endswith("\n"))
+        lines = text.splitlines()
+        self.assertEqual(lines[:3], ["# HELP webscan_run_start_timestamp_seconds When the run started.",
+                                     "# TYPE webscan_run_start_timestamp_seconds gauge",
+                                     "webscan_run_start_timestamp_seconds 1700000000.0"])
+        self.assertIn("webscan_run_wall_seconds 12.5", lines)
+        self.assertIn("webscan_run_peak_running_stages 2", lines)
+        self.assertIn("webscan_run_peak_waiting_stages 3", lines)
+        target = 'target="host \\"a\\"\\\\b"'
+        self.assertIn(f'webscan_stage_status{{{target},stage="ffuf",status="finished"}} 1', lines)
+        self.assertIn('webscan_stage_status{target="",stage="report",status="pending"} 1', lines)
+        self.assertIn(f'webscan_stage_wall_seconds{{{target},stage="ffuf"}} 9.5', lines)
+        self.assertIn(f'webscan_stage_wait_seconds{{{target},stage="ffuf"}} 0.5', lines)
+        self.assertIn(f'webscan_stage_blocked_seconds{{{target},stage="ffuf"}} 1.0', lines)
+        self.assertIn(f'webscan_stage_child_max_rss_bytes{{{target},stage="ffuf"}} 1048576', lines)
+        self.assertIn(f'webscan_stage_failed_commands{{{target},stage="ffuf"}} 1', lines)
+        self.assertIn(f'webscan_stage_child_cpu_seconds{{{target},stage="ffuf",mode="user"}} 3.5', lines)
+        self.assertIn(f'webscan_stage_child_cpu_seconds{{{target},stage="ffuf",mode="system"}} 0.5', lines)
+        # A stage that never ran has no timings, but every counter
+        self.assertFalse([line for line in lines if line.startswith("webscan_stage_wall_seconds{") and 'stage="report"' in line])
+        self.assertIn('webscan_stage_requests{target="",stage="report"} 0', lines)
+
+    def test_each_metric_is_declared_once_before_its_samples(self):
+        declared = []
+        for line in self.run.prometheus().splitlines():
+            if line.startswith("# TYPE "):
+                declared.append(line.split()[2])
+            elif not line.startswith("# HELP "):
+                name = line.split("{")[0].split()[0]
+                self.assertEqual(name, declared[-1])
+        self.assertEqual(len(declared), len(set(declared)))
+        self.assertEqual(len(declared), 4 + 1 + len(webscan.RunProfile.METRICS) + 1)
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.run.directory = os.path.join(directory, "profile")
+            paths = self.run.write()
+            self.assertEqual(sorted(os.listdir(self.run.directory)), sorted([webscan.PROFILE_JSON, webscan.PROFILE_PROMETHEUS]))
+            with open(paths[0]) as report:
+                report = json.load(report)
+            with open(paths[1]) as textfile:
+                self.assertEqual(textfile.read(), self.run.prometheus())
+        self.assertEqual((report["wall"], report["peak_running"]), (12.5, 2))
+        self.assertEqual([stage["stage"] for stage in report["stages"]], ["ffuf", "report"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import heapq
+import unittest
+
+import webscan
+
+
+class RecursionQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = webscan.RecursionQueue("http://Host:80/app", max_depth=2)
+
+    def offer(self, path, status=200, length=100):
+        return self.queue.offer(webscan.Hit(f"http://host{path}", status, length))
+
+    def queued(self):
+        return [entry[2] for entry in sorted(self.queue.heap)]
+
+    def test_directory_shapes(self):
+        self.assertEqual(self.offer("/app/slash/", 200), 10)
+        self.assertEqual(self.offer("/app/moved", 301), 10)
+        self.assertEqual(self.offer("/app/locked", 403), 13)
+        # A plain 200 without an extension may be a directory
+        self.assertEqual(self.offer("/app/maybe", 200), 14)
+        self.assertEqual(self.offer("/app/unknown", None), 14)
+        self.assertIsNone(self.offer("/app/index.php", 200))
+        self.assertIsNone(self.offer("/app/file.bak", 301))
+        self.assertIsNone(self.offer("/app/gone", 404))
+        self.assertIsNone(self.offer("/app/error", 500))
+
+    def test_each_directory_is_queued_once(self):
+        self.assertIsNotNone(self.offer("/app/admin/"))
+        self.assertIsNone(self.offer("/app/admin", 301))
+        self.assertIsNone(self.offer("/app//admin/"))
+        self.assertIsNone(self.offer("/app/x/../admin/"))
+        self.assertEqual(self.queued(), ["/app/admin/"])
+
+    def test_base_path_origin_and_depth(self):
+        self.assertIsNone(self.offer("/app/"))
+        self.assertIsNone(self.offer("/other/"))
+        self.assertIsNone(self.offer("/application/"))
+        self.assertIsNone(self.queue.offer(webscan.Hit("http://elsewhere/app/dir/", 200)))
+        self.assertIsNone(self.queue.offer(webscan.Hit("https://host/app/dir/", 200)))
+        self.assertEqual(self.offer("/app/a/b/"), 20)
+        self.assertIsNone(self.offer("/app/a/b/c/"))
+
+    def test_names_and_statuses_change_the_priority(self):
+        self.assertEqual(self.offer("/app/Admin/"), 5)
+        self.assertEqual(self.offer("/app/css/"), 25)
+        self.assertEqual(self.offer("/app/empty/", 200, 0), 12)
+        self.assertEqual(self.offer("/app/members", 401), 13)
+        self.assertEqual(self.offer("/app/%62ackup/"), 5)
+        self.assertEqual(self.queued(), ["/app/Admin/", "/app/backup/", "/app/empty/", "/app/members/", "/app/css/"])
+
+    def test_ties_keep_arrival_order(self):
+        for name in ("one", "two", "three"):
+            self.offer(f"/app/{name}/")
+        self.assertEqual([heapq.heappop(self.queue.heap)[2] for _ in range(3)], ["/app/one/", "/app/two/", "/app/three/"])
+
+    def test_query_is_ignored(self):
+        self.assertEqual(self.offer("/app/search?q=1", 302), 10)
+        self.assertEqual(self.queue.heap[0][2:], ["/app/search/", 1, 0, None])
+
+    def test_root_base(self):
+        queue = webscan.RecursionQueue("http://host", max_depth=1)
+        self.assertEqual(queue.offer(webscan.Hit("http://host/admin/", 200)), 5)
+        self.assertIsNone(queue.offer(webscan.Hit("http://host/", 200)))
+        self.assertIsNone(queue.offer(webscan.Hit("http://host/admin/panel/", 200)))
+
+
+if __name__ == "__main__":
+    unittest.main()
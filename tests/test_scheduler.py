@@ -0,0 +1,113 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import webscan
+
+
+class MultiTargetSchedulingTest(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = {}
+        self.peak = {}
+        self.order = []
+
+    def stage(self, group, name, inputs=(), outputs=()):
+        def work():
+            with self.lock:
+                self.running[group] = self.running.get(group, 0) + 1
+                self.peak[group] = max(self.peak.get(group, 0), self.running[group])
+                self.order.append(f"{group}/{name}")
+            time.sleep(0.02)
+            with self.lock:
+                self.running[group] -= 1
+
+        stage = webscan.Stage(name, work, inputs=inputs, outputs=outputs)
+        stage.group = group
+        return stage
+
+    def test_per_target_limit(self):
+        stages = [self.stage(group, f"tool{index}") for group in ("a", "b") for index in range(4)]
+        completed, failed = webscan.run_stages(stages, max_jobs=4, max_group_jobs=1)
+        self.assertEqual((len(completed), failed), (8, set()))
+        self.assertEqual(self.peak, {"a": 1, "b": 1})
+
+    def test_targets_are_interleaved(self):
+        stages = [self.stage(group, f"tool{index}") for group in ("a", "b") for index in range(3)]
+        webscan.run_stages(stages, max_jobs=1)
+        self.assertEqual([name.split("/")[0] for name in self.order], ["a", "b", "a", "b", "a", "b"])
+
+    def test_inputs_come_from_the_same_target_then_shared_stages(self):
+        shared = self.stage(None, "plan", outputs=["candidates"])
+        stages = [shared]
+        for group in ("a", "b"):
+            stages.append(self.stage(group, "discover", inputs=["candidates"], outputs=["hits"]))
+            stages.append(self.stage(group, "report", inputs=["hits"]))
+        webscan.run_stages(stages, max_jobs=4)
+        for group in ("a", "b"):
+            self.assertLess(self.order.index("None/plan"), self.order.index(f"{group}/discover"))
+            self.assertLess(self.order.index(f"{group}/discover"), self.order.index(f"{group}/report"))
+
+
+class UnchangedOutputTest(unittest.TestCase):
+    # A planner without a journal entry runs every time, like plan-candidates; what follows it must not
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.directory.name, "journal.json")
+        self.plan_file = os.path.join(self.directory.name, "plan.txt")
+        self.hits_file = os.path.join(self.directory.name, "hits.txt")
+        self.plan_content = "words"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_once(self, journaled=True):
+        ran = []
+
+        def plan():
+            ran.append("plan")
+            with open(self.plan_file, 'w') as output:
+                output.write(self.plan_content)
+
+        def discover():
+            ran.append("discover")
+            with open(self.plan_file) as words, open(self.hits_file, 'w') as output:
+                output.write(words.read().upper())
+
+        journal = webscan.StageJournal(self.journal_path)
+        planner = webscan.Stage("plan", plan, outputs=["words"], files=[self.plan_file])
+        discovery = webscan.Stage("discover", discover, inputs=["words"], files=[self.hits_file])
+        discovery.journal = journal if journaled else None
+        webscan.run_stages([planner, discovery], max_jobs=2)
+        return ran
+
+    def test_rewriting_the_same_files_does_not_rerun_the_rest(self):
+        self.run_once()
+        self.assertEqual(self.run_once(), ["plan"])
+
+    def test_changed_files_rerun_the_rest(self):
+        self.run_once()
+        self.plan_content = "other words"
+        self.assertEqual(self.run_once(), ["plan", "discover"])
+
+    def test_untouched_files_are_not_hashed_again(self):
+        self.run_once()
+        with mock.patch.object(webscan, "hash_file", wraps=webscan.hash_file) as hashed:
+            planner = webscan.Stage("plan", lambda: None, outputs=["words"], files=[self.plan_file])
+            planner.feeds_journal = True
+            planner.run()
+        self.assertTrue(planner.unchanged)
+        self.assertEqual(hashed.call_count, 1)
+
+    def test_nothing_is_hashed_without_a_journal(self):
+        with mock.patch.object(webscan, "hash_file") as hashed:
+            self.run_once(journaled=False)
+            self.run_once(journaled=False)
+        hashed.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+import json
+import os
+import random
+import struct
+import tempfile
+import threading
+import unittest
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import webscan
+import webscan_imaging
+
+
+def paeth(left, above, upper_left):
+    estimate = left + above - upper_left
+    distances = abs(estimate - left), abs(estimate - above), abs(estimate - upper_left)
+    if distances[0] <= distances[1] and distances[0] <= distances[2]:
+        return left
+    return above if distances[1] <= distances[2] else upper_left
+
+
+def filter_scanline(filter_type, line, previous, bpp):
+    # Straightforward PNG encoder side, to check the decoder against
+    out = bytearray()
+    for index, value in enumerate(line):
+        left = line[index - bpp] if index >= bpp else 0
+        above = previous[index]
+        upper_left = previous[index - bpp] if index >= bpp else 0
+        predictor = [0, left, above, (left + above) >> 1, paeth(left, above, upper_left)][filter_type]
+        out.append((value - predictor) & 0xFF)
+    return bytes(out)
+
+
+def chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def write_png(path, rows, color_type, filters=(0,), palette=None, interlace=0, depth=8):
+    channels = webscan_imaging.PNG_CHANNELS[color_type]
+    height, width = len(rows), len(rows[0]) // channels
+    previous = bytes(len(rows[0]))
+    raw = bytearray()
+    for index, row in enumerate(rows):
+        filter_type = filters[index % len(filters)]
+        raw += bytes([filter_type]) + filter_scanline(filter_type, row, previous, channels)
+        previous = row
+    data = zlib.compress(bytes(raw))
+    with open(path, 'wb') as png:
+        png.write(webscan_imaging.PNG_SIGNATURE)
+        png.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, depth, color_type, 0, 0, interlace)))
+        if palette:
+            png.write(chunk(b"PLTE", b"".join(bytes(entry) for entry in palette)))
+        # Split the image data over several chunks, like encoders do for large images
+        for start in range(0, len(data), 1000):
+            png.write(chunk(b"IDAT", data[start:start + 1000]))
+        png.write(chunk(b"IEND", b""))
+
+
+def grey_image(width=96, height=64, seed=1):
+    # Smooth shapes plus a little noise, so every filter type has something to predict
+    generator = random.Random(seed)
+    return [bytes(min(255, (x * 255 // width + (64 if (x // 24 + y // 16) % 2 else 0) + generator.randrange(4)))
+                  for x in range(width)) for y in range(height)]
+
+
+class UnfilterScanlineTest(unittest.TestCase):
+    def test_every_filter_type(self):
+        generator = random.Random(7)
+        for bpp in (1, 2, 3, 4):
+            previous = bytes(generator.randrange(256) for _ in range(bpp * 33))
+            line = bytes(generator.randrange(256) for _ in range(bpp * 33))
+            for filter_type in range(5):
+                raw = filter_scanline(filter_type, line, previous, bpp)
+                self.assertEqual(bytes(webscan_imaging.unfilter_scanline(filter_type, raw, previous, bpp)), line, (bpp, filter_type))
+
+    def test_first_scanline_has_nothing_above(self):
+        line = bytes(range(0, 240, 3))
+        for filter_type in range(5):
+            raw = filter_scanline(filter_type, line, bytes(len(line)), 1)
+            self.assertEqual(bytes(webscan_imaging.unfilter_scanline(filter_type, raw, None, 1)), line)
+
+    def test_add_scanlines_wraps_each_byte(self):
+        self.assertEqual(webscan_imaging.add_scanlines(b"\xff\x80\x01\x7f", b"\x01\x80\xff\x01"), b"\x00\x00\x00\x80")
+
+
+class PngDhashTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.rows = grey_image()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def png(self, name, rows, color_type, **kwargs):
+        path = os.path.join(self.directory.name, name)
+        write_png(path, rows, color_type, **kwargs)
+        return path
+
+    def test_filters_do_not_change_the_hash(self):
+        expected = webscan_imaging.png_dhash(self.png("none.png", self.rows, 0))
+        self.assertNotIn(expected, (None, 0))
+        for filters in ((1,), (2,), (3,), (4,), (0, 1, 2, 3, 4), (4, 2, 2, 3, 1)):
+            self.assertEqual(webscan_imaging.png_dhash(self.png("filtered.png", self.rows, 0, filters=filters)), expected, filters)
+
+    def test_colour_types_with_the_same_greys(self):
+        expected = webscan_imaging.png_dhash(self.png("grey.png", self.rows, 0))
+        rgb = [bytes(value for value in row for _ in range(3)) for row in self.rows]
+        rgba = [bytes(channel for value in row for channel in (value, value, value, 255)) for row in self.rows]
+        grey_alpha = [bytes(channel for value in row for channel in (value, 255)) for row in self.rows]
+        self.assertEqual(webscan_imaging.png_dhash(self.png("rgb.png", rgb, 2, filters=(4, 1))), expected)
+        self.assertEqual(webscan_imaging.png_dhash(self.png("rgba.png", rgba, 6, filters=(2, 3))), expected)
+        self.assertEqual(webscan_imaging.png_dhash(self.png("ga.png", grey_alpha, 4, filters=(1,))), expected)
+        palette = [(value, value, value) for value in range(256)]
+        self.assertEqual(webscan_imaging.png_dhash(self.png("palette.png", self.rows, 3, palette=palette, filters=(0, 2))), expected)
+
+    def test_different_pictures(self):
+        first = webscan_imaging.png_dhash(self.png("a.png", self.rows, 0))
+        flipped = webscan_imaging.png_dhash(self.png("b.png", [row[::-1] for row in self.rows], 0))
+        self.assertGreater(bin(first ^ flipped).count("1"), webscan_imaging.DHASH_DISTANCE)
+
+    def test_unsupported_images(self):
+        self.assertIsNone(webscan_imaging.png_dhash(self.png("interlaced.png", self.rows, 0, interlace=1)))
+        sixteen_bit = [row + row for row in self.rows]
+        self.assertIsNone(webscan_imaging.png_dhash(self.png("deep.png", sixteen_bit, 0, depth=16)))
+        self.assertIsNone(webscan_imaging.png_dhash(self.png("no-palette.png", self.rows, 3)))
+
+    def test_not_a_png_or_cut_short(self):
+        path = os.path.join(self.directory.name, "fake.png")
+        with open(path, 'wb') as fake:
+            fake.write(b"GIF89a not a png")
+        self.assertIsNone(webscan_imaging.png_dhash(path))
+        complete = self.png("complete.png", self.rows, 0)
+        with open(complete, 'rb') as png:
+            data = png.read()
+        with open(path, 'wb') as cut:
+            cut.write(data[:len(data) // 2])
+        self.assertIsNone(webscan_imaging.png_dhash(path))
+
+    def test_clusters(self):
+        clusters = webscan_imaging.ScreenClusters()
+        noisy = grey_image(seed=2)
+        self.assertTrue(clusters.add(self.png("one.png", self.rows, 0)))
+        self.assertFalse(clusters.add(self.png("two.png", noisy, 0, filters=(4,))))
+        self.assertTrue(clusters.add(self.png("three.png", [row[::-1] for row in self.rows], 0)))
+        broken = os.path.join(self.directory.name, "broken.png")
+        with open(broken, 'wb') as png:
+            png.write(b"\x89PNG")
+        self.assertTrue(clusters.add(broken))
+        self.assertEqual(clusters.members, {"one.png": ["two.png"], "three.png": [], "broken.png": []})
+
+
+PAGES = {
+    "/": (200, b"<h1>Home</h1>"),
+    "/index.php": (200, b"<h1>Home</h1>"),
+    "/login": (200, b"<form>login at 12:30:01 token 0123456789abcdef0123</form>"),
+    "/signin": (200, b"<form>login at 09:15:44 token fedcba9876543210fedc</form>"),
+    "/old": (301, b""),
+    "/older": (301, b""),
+    "/missing-page": (404, b"/missing-page was not found"),
+    "/another-one": (404, b"/another-one was not found"),
+}
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status, body = PAGES[self.path]
+        self.send_response(status)
+        if status == 301:
+            self.send_header("Location", "/login")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class DedupScreenshotUrlsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.directory.name)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.origin = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def test_groups(self):
+        unreachable = "http://127.0.0.1:9/closed"
+        with open("webscan-urls-host-80.md", 'w') as urls:
+            urls.write("".join(f"{self.origin}{path}\n" for path in PAGES) + f"{unreachable}\n\n")
+        webscan.dedup_screenshot_urls("host", 80)
+        with open("webscan-screen-urls-host-80.md") as screen:
+            kept = screen.read().split()
+        with open("webscan-url-groups-host-80.json") as groups:
+            groups = json.load(groups)
+
+        def url(path):
+            return self.origin + path
+
+        self.assertEqual(sorted(kept), sorted([url("/"), url("/old"), url("/login"), url("/another-one"), unreachable]))
+        self.assertEqual(groups[url("/")], [url("/index.php")])
+        self.assertEqual(groups[url("/old")], [url("/older")])
+        self.assertEqual(groups[url("/login")], [url("/signin")])
+        self.assertEqual(groups[url("/another-one")], [url("/missing-page")])
+        self.assertEqual(groups[unreachable], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import webscan
+import webscan_shards
+
+
+class ShardQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.wordlist = os.path.join(self.directory.name, "words.txt")
+        with open(self.wordlist, 'w') as wordlist:
+            wordlist.write("".join(f"word{index}\n" for index in range(100)))
+        self.connection = webscan_shards.open_shard_queue(os.path.join(self.directory.name, "queue.db"))
+        self.job = webscan_shards.create_shard_job(self.connection, "http://target", self.wordlist, 200)
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def expire(self, shard):
+        self.connection.execute("UPDATE shards SET lease_until = ? WHERE id = ?", (time.time() - 1, shard))
+
+    def test_shards_cover_the_wordlist_on_line_boundaries(self):
+        ranges = self.connection.execute("SELECT start, end FROM shards WHERE job = ? ORDER BY id", (self.job,)).fetchall()
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.wordlist))
+        words = []
+        for (start, end), following in zip(ranges, ranges[1:] + [(None, None)]):
+            if following[0] is not None:
+                self.assertEqual(end, following[0])
+            words += webscan_shards.read_shard(self.wordlist, start, end)[1]
+        self.assertEqual(words, [f"word{index}" for index in range(100)])
+
+    def test_claims_pending_shards_in_order(self):
+        first = webscan_shards.claim_shard(self.connection, "worker-a")
+        second = webscan_shards.claim_shard(self.connection, "worker-b")
+        self.assertEqual((first[0], second[0]), (1, 2))
+        self.assertEqual(first[4:], ("http://target", self.wordlist, webscan.hash_file(self.wordlist)))
+
+    def test_live_lease_is_not_reclaimed(self):
+        claimed = webscan_shards.claim_shard(self.connection, "worker-a")
+        shards = self.connection.execute("SELECT COUNT(*) FROM shards").fetchone()[0]
+        for _ in range(shards - 1):
+            self.assertNotEqual(webscan_shards.claim_shard(self.connection, "worker-b")[0], claimed[0])
+        self.assertIsNone(webscan_shards.claim_shard(self.connection, "worker-b"))
+
+    def test_expired_lease_goes_to_another_worker_from_its_position(self):
+        shard, job, position, end = webscan_shards.claim_shard(self.connection, "worker-a")[:4]
+        starts, words = webscan_shards.read_shard(self.wordlist, position, end)
+        self.assertTrue(webscan_shards.flush_shard(self.connection, shard, job, "worker-a", starts[2], [(words[0], webscan.Hit("http://target/word0"))]))
+        self.expire(shard)
+        reclaimed = [webscan_shards.claim_shard(self.connection, "worker-b") for _ in range(50)]
+        taken = next(claimed for claimed in reclaimed if claimed and claimed[0] == shard)
+        self.assertEqual(taken[2], starts[2])
+
+        # The worker that lost the lease can no longer write results or progress
+        self.assertFalse(webscan_shards.flush_shard(self.connection, shard, job, "worker-a", end, [(words[3], webscan.Hit("http://target/word3"))], 'done'))
+        self.assertEqual(self.connection.execute("SELECT word FROM results").fetchall(), [(words[0],)])
+        self.assertTrue(webscan_shards.flush_shard(self.connection, shard, job, "worker-b", end, [], 'done'))
+        self.assertEqual(self.connection.execute("SELECT status, worker FROM shards WHERE id = ?", (shard,)).fetchone(), ("done", "worker-b"))
+
+    def test_hits_past_the_position_are_not_listed_twice(self):
+        shard, job, position, end = webscan_shards.claim_shard(self.connection, "worker-a")[:4]
+        starts, words = webscan_shards.read_shard(self.wordlist, position, end)
+        # Responses arrive out of order, so a flush can carry hits for words after its position
+        self.assertTrue(webscan_shards.flush_shard(self.connection, shard, job, "worker-a", starts[1], [(words[3], webscan.Hit("http://target/word3"))]))
+        self.expire(shard)
+        while webscan_shards.claim_shard(self.connection, "worker-b")[0] != shard:
+            pass
+        self.assertTrue(webscan_shards.flush_shard(self.connection, shard, job, "worker-b", end, [(words[3], webscan.Hit("http://target/word3"))], 'done'))
+        self.assertEqual(self.connection.execute("SELECT word FROM results").fetchall(), [(words[3],)])
+
+    def test_finished_shard_is_not_claimed_again(self):
+        shard, job, _, end = webscan_shards.claim_shard(self.connection, "worker-a")[:4]
+        webscan_shards.flush_shard(self.connection, shard, job, "worker-a", end, [], 'done')
+        self.expire(shard)
+        shards = self.connection.execute("SELECT COUNT(*) FROM shards").fetchone()[0]
+        claimed = [webscan_shards.claim_shard(self.connection, "worker-b")[0] for _ in range(shards - 1)]
+        self.assertNotIn(shard, claimed)
+
+    def test_skipped_and_finished_jobs_are_not_claimed(self):
+        self.assertIsNone(webscan_shards.claim_shard(self.connection, "worker-a", {self.job}))
+        self.connection.execute("UPDATE jobs SET done = 1 WHERE id = ?", (self.job,))
+        self.assertIsNone(webscan_shards.claim_shard(self.connection, "worker-a"))
+
+
+class ShardedDiscoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.directory.name)
+        with open("words.txt", 'w') as wordlist:
+            wordlist.write("admin\nlogin\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_fails_when_every_local_worker_exited(self):
+        exiting = lambda *args, **kwargs: subprocess.Popen([sys.executable, "-c", "pass"])
+        with mock.patch.object(webscan, "ProfiledPopen", exiting):
+            self.assertFalse(webscan.run_sharded_discovery("http://target/", "target", 80, self.directory.name, "queue.db",
+                                                           "words.txt", local_workers=2))
+
+
+if __name__ == "__main__":
+    unittest.main()
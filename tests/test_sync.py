@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import webscan
+
+
+class SiteSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.source = os.path.join(self.directory.name, "site")
+        self.destination = os.path.join(self.directory.name, "notebook", "site")
+        self.write("index.html", b"<h1>home</h1>")
+        self.write("static/app.js", b"alert(1)")
+
+    def write(self, name, data, root=None):
+        path = os.path.join(root or self.source, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as handle:
+            handle.write(data)
+        return path
+
+    def read(self, name):
+        with open(os.path.join(self.destination, name), 'rb') as handle:
+            return handle.read()
+
+    def same_inode(self, name):
+        return os.path.samefile(os.path.join(self.source, name), os.path.join(self.destination, name))
+
+    def test_reflink_first(self):
+        sync = webscan.SiteSync()
+        with mock.patch.object(webscan.fcntl, "ioctl") as ioctl:
+            counts = sync.sync(self.source, self.destination)
+        self.assertEqual(ioctl.call_count, 2)
+        self.assertEqual(ioctl.call_args[0][1], webscan.FICLONE)
+        self.assertEqual((counts["reflinked"], counts["hardlinked"], counts["copied"]), (2, 0, 0))
+        self.assertEqual(sync.methods, ["reflink", "hardlink", "copy"])
+
+    def test_hardlink_when_reflink_is_not_supported(self):
+        sync = webscan.SiteSync()
+        with mock.patch.object(webscan.fcntl, "ioctl", side_effect=OSError(95, "Operation not supported")) as ioctl:
+            counts = sync.sync(self.source, self.destination)
+        # A method that failed once is not tried for the next file
+        self.assertEqual(ioctl.call_count, 1)
+        self.assertEqual(sync.methods, ["hardlink", "copy"])
+        self.assertEqual((counts["reflinked"], counts["hardlinked"], counts["copied"]), (0, 2, 0))
+        self.assertTrue(self.same_inode("index.html"))
+        self.assertEqual(self.read("static/app.js"), b"alert(1)")
+
+    def test_copy_when_nothing_else_works(self):
+        sync = webscan.SiteSync()
+        with mock.patch.object(webscan.fcntl, "ioctl", side_effect=OSError(95, "Operation not supported")), \
+                mock.patch.object(webscan.os, "link", side_effect=OSError(18, "Invalid cross-device link")) as link:
+            counts = sync.sync(self.source, self.destination)
+        self.assertEqual(link.call_count, 1)
+        self.assertEqual(sync.methods, ["copy"])
+        self.assertEqual((counts["reflinked"], counts["hardlinked"], counts["copied"]), (0, 0, 2))
+        self.assertFalse(self.same_inode("index.html"))
+        self.assertEqual(self.read("index.html"), b"<h1>home</h1>")
+        self.assertEqual(os.stat(os.path.join(self.destination, "index.html")).st_mtime_ns,
+                         os.stat(os.path.join(self.source, "index.html")).st_mtime_ns)
+
+    def test_failing_copy_is_raised(self):
+        sync = webscan.SiteSync()
+        sync.methods = ["copy"]
+        with mock.patch.object(webscan.shutil, "copy2", side_effect=OSError(28, "No space left on device")):
+            with self.assertRaises(OSError):
+                sync.sync(self.source, self.destination)
+
+    def test_second_run_only_touches_changes(self):
+        webscan.SiteSync().sync(self.source, self.destination)
+        self.write("new.txt", b"new")
+        os.remove(os.path.join(self.source, "static", "app.js"))
+        os.symlink("index.html", os.path.join(self.source, "home"))
+        counts = webscan.SiteSync().sync(self.source, self.destination)
+        self.assertEqual((counts["unchanged"], counts["pruned"]), (1, 1))
+        self.assertEqual(sorted(os.listdir(self.destination)), ["home", "index.html", "new.txt", "static"])
+        self.assertEqual(os.readlink(os.path.join(self.destination, "home")), "index.html")
+        self.assertEqual(os.listdir(os.path.join(self.destination, "static")), [])
+        counts = webscan.SiteSync().sync(self.source, self.destination)
+        self.assertEqual(counts["unchanged"], 3)
+
+    def test_changed_file_replaces_its_copy(self):
+        sync = webscan.SiteSync()
+        sync.methods = ["copy"]
+        sync.sync(self.source, self.destination)
+        self.write("index.html", b"<h1>changed</h1>")
+        counts = webscan.SiteSync().sync(self.source, self.destination)
+        self.assertEqual((counts["unchanged"], counts["hardlinked"] + counts["reflinked"]), (1, 1))
+        self.assertEqual(self.read("index.html"), b"<h1>changed</h1>")
+
+    def test_verify_compares_content(self):
+        sync = webscan.SiteSync()
+        sync.methods = ["copy"]
+        sync.sync(self.source, self.destination)
+        copy = os.path.join(self.destination, "index.html")
+        # Same size and mtime but other bytes: only verify notices
+        stat = os.stat(copy)
+        self.write("index.html", b"<h1>HOME</h1>", self.destination)
+        os.utime(copy, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(webscan.SiteSync().sync(self.source, self.destination)["unchanged"], 2)
+        counts = webscan.SiteSync(verify=True).sync(self.source, self.destination)
+        self.assertEqual(counts["unchanged"], 1)
+        self.assertEqual(self.read("index.html"), b"<h1>home</h1>")
+        # Same bytes under another mtime only get the timestamps
+        os.utime(copy, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        before = os.stat(copy).st_ino
+        counts = webscan.SiteSync(verify=True).sync(self.source, self.destination)
+        self.assertEqual(counts["unchanged"], 2)
+        self.assertEqual(os.stat(copy).st_ino, before)
+        self.assertEqual(os.stat(copy).st_mtime_ns, os.stat(os.path.join(self.source, "index.html")).st_mtime_ns)
+
+    def test_file_and_directory_swap_places(self):
+        webscan.SiteSync().sync(self.source, self.destination)
+        os.remove(os.path.join(self.source, "index.html"))
+        self.write("index.html/default.htm", b"moved")
+        webscan.SiteSync().sync(self.source, self.destination)
+        self.assertEqual(self.read("index.html/default.htm"), b"moved")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import webscan
+
+
+class CanonicalUrlTest(unittest.TestCase):
+    def test_scheme_and_host_are_lower_case(self):
+        self.assertEqual(webscan.canonical_url("HTTP://Example.COM/Admin"), "http://example.com/Admin")
+
+    def test_default_ports_are_dropped(self):
+        self.assertEqual(webscan.canonical_url("http://example.com:80/a"), "http://example.com/a")
+        self.assertEqual(webscan.canonical_url("https://example.com:443/a"), "https://example.com/a")
+        self.assertEqual(webscan.canonical_url("https://example.com:80/a"), "https://example.com:80/a")
+
+    def test_dot_segments_and_slashes(self):
+        self.assertEqual(webscan.canonical_url("http://example.com/a/./b/../c//d/"), "http://example.com/a/c/d")
+        self.assertEqual(webscan.canonical_url("http://example.com/../.."), "http://example.com/")
+        self.assertEqual(webscan.canonical_url("http://example.com"), "http://example.com/")
+
+    def test_escapes(self):
+        # Unreserved characters are decoded, everything else keeps an upper-case escape
+        self.assertEqual(webscan.canonical_url("http://example.com/%7euser/a%2fb%3f"), "http://example.com/~user/a%2Fb%3F")
+
+    def test_query_is_sorted_and_fragment_dropped(self):
+        self.assertEqual(webscan.canonical_url("http://example.com/search?b=2&a=1&#top"), "http://example.com/search?a=1&b=2")
+
+    def test_ipv6_host_keeps_its_brackets(self):
+        self.assertEqual(webscan.canonical_url("http://[::1]:8080/a"), "http://[::1]:8080/a")
+
+    def test_missing_scheme_defaults_to_http(self):
+        self.assertEqual(webscan.canonical_url("//example.com/a"), "http://example.com/a")
+
+
+class UrlIndexTest(unittest.TestCase):
+    def test_equivalent_urls_are_added_once(self):
+        index = webscan.UrlIndex()
+        self.assertEqual(index.add("http://Example.com:80/a/"), "http://Example.com:80/a/")
+        self.assertIsNone(index.add("http://example.com/a"))
+        self.assertIsNone(index.add("http://example.com/b/../a"))
+        self.assertEqual(len(index), 1)
+
+    def test_leaf_becomes_a_directory(self):
+        index = webscan.UrlIndex()
+        index.update(["http://example.com/a", "http://example.com/a/b", "http://example.com/a?x=1"])
+        self.assertEqual(len(index), 3)
+        self.assertIsNone(index.add("http://example.com/a"))
+        for url in ("http://example.com/a", "http://example.com/a/b", "http://example.com/a?x=1"):
+            self.assertIn(url, index)
+        self.assertNotIn("http://example.com/a/c", index)
+        self.assertNotIn("http://example.com/a?x=2", index)
+        self.assertNotIn("http://example.com/a/b/c", index)
+
+    def test_origin_only(self):
+        index = webscan.UrlIndex()
+        index.add("http://example.com")
+        self.assertIn("http://example.com/", index)
+        self.assertEqual(list(index), ["http://example.com"])
+
+    def test_iteration_orders(self):
+        urls = ["http://example.com/b", "https://example.com/a", "http://example.com/a/c", "http://example.com/a", "http://example.com/a?q=1"]
+        index = webscan.UrlIndex()
+        index.update(urls)
+        self.assertEqual(list(index), urls)
+        self.assertEqual(list(index.iter_sorted()), ["http://example.com/a", "http://example.com/a?q=1", "http://example.com/a/c",
+                                                     "http://example.com/b", "https://example.com/a"])
+
+    def test_urls_are_listed_as_first_found(self):
+        index = webscan.UrlIndex()
+        index.update(["http://example.com/admin/", "http://example.com/admin", "http://example.com/Admin?b=2&a=1"])
+        self.assertEqual(list(index), ["http://example.com/admin/", "http://example.com/Admin?b=2&a=1"])
+        self.assertEqual(list(index.iter_sorted()), ["http://example.com/Admin?b=2&a=1", "http://example.com/admin/"])
+
+    def test_segments_are_shared_across_directories(self):
+        index = webscan.UrlIndex()
+        index.update(["http://example.com/one/admin", "http://example.com/two/admin"])
+        origin = index.root["http://example.com"]
+        self.assertIs(next(key for key in origin["one"]), next(key for key in origin["two"]))
+
+
+class UrlCollectorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.urls_file = os.path.join(self.directory.name, "urls.md")
+        self.hits_file = os.path.join(self.directory.name, "hits.jsonl")
+
+    def collector(self, producers=("ffuf", "gobuster"), **kwargs):
+        return webscan.UrlCollector(self.urls_file, self.hits_file, producers, **kwargs)
+
+    def read(self, path):
+        with open(path) as handle:
+            return handle.read().splitlines()
+
+    def consume(self, collector, **kwargs):
+        received = []
+        thread = threading.Thread(target=lambda: received.extend(collector.subscribe(**kwargs)), daemon=True)
+        thread.start()
+        return received, thread
+
+    def test_files_are_written_as_hits_arrive(self):
+        collector = self.collector()
+        self.assertTrue(collector.add(webscan.Hit("http://h/a", 200, 10, source="ffuf")))
+        self.assertEqual(self.read(self.urls_file), ["http://h/a"])
+        # The same URL again only goes into the hits file
+        self.assertFalse(collector.add(webscan.Hit("http://h/a/", 301, source="gobuster")))
+        self.assertEqual(self.read(self.urls_file), ["http://h/a"])
+        hits = list(webscan.iter_hits(self.hits_file))
+        self.assertEqual([(hit.url, hit.status, hit.source) for hit in hits], [("http://h/a", 200, "ffuf"), ("http://h/a/", 301, "gobuster")])
+
+    def test_calibrated_noise_is_only_counted(self):
+        calibration = webscan.Calibration()
+        calibration.signatures["paths"] = webscan.Calibration.build_signatures([(200, 9, 2, 1, "x"), (200, 9, 2, 1, "x")])
+        collector = self.collector(calibration=calibration)
+        self.assertFalse(collector.add(webscan.Hit("http://h/anything", 200, 9, 2, 1)))
+        self.assertTrue(collector.add(webscan.Hit("http://h/admin", 200, 500, 40, 10)))
+        self.assertEqual(collector.wildcards, 1)
+        self.assertEqual([hit.url for hit in webscan.iter_hits(self.hits_file)], ["http://h/admin"])
+
+    def test_subscribers_get_old_and_new_urls_until_producers_are_done(self):
+        collector = self.collector()
+        collector.add(webscan.Hit("http://h/a"))
+        received, thread = self.consume(collector)
+        hits, hits_thread = self.consume(collector, hits=True)
+        # URLs collected before subscribing come as bare hits, so wait for both to be registered
+        while len(collector.subscribers) < 2:
+            time.sleep(0.01)
+        collector.add(webscan.Hit("http://h/b", 200))
+        collector.producer_done("ffuf")
+        collector.add(webscan.Hit("http://h/c", 403))
+        collector.producer_done("gobuster")
+        thread.join(5)
+        hits_thread.join(5)
+        self.assertEqual(received, ["http://h/a", "http://h/b", "http://h/c"])
+        self.assertEqual([(hit.url, hit.status) for hit in hits], [("http://h/a", None), ("http://h/b", 200), ("http://h/c", 403)])
+        self.assertTrue(collector.finished)
+        # Subscribing after the end yields what was collected and returns
+        self.assertEqual(list(collector.subscribe()), received)
+
+    def test_producer_stops_waiting_for_itself(self):
+        collector = self.collector(("ffuf", "recursion"))
+        received, thread = self.consume(collector, name="recursion")
+        collector.add(webscan.Hit("http://h/a"))
+        collector.producer_done("ffuf")
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(received, ["http://h/a"])
+        self.assertFalse(collector.finished)
+        collector.producer_done("recursion")
+        self.assertTrue(collector.finished)
+
+    def test_no_hits_still_leaves_empty_files(self):
+        collector = self.collector(("ffuf",))
+        collector.producer_done("ffuf")
+        self.assertEqual((self.read(self.urls_file), self.read(self.hits_file)), ([], []))
+
+    def test_resumed_run_keeps_earlier_hits(self):
+        first = self.collector(("ffuf",))
+        first.add(webscan.Hit("http://h/a", 200))
+        first.producer_done("ffuf")
+        resumed = self.collector(("gobuster",), resume=True)
+        self.assertFalse(resumed.add(webscan.Hit("http://h/a", 200)))
+        self.assertTrue(resumed.add(webscan.Hit("http://h/b", 200)))
+        resumed.producer_done("gobuster")
+        self.assertEqual(self.read(self.urls_file), ["http://h/a", "http://h/b"])
+        self.assertEqual(len(self.read(self.hits_file)), 3)
+
+    def test_resumed_run_without_new_hits_leaves_the_files_alone(self):
+        first = self.collector(("ffuf",))
+        first.add(webscan.Hit("http://h/a", 200))
+        first.producer_done("ffuf")
+        before = os.stat(self.urls_file).st_mtime_ns
+        resumed = self.collector(("ffuf",), resume=True)
+        self.assertEqual(list(resumed.urls), ["http://h/a"])
+        resumed.producer_done("ffuf")
+        self.assertEqual(os.stat(self.urls_file).st_mtime_ns, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
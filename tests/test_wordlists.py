@@ -0,0 +1,77 @@
+import array
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import webscan
+
+
+def read_offsets(path):
+    offsets = array.array('Q')
+    with open(f"{path}.idx", 'rb') as index:
+        offsets.frombytes(index.read())
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return list(offsets)
+
+
+class CompileWordlistTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "share.txt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_ranked_words_go_first_in_rank_order(self):
+        lines, ranked = webscan.compile_wordlist(iter(["a", "b", "admin", "c", "api"]), self.path, {"api": 0, "admin": 1})
+        with open(self.path) as wordlist:
+            self.assertEqual(wordlist.read().split("\n"), ["api", "admin", "a", "b", "c", ""])
+        self.assertEqual((lines, ranked), (5, 2))
+
+    def test_index_has_one_offset_more_than_lines(self):
+        webscan.compile_wordlist(iter(["a", "bb", "ccc"]), self.path, {})
+        self.assertEqual(read_offsets(self.path), [0, 2, 5, 9])
+        self.assertFalse(os.path.exists(f"{self.path}.cold"))
+
+    def test_compiled_wordlist_seeks_by_index(self):
+        webscan.compile_wordlist(iter(["zero", "one", "two", "three"]), self.path, {"two": 0})
+        compiled = webscan.open_compiled_wordlist(self.path)
+        self.assertIsNotNone(compiled)
+        try:
+            self.assertEqual(len(compiled), 4)
+            self.assertEqual(compiled[0], "two")
+            self.assertEqual(list(compiled.iter_from(2)), ["one", "three"])
+            self.assertEqual(compiled.byte_offset(1), len("two\n"))
+            # Past the end is the size of the file
+            self.assertEqual(compiled.byte_offset(10), os.path.getsize(self.path))
+        finally:
+            compiled.close()
+
+    def test_empty_wordlist(self):
+        self.assertEqual(webscan.compile_wordlist(iter([]), self.path, {}), (0, 0))
+        compiled = webscan.CompiledWordlist(self.path)
+        try:
+            self.assertEqual(len(compiled), 0)
+            self.assertEqual(list(compiled.iter_from()), [])
+        finally:
+            compiled.close()
+
+    def test_stale_index_is_ignored(self):
+        webscan.compile_wordlist(iter(["a"]), self.path, {})
+        index_time = os.path.getmtime(f"{self.path}.idx")
+        os.utime(self.path, (index_time + 10, index_time + 10))
+        self.assertIsNone(webscan.open_compiled_wordlist(self.path))
+
+    def test_resume_wordlist_copies_from_the_offset(self):
+        webscan.compile_wordlist(iter(["a", "b", "c", "d", "e"]), self.path, {})
+        with mock.patch.object(webscan, "CACHE_DIR", self.directory.name):
+            resumed = webscan.resume_wordlist(self.path, 1, 3)
+        with open(resumed) as wordlist:
+            self.assertEqual(wordlist.read(), "b\nc\nd\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+import webscan
+
+
+class YieldMonitorTest(unittest.TestCase):
+    def setUp(self):
+        self.monitor = webscan.YieldMonitor("ffuf", min_yield=2, window=100)
+
+    def test_no_decision_before_a_full_window(self):
+        self.assertFalse(self.monitor.progress(99))
+        self.assertIsNone(self.monitor.reason)
+        self.assertTrue(self.monitor.progress(100))
+        self.assertEqual(self.monitor.reason, "0 new hits in the last 100 requests, 0 in 100 requests overall")
+
+    def test_hits_inside_the_window_keep_it_going(self):
+        self.monitor.progress(40)
+        self.monitor.hit()
+        self.monitor.progress(60)
+        self.monitor.hit()
+        self.assertFalse(self.monitor.progress(139))
+        # The hit at 40 has left the window
+        self.assertTrue(self.monitor.progress(140))
+        self.assertEqual(self.monitor.reason, "1 new hits in the last 100 requests, 2 in 140 requests overall")
+
+    def test_progress_never_goes_back(self):
+        self.monitor.progress(80)
+        self.monitor.hit()
+        self.monitor.hit()
+        self.assertFalse(self.monitor.progress(50))
+        self.assertEqual(self.monitor.requests, 80)
+        self.assertFalse(self.monitor.progress(179))
+        self.assertTrue(self.monitor.progress(180))
+
+    def test_first_reason_is_kept(self):
+        self.assertTrue(self.monitor.progress(100))
+        reason = self.monitor.reason
+        for _ in range(5):
+            self.monitor.hit()
+        self.assertTrue(self.monitor.progress(150))
+        self.assertEqual(self.monitor.reason, reason)
+
+    def test_concurrent_hits_are_all_counted(self):
+        def hits():
+            for _ in range(1000):
+                self.monitor.hit()
+
+        self.monitor.progress(50)
+        threads = [threading.Thread(target=hits) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.monitor.hits, 4000)
+        self.assertFalse(self.monitor.progress(100))
+
+    def test_summary(self):
+        self.monitor.hit()
+        self.monitor.progress(50)
+        self.assertEqual(self.monitor.summary(), "[webscan] ffuf completed (stop when fewer than 2 new hits arrive in 100 requests): "
+                                                 "1 new hits in 50 requests\n")
+        self.monitor.progress(150)
+        self.assertTrue(self.monitor.summary().startswith("[webscan] ffuf stopped early (stop when fewer than 2 new hits"))
+
+
+# Prints two hits early on, then only reports progress the way ffuf does until it is stopped
+FAKE_TOOL = """
+import sys, time
+for number in range(1, 100000):
+    if number in (5, 10):
+        print(f"http://host/found{number}", flush=True)
+    sys.stderr.write(f"\\r:: Progress: [{number * 10}/1000000] :: Job [1/1] ::")
+    sys.stderr.flush()
+    time.sleep(0.001)
+"""
+
+
+class StreamCommandMonitorTest(unittest.TestCase):
+    def test_dry_tool_is_stopped_without_failing(self):
+        monitor = webscan.YieldMonitor("ffuf", min_yield=1, window=500)
+        reported = []
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "ffuf.md")
+            webscan.stream_command([sys.executable, "-c", FAKE_TOOL], output, parse_line=lambda line: webscan.Hit(line.strip()),
+                                   progress=lambda done, total: reported.append(done), monitor=monitor)
+            with open(output) as lines:
+                written = lines.read()
+        self.assertEqual(monitor.hits, 2)
+        self.assertEqual(reported[-1], monitor.requests)
+        self.assertIsNotNone(monitor.reason)
+        self.assertLess(monitor.requests, 10000)
+        self.assertGreaterEqual(monitor.requests, 500)
+        self.assertTrue(written.startswith("http://host/found5\nhttp://host/found10\n[webscan] ffuf stopped early"))
+
+
+if __name__ == "__main__":
+    unittest.main()
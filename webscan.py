@@ -1,14 +1,53 @@
 import argparse
+import array
+import asyncio
+import base64
+import collections
+import ctypes
+import ctypes.util
+import fcntl
+import hashlib
+import heapq
+import html
+import itertools
+import json
+import math
+import mmap
+import mimetypes
 import os
+import posixpath
+import pwd
+import grp
+import select
+import stat
+import string
+import struct
+import sys
+import queue
+import threading
 import socket
+import sqlite3
 import subprocess
 import shutil
 import re
 from glob import glob
 from datetime import datetime
 from getpass import getuser
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit, urljoin, urldefrag, quote, unquote
+from html.parser import HTMLParser
+from email.utils import parsedate_to_datetime
 import time
 
+from webscan_common import CALIBRATION_LENGTHS, STAGE_CONTEXT, current_profile, hash_file, profile_count, random_token
+from webscan_dns import (DnsResolver, SystemResolver, encode_dns_name, load_dns_cache, parse_nameserver, resolve_subdomains,
+                         save_dns_cache, system_nameserver)
+from webscan_http import (DEFAULT_ENGINE_CONNECTIONS, DEFAULT_ENGINE_TIMEOUT, DEFAULT_MAX_CONCURRENCY, URL_SAFE_CHARACTERS,
+                          ConcurrencyController, HttpConnectionPool, RateLimiter, fuzz_paths)
+from webscan_imaging import ScreenClusters
+from webscan_shards import DEFAULT_SHARD_SIZE, ShardLost, claim_shard, create_shard_job, flush_shard, open_shard_queue, read_shard
+
 # Base directory for obsidian vault
 BASE_NOTEBOOK_PATH = os.path.join(os.path.expanduser("~"), "notes", "Boxes")
 #BASE_NOTEBOOK_PATH = "/path/to/your/obsidian/vault"
@@ -18,6 +57,114 @@ DARK_WHITE = "\033[2;37m"
 BLUE = "\033[34m"
 RESET = "\033[0m"
 
+# Stages running at once, overall and per target
+DEFAULT_JOBS = 4
+DEFAULT_HOST_JOBS = 4
+
+# Brute-forcers sharing a host's --rate budget
+DISCOVERY_TOOLS_PER_HOST = 4
+
+WORDLIST_DIR = os.path.expanduser("~/.local/bin/wordlists")
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "webscan")
+
+# Wordlist and extensions of each brute-forcer, in hand-out order
+DISCOVERY_WORDLISTS = [
+    ("feroxbuster", "common.txt", ["php", "html"]),
+    ("gobuster", "big.txt", ["php", "txt", "html", "jpg"]),
+    ("ffuf", "directory-list-2.3-medium.txt", []),
+]
+
+# Seconds between wordlist offset checkpoints
+CHECKPOINT_INTERVAL = 5
+
+# URL canonicalization: decodable escapes and default ports
+UNRESERVED_CHARACTERS = set(string.ascii_letters + string.digits + "-._~")
+PERCENT_ESCAPE = re.compile(r"%([0-9a-fA-F]{2})")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Requests the discovery yield is measured over
+DEFAULT_YIELD_WINDOW = 20000
+# Past hit words, and how many of the best go first
+HIT_STATS_PATH = os.path.join(CACHE_DIR, "hit-stats.db")
+HIT_STATS_LIMIT = 100000
+# Seconds an idle shard worker waits before exiting
+WORKER_IDLE_TIMEOUT = 60
+# Lifetime of cached calibrations (seconds)
+CALIBRATION_MAX_AGE = 24 * 60 * 60
+# Host discovery: connections, and names sharing a response before it is the default site
+DEFAULT_HOST_CONNECTIONS = 40
+HOST_REMOTE_CONNECTIONS = 4
+HOST_CLUSTER_SIZE = 3
+# Site mirror: connections, page budget and size budget (MB)
+DEFAULT_MIRROR_CONNECTIONS = 8
+DEFAULT_MIRROR_PAGES = 5000
+DEFAULT_MIRROR_SIZE = 500
+# Attributes the mirror follows, and url() in CSS
+LINK_ATTRIBUTES = {"href", "src", "action", "data-src", "poster", "background"}
+CSS_URL = re.compile(r'''url\(\s*['"]?([^'")\s]+)''')
+# inotify event header and bits, and the polling interval (seconds)
+INOTIFY_EVENT = struct.Struct("iIII")
+INOTIFY_CLOSE_WRITE = 0x00000008
+INOTIFY_MOVED_TO = 0x00000080
+INOTIFY_CREATE = 0x00000100
+SCREENS_POLL_INTERVAL = 0.5
+# Screenshot dedup: connections per origin, and what normalize_body masks
+SCREEN_DEDUP_CONNECTIONS = 10
+VOLATILE_TOKENS = re.compile(r"[0-9a-fA-F]{16,}|[A-Za-z0-9+/_-]{32,}={0,2}|\d{6,}|\d{1,2}:\d{2}(:\d{2})?")
+# Magic bytes of mirrored files
+MIME_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"), (b"\xff\xd8\xff", "image/jpeg"), (b"GIF8", "image/gif"),
+    (b"%PDF-", "application/pdf"), (b"PK\x03\x04", "application/zip"), (b"\x1f\x8b", "application/gzip"),
+    (b"\x00asm", "application/wasm"), (b"wOFF", "font/woff"), (b"wOF2", "font/woff2"), (b"<?xml", "application/xml"),
+]
+# Copy-on-write clone ioctl (btrfs, XFS)
+FICLONE = 0x40049409
+# Terminal output rendered as HTML for the notebook
+ANSI_ESCAPE = re.compile(r'\x1b\[([0-9;?]*)([A-Za-z])')
+ANSI_COLORS = ["#000000", "#aa0000", "#00aa00", "#aa5500", "#0000aa", "#aa00aa", "#00aaaa", "#aaaaaa"]
+ANSI_BRIGHT_COLORS = ["#555555", "#ff5555", "#55ff55", "#ffff55", "#5555ff", "#ff55ff", "#55ffff", "#ffffff"]
+ANSI_TEXT_STYLES = {1: ("font-weight", "bold"), 2: ("opacity", "0.6"), 3: ("font-style", "italic"), 4: ("text-decoration", "underline")}
+ANSI_HTML_HEADER = ('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n</head>\n'
+                    '<body style="background-color: #000000; color: #aaaaaa">\n<pre style="white-space: pre-wrap; word-wrap: break-word">\n')
+ANSI_HTML_FOOTER = '</pre>\n</body>\n</html>\n'
+
+# Recursive discovery wordlist, extensions and limits
+RECURSION_WORDLIST = ("common.txt", ["php", "html"])
+DEFAULT_RECURSION_DEPTH = 3
+DEFAULT_RECURSION_REQUESTS = 100000
+RECURSION_REDIRECTS = {301, 302, 307, 308}
+RECURSION_INTERESTING = {"admin", "administrator", "api", "backup", "backups", "bak", "cgi-bin", "conf", "config", "console",
+                         "data", "db", "debug", "dev", "files", "include", "includes", "inc", "internal", "logs", "manage",
+                         "old", "panel", "portal", "private", "secret", "staging", "test", "tmp", "upload", "uploads", "v1", "v2"}
+RECURSION_BORING = {"assets", "css", "dist", "font", "fonts", "icons", "image", "images", "img", "javascript", "js", "lib",
+                    "libs", "media", "node_modules", "scripts", "static", "styles", "theme", "themes", "vendor"}
+
+# --profile stderr tail size and report files
+PROFILE_STDERR_TAIL = 2048
+PROFILE_JSON = "webscan-profile.json"
+PROFILE_PROMETHEUS = "webscan.prom"
+# Keep the tail of a child's stderr for the profile
+STDERR_TAIL = object()
+# Set on Ctrl-C; running loops and children are stopped with it
+STOP = threading.Event()
+STOPPABLE_LOCK = threading.Lock()
+RUNNING_TASKS = {}
+RUNNING_PROCESSES = set()
+
+# --budget: reserve after discovery, default rate and extension length
+BUDGET_RESERVE = 0.25
+BUDGET_DEFAULT_RATE = 200
+BUDGET_EXTENSION = 60
+BUDGET_ACTIVE_WINDOW = 60
+BUDGET_TICK = 1
+BUDGET_RATE_WEIGHT = 0.5
+BUDGET_RATES_PATH = os.path.join(CACHE_DIR, "stage-rates.json")
+# Stages sharing the discovery window, and ones the budget never stops
+BUDGET_PLANNED_STAGES = ("feroxbuster", "ffuf", "gobuster", "recursion", "mirror", "hosts")
+BUDGET_EXEMPT_STAGES = {"calibrate", "copy-site", "site-listing", "collect-urls", "urls-html", "geckodriver-cleanup"}
+
+# Same status codes ffuf matches by default
+NATIVE_MATCH_STATUS = {200, 201, 202, 203, 204, 205, 206, 207, 208, 226, 301, 302, 307, 401, 403, 405, 500}
+
 def print_informational_message(message):
     PRINT_INFORMATIONAL = f"{YELLOW}{{🌀🌵[+]🌵🌀}}{RESET}"
     print(f"{PRINT_INFORMATIONAL} {DARK_WHITE}{message}{RESET}")
@@ -42,25 +189,135 @@ def is_ip_address(value):
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Parse a URL or IP address.")
-    parser.add_argument("target", help="The URL or IP address to analyze.")
+    parser.add_argument("target", nargs="?", help="The URL or IP address to analyze.")
+    parser.add_argument("-iL", "--targets", metavar="FILE", help="File with one URL, IP or host:port per line ('-' reads stdin).")
+    parser.add_argument("--no-dedup", dest="dedup", action="store_false", help="Give every brute-forcer its full wordlist instead of a deduplicated share.")
+    parser.add_argument("--engine", choices=["external", "native"], default="external", help="Run the ffuf and gobuster stages with the external binaries or the built-in async engine.")
+    parser.add_argument("--connections", type=int, default=DEFAULT_ENGINE_CONNECTIONS, help=f"Persistent connections per host for the native engine (default: {DEFAULT_ENGINE_CONNECTIONS}).")
+    parser.add_argument("--stream", action="store_true", help="Start Aquatone right away and feed it URLs while the brute-forcers are still running.")
+    parser.add_argument("--shard-queue", metavar="DB", help="Split the ffuf wordlist into shards in this SQLite queue and let shard workers brute-force them.")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help=f"Shard size in bytes (default: {DEFAULT_SHARD_SIZE}).")
+    parser.add_argument("--local-workers", type=int, default=0, help="Shard workers to start on this machine alongside --shard-queue.")
+    parser.add_argument("--remote-workers", action="store_true", help="Keep waiting for shard workers started with --worker on other machines, even with no local workers left.")
+    parser.add_argument("--worker", metavar="DB", help="Run as a shard worker against this SQLite queue instead of scanning.")
+    parser.add_argument("--mirror-connections", type=int, default=DEFAULT_MIRROR_CONNECTIONS, help=f"Concurrent connections used to mirror the site (default: {DEFAULT_MIRROR_CONNECTIONS}).")
+    parser.add_argument("--mirror-pages", type=int, default=DEFAULT_MIRROR_PAGES, help=f"Maximum number of URLs the site mirror fetches (default: {DEFAULT_MIRROR_PAGES}).")
+    parser.add_argument("--mirror-size", type=int, default=DEFAULT_MIRROR_SIZE, help=f"Maximum megabytes the site mirror downloads (default: {DEFAULT_MIRROR_SIZE}).")
+    parser.add_argument("--sync-hash", action="store_true", help="Compare file contents, not just size and mtime, when syncing the mirrored site into the notebook.")
+    parser.add_argument("--profile", nargs="?", const=".", metavar="DIR", help=f"Record each stage's timings and resource use and write {PROFILE_JSON} and {PROFILE_PROMETHEUS} (for node_exporter's textfile collector) to DIR (default: the current directory).")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the stage journal from a previous run and start over.")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS, help=f"Maximum number of stages to run in parallel across all targets (default: {DEFAULT_JOBS}).")
+    parser.add_argument("--host-jobs", type=int, default=DEFAULT_HOST_JOBS, help=f"Maximum number of stages to run in parallel against one target (default: {DEFAULT_HOST_JOBS}).")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help=f"Ceiling on requests in flight against one host, shared by every stage scanning it; the adaptive limit stays below it (default: {DEFAULT_MAX_CONCURRENCY}).")
+    parser.add_argument("--rate", type=int, help="Maximum requests per second against one host, shared by the brute-forcers.")
+    parser.add_argument("--recursion-depth", type=int, default=DEFAULT_RECURSION_DEPTH, help=f"Directory levels below the target the recursion stage explores; 0 turns it off (default: {DEFAULT_RECURSION_DEPTH}).")
+    parser.add_argument("--recursion-requests", type=int, default=DEFAULT_RECURSION_REQUESTS, help=f"Requests per host the recursion stage may send (default: {DEFAULT_RECURSION_REQUESTS}).")
+    parser.add_argument("--nameserver", metavar="HOST[:PORT]", help="Nameserver the subdomain candidates are resolved against before any HTTP request (default: the first one in /etc/resolv.conf).")
+    parser.add_argument("--min-yield", type=int, help="Stop ffuf, the native engine and subdomain/vhost fuzzing once fewer than this many new hits arrive within --yield-window requests.")
+    parser.add_argument("--yield-window", type=int, default=DEFAULT_YIELD_WINDOW, help=f"Requests the --min-yield rate is measured over (default: {DEFAULT_YIELD_WINDOW}).")
+    parser.add_argument("--budget", metavar="DURATION", help="Wall-clock time each target may take, e.g. 20m or 1h30m; wordlists are cut to what fits and stages are stopped or skipped when their share runs out.")
     args = parser.parse_args()
 
-    target_input = args.target.rstrip("/")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.host_jobs < 1:
+        parser.error("--host-jobs must be at least 1")
+    if args.connections < 1:
+        parser.error("--connections must be at least 1")
+    if args.mirror_connections < 1:
+        parser.error("--mirror-connections must be at least 1")
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
+    if args.rate is not None and args.rate < 1:
+        parser.error("--rate must be at least 1")
+    if args.recursion_depth < 0:
+        parser.error("--recursion-depth must be at least 0")
+    if args.recursion_requests < 1:
+        parser.error("--recursion-requests must be at least 1")
+    if args.nameserver:
+        try:
+            args.nameserver = parse_nameserver(args.nameserver)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.min_yield is not None and args.min_yield < 1:
+        parser.error("--min-yield must be at least 1")
+    if args.yield_window < 1:
+        parser.error("--yield-window must be at least 1")
+    if args.budget is not None:
+        try:
+            args.budget = parse_duration(args.budget)
+        except ValueError as e:
+            parser.error(str(e))
+        # Stages are ticked every BUDGET_TICK
+        if args.budget < BUDGET_TICK:
+            parser.error(f"--budget must be at least {BUDGET_TICK}s")
+
+    target_inputs = [args.target] if args.target else []
+    if args.targets:
+        try:
+            target_inputs += read_target_list(args.targets)
+        except OSError as e:
+            parser.error(f"cannot read {args.targets}: {e}")
+    if not target_inputs and not args.worker:
+        parser.error("a target or --targets is required")
+    if args.shard_size < 1:
+        parser.error("--shard-size must be at least 1")
+    if args.local_workers < 0:
+        parser.error("--local-workers must be at least 0")
+    if args.shard_queue and not args.local_workers and not args.remote_workers:
+        parser.error("--shard-queue needs --local-workers, or --remote-workers to wait for workers on other machines")
+
+    args.scans = []
+    seen = set()
+    for target_input in target_inputs:
+        scan = build_scan_target(target_input)
+        if scan.full_url not in seen:
+            seen.add(scan.full_url)
+            args.scans.append(scan)
+
+    return args
+
+def parse_duration(value):
+    # "20m", "1h30m", "90s" or plain seconds
+    match = re.fullmatch(r"(?:(\d+)h)?(?:(\d+)m)?(?:(\d+(?:\.\d+)?)s?)?", value.strip())
+    if not match or not any(match.groups()):
+        raise ValueError(f"invalid duration: {value}")
+    hours, minutes, seconds = (float(group or 0) for group in match.groups())
+    total = hours * 3600 + minutes * 60 + seconds
+    if total <= 0:
+        raise ValueError(f"duration must be positive: {value}")
+    return total
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+def read_target_list(path):
+    handle = sys.stdin if path == '-' else open(path, 'r')
+    try:
+        return [line.strip() for line in handle if line.strip() and not line.strip().startswith('#')]
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def build_scan_target(target_input):
+    target_input = target_input.rstrip("/")
     target, port, webpath = get_target_and_port_and_path(target_input)
-    
-    args.target = target
-    args.port = port
-    args.webpath = webpath
-    args.domain = not is_ip_address(target)
+
+    scan = argparse.Namespace(target=target, port=port, webpath=webpath, domain=not is_ip_address(target))
 
     if target_input.startswith("https://"):
-        args.full_url = f"https://{target}{webpath}" if port == 443 else f"https://{target}:{port}{webpath}"
+        scan.full_url = f"https://{target}{webpath}" if port == 443 else f"https://{target}:{port}{webpath}"
     else:
-        args.full_url = f"http://{target}{webpath}" if port == 80 else f"http://{target}:{port}{webpath}"
+        scan.full_url = f"http://{target}{webpath}" if port == 80 else f"http://{target}:{port}{webpath}"
 
-    args.full_url = args.full_url.rstrip("/")
+    scan.full_url = scan.full_url.rstrip("/")
 
-    return args
+    return scan
     
 def get_target_and_port_and_path(target):
     webpath = ""
@@ -100,9 +357,148 @@ def create_notebook_directory():
     os.makedirs(notebook_dir, exist_ok=True)
     return notebook_dir
 
+def current_budget():
+    return getattr(STAGE_CONTEXT, "budget", None)
+
+def budget_expired():
+    # Stopped by --budget
+    budget = current_budget()
+    return bool(budget and budget.expired)
+
+def budget_hit():
+    # Found something new, so it may earn an extension
+    budget = current_budget()
+    if budget:
+        budget.last_hit = time.monotonic()
+
+def budget_progress(done):
+    # Candidates or requests done so far
+    budget = current_budget()
+    if budget:
+        budget.done = max(done, budget.done or 0)
+
+def budget_limit(available):
+    # Candidates there is time for, None when all fit
+    budget = current_budget()
+    return budget.fit(available) if budget else None
+
+def run_async(coroutine):
+    # asyncio.run that stop_stages() can cancel
+    async def main():
+        task = asyncio.current_task()
+        with STOPPABLE_LOCK:
+            RUNNING_TASKS[task] = asyncio.get_running_loop()
+        try:
+            if STOP.is_set():
+                raise asyncio.CancelledError()
+            return await coroutine
+        finally:
+            coroutine.close()
+            with STOPPABLE_LOCK:
+                RUNNING_TASKS.pop(task, None)
+    return asyncio.run(main())
+
+def stop_stages():
+    # Ctrl-C: cancel the event loops and terminate the children
+    STOP.set()
+    with STOPPABLE_LOCK:
+        tasks = list(RUNNING_TASKS.items())
+        processes = list(RUNNING_PROCESSES)
+    for task, loop in tasks:
+        try:
+            loop.call_soon_threadsafe(task.cancel)
+        except RuntimeError:
+            # The loop closed in the meantime
+            pass
+    for process in processes:
+        try:
+            process.terminate()
+        except OSError:
+            pass
+
+class ProfiledPopen(subprocess.Popen):
+    # Popen that reaps with wait4 and charges the child's rusage to the stage
+    def __init__(self, args, **kwargs):
+        if STOP.is_set():
+            raise OSError("webscan is stopping")
+        self.profile = current_profile()
+        self.launched = time.monotonic()
+        self.reap_lock = threading.Lock()
+        self.stderr_tail = b''
+        self.tail_reader = None
+        tail_fd = None
+        if kwargs.get("stderr") is STDERR_TAIL:
+            tail_fd, kwargs["stderr"] = os.pipe()
+        try:
+            super().__init__(args, **kwargs)
+        except BaseException:
+            if tail_fd is not None:
+                os.close(tail_fd)
+            raise
+        finally:
+            if tail_fd is not None:
+                os.close(kwargs["stderr"])
+        with STOPPABLE_LOCK:
+            RUNNING_PROCESSES.add(self)
+        budget = current_budget()
+        if budget:
+            budget.track(self)
+        if tail_fd is not None:
+            self.tail_reader = threading.Thread(target=self._drain, args=(tail_fd,), daemon=True)
+            self.tail_reader.start()
+
+    def _drain(self, fd):
+        with open(fd, 'rb', buffering=0) as stream:
+            for chunk in iter(lambda: stream.read(4096), b''):
+                self.stderr_tail = (self.stderr_tail + chunk)[-PROFILE_STDERR_TAIL:]
+
+    def _reap(self, flags):
+        with self.reap_lock:
+            if self.returncode is not None:
+                return
+            try:
+                pid, status, usage = os.wait4(self.pid, flags)
+            except ChildProcessError:
+                # Reaped behind our back; like Popen, report success
+                self.returncode = 0
+                return
+            if pid != self.pid:
+                return
+            self.returncode = os.waitstatus_to_exitcode(status)
+        with STOPPABLE_LOCK:
+            RUNNING_PROCESSES.discard(self)
+        if self.tail_reader:
+            self.tail_reader.join(1)
+        if self.profile:
+            self.profile.charge(self, usage)
+
+    def poll(self):
+        if self.returncode is None:
+            self._reap(os.WNOHANG)
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if timeout is None:
+            self._reap(0)
+            return self.returncode
+        deadline = time.monotonic() + timeout
+        while self.poll() is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            time.sleep(min(remaining, 0.05))
+        return self.returncode
+
+def run_process(command, check=False, **kwargs):
+    with ProfiledPopen(command, **kwargs) as process:
+        stdout, stderr = process.communicate()
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
 def run_command(command):
     try:
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
+        process = ProfiledPopen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
 
         stdout, stderr = process.communicate()
 
@@ -114,6 +510,80 @@ def run_command(command):
     except Exception as e:
         return str(e)
 
+def ansi_color(index):
+    # xterm 256-colour palette
+    if index < 16:
+        return (ANSI_COLORS + ANSI_BRIGHT_COLORS)[index]
+    if index < 232:
+        index -= 16
+        levels = [0 if value == 0 else 55 + value * 40 for value in (index // 36, index // 6 % 6, index % 6)]
+        return "#{:02x}{:02x}{:02x}".format(*levels)
+    grey = 8 + (index - 232) * 10
+    return f"#{grey:02x}{grey:02x}{grey:02x}"
+
+def apply_sgr(style, params):
+    codes = [int(code) if code.isdigit() else 0 for code in params.split(';')] if params else [0]
+    position = 0
+    while position < len(codes):
+        code = codes[position]
+        if code == 0:
+            style.clear()
+        elif code in ANSI_TEXT_STYLES:
+            name, value = ANSI_TEXT_STYLES[code]
+            style[name] = value
+        elif code in (22, 23, 24):
+            style.pop({22: "font-weight", 23: "font-style", 24: "text-decoration"}[code], None)
+            if code == 22:
+                style.pop("opacity", None)
+        elif 30 <= code <= 37 or 90 <= code <= 97:
+            style["color"] = ANSI_COLORS[code - 30] if code < 90 else ANSI_BRIGHT_COLORS[code - 90]
+        elif 40 <= code <= 47 or 100 <= code <= 107:
+            style["background-color"] = ANSI_COLORS[code - 40] if code < 100 else ANSI_BRIGHT_COLORS[code - 100]
+        elif code in (39, 49):
+            style.pop("color" if code == 39 else "background-color", None)
+        elif code in (38, 48):
+            name = "color" if code == 38 else "background-color"
+            model = codes[position + 1] if position + 1 < len(codes) else None
+            if model == 5 and position + 2 < len(codes):
+                style[name] = ansi_color(codes[position + 2] % 256)
+                position += 2
+            elif model == 2 and position + 4 < len(codes):
+                style[name] = "#{:02x}{:02x}{:02x}".format(*(value % 256 for value in codes[position + 2:position + 5]))
+                position += 4
+            else:
+                # Drop the rest of a truncated colour, like xterm
+                break
+        position += 1
+
+def render_ansi_line(line, style):
+    # Drop other escape sequences
+    parts = []
+    position = 0
+    for match in ANSI_ESCAPE.finditer(line):
+        parts.append(styled_html(line[position:match.start()], style))
+        if match.group(2) == 'm':
+            apply_sgr(style, match.group(1))
+        position = match.end()
+    parts.append(styled_html(line[position:], style))
+    return ''.join(parts)
+
+def styled_html(text, style):
+    if not text:
+        return ''
+    text = html.escape(text, quote=False)
+    if not style:
+        return text
+    return f'<span style="{"; ".join(f"{name}: {value}" for name, value in style.items())}">{text}</span>'
+
+def ansi_to_html(source_file, html_file):
+    style = {}
+    with open(source_file, 'r', errors='replace') as source, open(html_file, 'w') as html_output:
+        html_output.write(ANSI_HTML_HEADER)
+        for line in source:
+            html_output.write(render_ansi_line(line.rstrip('\n'), style) + '\n')
+        html_output.write(ANSI_HTML_FOOTER)
+    return html_file
+
 def convert_md_to_html(md_file, notebook_dir):
     try:
         if not os.path.exists(md_file):
@@ -121,11 +591,7 @@ def convert_md_to_html(md_file, notebook_dir):
 
         html_file = os.path.join(notebook_dir, os.path.basename(md_file).replace('.md', '.html'))
 
-        with open(md_file, 'r') as md_input:
-            with open(html_file, 'w') as html_output:
-                subprocess.run(['ansi2html'], stdin=md_input, stdout=html_output, check=True)
-
-        return html_file  # Return the path of the newly created HTML file
+        return ansi_to_html(md_file, html_file)  # Return the path of the newly created HTML file
     except Exception as e:
         return f"Error converting file {md_file} to HTML: {str(e)}"
 
@@ -140,7 +606,7 @@ def run_nmap_scan(target, port, notebook_dir):
     command_str = " ".join(nmap_command)
     print_informational_message(f"Running Nmap: {RESET}{command_str}")
 
-    process = subprocess.Popen(nmap_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    process = ProfiledPopen(nmap_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     stdout, stderr = process.communicate()
     
     if process.returncode == 0:
@@ -164,12 +630,9 @@ def run_whatweb_scan(target, port, notebook_dir):
     print_informational_message(f"Running WhatWeb: {RESET}{shortened_command_display}")
     
     try:
-        subprocess.run(whatweb_command, shell=True, check=True, executable="/bin/bash", stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        run_process(whatweb_command, shell=True, check=True, executable="/bin/bash", stdout=subprocess.DEVNULL, stderr=STDERR_TAIL)
         
-        with open(output_md_filepath, 'r') as md_file, open(output_html_filepath, 'w') as html_file:
-            ansi2html_command = ['ansi2html']
-            process = subprocess.Popen(ansi2html_command, stdin=md_file, stdout=html_file)
-            process.communicate()  # Wait for conversion to complete
+        ansi_to_html(output_md_filepath, output_html_filepath)
 
         return output_md_filepath, output_html_filepath
 
@@ -177,28 +640,315 @@ def run_whatweb_scan(target, port, notebook_dir):
         print_error_message(f"Error running WhatWeb scan or converting to HTML: {str(e)}")
         return None
 
-def run_wget(url):
-    wget_command = [
-        "wget", "-r", "--level=0", "-E", "--ignore-length", "-x", "-k", "-p", 
-        "--no-check-certificate", "-erobots=off", "-np", "-N", url
-    ]
-    print_informational_message(f"Running Wget: {RESET}{' '.join(wget_command)}")
-    
+class LinkParser(HTMLParser):
+    # URLs wget -r -p would follow
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if not value:
+                continue
+            if name in LINK_ATTRIBUTES:
+                self.links.append(value)
+            elif name == "srcset":
+                self.links += [candidate.split()[0] for candidate in value.split(",") if candidate.strip()]
+            elif name == "style":
+                self.links += CSS_URL.findall(value)
+
+    def handle_data(self, data):
+        if self.lasttag == "style":
+            self.links += CSS_URL.findall(data)
+
+def extract_links(body, content_type):
+    text = body.decode("utf-8", errors="replace")
+    if "css" in content_type:
+        return CSS_URL.findall(text)
+    parser = LinkParser()
     try:
-        result = subprocess.run(wget_command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        
-    except subprocess.CalledProcessError as e:
+        parser.feed(text)
+        parser.close()
+    except (AssertionError, ValueError):
         pass
+    return parser.links
+
+def mirror_path(root, url_path, query, content_type):
+    # wget -x -E file layout
+    path = posixpath.normpath("/" + unquote(url_path))
+    if url_path.endswith("/") or path == "/":
+        path = path.rstrip("/") + "/index.html"
+    if query:
+        path += "?" + query
+    if "html" in content_type and not re.search(r"\.html?$", path, re.I):
+        path += ".html"
+    elif "css" in content_type and not path.lower().endswith(".css"):
+        path += ".css"
+    return os.path.join(root, *[part for part in path.split("/") if part not in ("", ".", "..")])
+
+class SiteMirror:
+    # Same-origin crawl below the start path, in wget's layout; re-crawls use ETag and Last-Modified
+    def __init__(self, start_url, root, connections=DEFAULT_MIRROR_CONNECTIONS, max_pages=DEFAULT_MIRROR_PAGES,
+                 max_bytes=DEFAULT_MIRROR_SIZE * 1024 * 1024, collector=None, rate=None, controller=None):
+        parts = urlsplit(start_url)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.start_path = parts.path or "/"
+        self.scope = self.start_path if self.start_path.endswith("/") else posixpath.dirname(self.start_path) + "/"
+        self.root = root
+        self.connections = connections
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.collector = collector
+        self.rate = rate
+        self.controller = controller
+        self.cache_path = os.path.join(CACHE_DIR, "mirror", f"{parts.netloc.replace(':', '-')}.json")
+        self.cache = {}
+        self.seen = set()
+        self.counts = {"saved": 0, "unchanged": 0, "skipped": 0, "errors": 0, "bytes": 0}
+        self.budget_hit = None
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r') as cached:
+                self.cache = json.load(cached)
+        except (FileNotFoundError, ValueError):
+            self.cache = {}
+
+    def _save_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        with open(self.cache_path, 'w') as cached:
+            json.dump(self.cache, cached)
+
+    def _resolve(self, base, link, requisite=False):
+        url, _ = urldefrag(urljoin(base, link.strip()))
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or f"{parts.scheme}://{parts.netloc}" != self.origin:
+            return None
+        # Requisites may live anywhere on the host
+        if not requisite and not (parts.path or "/").startswith(self.scope):
+            return None
+        return url
+
+    def _enqueue(self, work, url):
+        if url and url not in self.seen:
+            self.seen.add(url)
+            work.put_nowait(url)
+
+    async def _fetch(self, pool, url, work):
+        parts = urlsplit(url)
+        request_path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        cached = self.cache.get(url)
+        headers = {}
+        if cached and os.path.exists(cached["file"]):
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            response = await pool.request(request_path, headers=headers)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+            self.counts["errors"] += 1
+            return
+
+        if response.status == 304 and cached:
+            self.counts["unchanged"] += 1
+            content_type = cached.get("content_type", "")
+            with open(cached["file"], 'rb') as saved:
+                body = saved.read()
+        elif response.status == 200:
+            content_type = response.headers.get("content-type", "").lower()
+            body = response.body
+            if self.counts["bytes"] + len(body) > self.max_bytes:
+                self.budget_hit = f"size budget of {self.max_bytes // (1024 * 1024)}MB"
+                self.counts["skipped"] += 1
+                return
+            self.counts["bytes"] += len(body)
+            filename = mirror_path(self.root, parts.path, parts.query, content_type)
+            try:
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+                with open(filename, 'wb') as saved:
+                    saved.write(body)
+            except OSError:
+                # File and directory with the same name; first one wins
+                self.counts["errors"] += 1
+                return
+            # Keep the server's timestamp, like wget -N
+            last_modified = response.headers.get("last-modified")
+            if last_modified:
+                try:
+                    modified = parsedate_to_datetime(last_modified).timestamp()
+                    os.utime(filename, (modified, modified))
+                except (TypeError, ValueError, OverflowError):
+                    pass
+            self.cache[url] = {"file": filename, "etag": response.headers.get("etag"), "last_modified": last_modified,
+                               "content_type": content_type}
+            self.counts["saved"] += 1
+        elif response.status in (301, 302, 303, 307, 308) and "location" in response.headers:
+            self._enqueue(work, self._resolve(url, response.headers["location"]))
+            return
+        else:
+            return
+
+        if self.collector:
+            self.collector.add(Hit(url, 200, len(body), len(body.split()), body.count(b"\n") + 1, "mirror"))
+        if "html" in content_type or "css" in content_type:
+            requisite = "css" in content_type
+            for link in extract_links(body, content_type):
+                self._enqueue(work, self._resolve(url, link, requisite))
+
+    async def crawl(self):
+        self._load_cache()
+        rate_limiter = RateLimiter(self.rate) if self.rate else None
+        pool = HttpConnectionPool(self.origin, self.connections, rate_limiter=rate_limiter, controller=self.controller)
+        work = asyncio.Queue()
+        self._enqueue(work, self.origin + self.start_path)
+        fetched = 0
+
+        async def worker():
+            nonlocal fetched
+            while True:
+                url = await work.get()
+                try:
+                    if fetched >= self.max_pages:
+                        self.budget_hit = f"page budget of {self.max_pages}"
+                        self.counts["skipped"] += 1
+                        continue
+                    if budget_expired():
+                        self.budget_hit = "time budget"
+                        self.counts["skipped"] += 1
+                        continue
+                    fetched += 1
+                    await self._fetch(pool, url, work)
+                finally:
+                    work.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.connections)]
+        try:
+            await work.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await pool.close()
+            self._save_cache()
+            budget_progress(fetched)
+        return self.counts
+
+def run_mirror(url, collector=None, connections=DEFAULT_MIRROR_CONNECTIONS, max_pages=DEFAULT_MIRROR_PAGES,
+               max_size=DEFAULT_MIRROR_SIZE, rate=None, controller=None):
+    root = get_target_directory(url)
+    print_informational_message(f"Mirroring site: {RESET}{url} -> {root}/ ({connections} connections, "
+                                f"at most {max_pages} pages and {max_size}MB)")
+    mirror = SiteMirror(url, root, connections, max_pages, max_size * 1024 * 1024, collector, rate, controller)
+    started = time.monotonic()
+    try:
+        counts = run_async(mirror.crawl())
+    except OSError as e:
+        print_error_message(f"Mirror could not reach {url}: {e}")
+        return False
+
+    print_informational_message(f"Mirrored {url} in {time.monotonic() - started:.1f}s: {RESET}{counts['saved']} saved, "
+                                f"{counts['unchanged']} unchanged, {counts['errors']} errors, {counts['bytes'] // 1024}KB")
+    if mirror.budget_hit:
+        print_error_message(f"Mirror stopped at its {mirror.budget_hit}; {counts['skipped']} URLs were not fetched")
+    return root
+
+
+class SiteSync:
+    # Mirror one tree into another; new files are reflinked, hardlinked or copied
+    def __init__(self, verify=False):
+        self.verify = verify
+        self.methods = ["reflink", "hardlink", "copy"]
+        self.counts = {"unchanged": 0, "reflinked": 0, "hardlinked": 0, "copied": 0, "pruned": 0}
+
+    def _unchanged(self, source, destination):
+        if os.path.samestat(source, destination):
+            return True
+        if source.st_size != destination.st_size:
+            return False
+        return source.st_mtime_ns == destination.st_mtime_ns and not self.verify
+
+    def _place(self, source_path, destination_path):
+        for method in list(self.methods):
+            try:
+                if method == "reflink":
+                    with open(source_path, 'rb') as source, open(destination_path, 'wb') as destination:
+                        fcntl.ioctl(destination.fileno(), FICLONE, source.fileno())
+                    shutil.copystat(source_path, destination_path)
+                elif method == "hardlink":
+                    os.link(source_path, destination_path)
+                else:
+                    shutil.copy2(source_path, destination_path)
+            except OSError:
+                if method == "copy":
+                    raise
+                if os.path.lexists(destination_path):
+                    os.remove(destination_path)
+                self.methods.remove(method)
+                continue
+            self.counts[{"reflink": "reflinked", "hardlink": "hardlinked", "copy": "copied"}[method]] += 1
+            return
 
-def copy_site_to_notebook(target_dir, notebook_dir):
+    def _sync_file(self, entry, destination_path, existing):
+        if existing is not None and not existing.is_dir(follow_symlinks=False) and not existing.is_symlink():
+            source_stat = entry.stat(follow_symlinks=False)
+            destination_stat = existing.stat(follow_symlinks=False)
+            if self._unchanged(source_stat, destination_stat):
+                self.counts["unchanged"] += 1
+                return
+            # Same content, only the timestamps changed
+            if self.verify and source_stat.st_size == destination_stat.st_size and hash_file(entry.path) == hash_file(destination_path):
+                shutil.copystat(entry.path, destination_path)
+                self.counts["unchanged"] += 1
+                return
+        if existing is not None:
+            self._remove(existing)
+        self._place(entry.path, destination_path)
+
+    def _remove(self, entry):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.remove(entry.path)
+
+    def sync(self, source_dir, destination_dir):
+        os.makedirs(destination_dir, exist_ok=True)
+        with os.scandir(destination_dir) as entries:
+            existing = {entry.name: entry for entry in entries}
+
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                destination_path = os.path.join(destination_dir, entry.name)
+                current = existing.pop(entry.name, None)
+                if entry.is_symlink():
+                    target = os.readlink(entry.path)
+                    if current is not None and current.is_symlink() and os.readlink(current.path) == target:
+                        self.counts["unchanged"] += 1
+                        continue
+                    if current is not None:
+                        self._remove(current)
+                    os.symlink(target, destination_path)
+                    self.counts["copied"] += 1
+                elif entry.is_dir():
+                    if current is not None and not current.is_dir(follow_symlinks=False):
+                        self._remove(current)
+                    self.sync(entry.path, destination_path)
+                else:
+                    self._sync_file(entry, destination_path, current)
+
+        # Gone from the source
+        for entry in existing.values():
+            self._remove(entry)
+            self.counts["pruned"] += 1
+        return self.counts
+
+def copy_site_to_notebook(target_dir, notebook_dir, verify=False):
     try:
         if os.path.exists(target_dir) and os.path.isdir(target_dir):
             destination_dir = os.path.join(notebook_dir, os.path.basename(target_dir))
-            
-            if os.path.exists(destination_dir):
-                shutil.rmtree(destination_dir)
-            
-            shutil.copytree(target_dir, destination_dir)
+            counts = SiteSync(verify).sync(target_dir, destination_dir)
+            print_informational_message(f"Synced {target_dir} to the notebook: {RESET}" + ", ".join(f"{count} {name}" for name, count in counts.items()))
         else:
             print(f"Error: The target directory {target_dir} does not exist.")
     except Exception as e:
@@ -215,157 +965,1440 @@ def extract_hostname(url):
     hostname = hostname.split(':')[0]
     return hostname
 
+def human_size(size):
+    # Same units and rounding as ls -h
+    if size < 1024:
+        return str(size)
+    for unit in "KMGT":
+        size /= 1024
+        # Rounding up can carry into the next unit
+        rounded = math.ceil(size * 10) / 10 if size < 10 else math.ceil(size)
+        if rounded < 1024:
+            break
+    return f"{rounded:.1f}{unit}" if rounded < 10 else f"{rounded:.0f}{unit}"
+
+def sniff_mime_type(path, head):
+    # Magic bytes first, extensions are often wrong
+    for magic, mime_type in MIME_SIGNATURES:
+        if head.startswith(magic):
+            return mime_type
+    stripped = head.lstrip().lower()
+    if stripped.startswith((b"<!doctype html", b"<html")):
+        return "text/html"
+    guessed, _ = mimetypes.guess_type(path)
+    if guessed:
+        return guessed
+    if b"\0" in head:
+        return "application/octet-stream"
+    return "text/plain"
+
+def manifest_record(path, stat_result):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        head = handle.read(1024 * 1024)
+        block = head
+        while block:
+            digest.update(block)
+            block = handle.read(1024 * 1024)
+    return {
+        "path": path,
+        "size": stat_result.st_size,
+        "mtime": stat_result.st_mtime,
+        "sha256": digest.hexdigest(),
+        "mime": sniff_mime_type(path, head[:512]),
+    }
+
+def iter_manifest(path):
+    with open(path, 'r') as manifest:
+        for line in manifest:
+            yield json.loads(line)
+
+@lru_cache(maxsize=None)
+def owner_names(uid, gid):
+    try:
+        user = pwd.getpwuid(uid).pw_name
+    except KeyError:
+        user = str(uid)
+    try:
+        group = grp.getgrgid(gid).gr_name
+    except KeyError:
+        group = str(gid)
+    return user, group
+
+def list_directory(directory, listing, manifest):
+    # One directory in ls -lahR layout, then its subdirectories
+    with os.scandir(directory) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+
+    rows = []
+    for name, path in ((".", directory), ("..", os.path.join(directory, ".."))):
+        rows.append((name, os.stat(path)))
+    for entry in entries:
+        rows.append((entry.name, entry.stat(follow_symlinks=False)))
+    blocks = sum(stat_result.st_blocks for _, stat_result in rows) * 512
+
+    listing.write(f"{directory}:\ntotal {human_size(blocks)}\n")
+    for name, stat_result in rows:
+        user, group = owner_names(stat_result.st_uid, stat_result.st_gid)
+        modified = datetime.fromtimestamp(stat_result.st_mtime)
+        when = modified.strftime("%b %e %H:%M" if time.time() - stat_result.st_mtime < 180 * 24 * 60 * 60 else "%b %e  %Y")
+        if stat.S_ISLNK(stat_result.st_mode):
+            name = f"{name} -> {os.readlink(os.path.join(directory, name))}"
+        listing.write(f"{stat.filemode(stat_result.st_mode)} {stat_result.st_nlink:>2} {user} {group} {human_size(stat_result.st_size):>4} {when} {name}\n")
+    listing.write("\n")
+
+    subdirectories = []
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            subdirectories.append(entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            manifest.write(json.dumps(manifest_record(entry.path, entry.stat(follow_symlinks=False))) + '\n')
+    del entries, rows
+
+    for subdirectory in subdirectories:
+        list_directory(subdirectory, listing, manifest)
+
 def run_ls_and_tee(target_dir, target, port, notebook_dir):    
     md_output_filename = f"022-webscan-{target}-{port}-wget-directory-output.md"
-    
-    ls_command = f"ls -lahR {target_dir} | tee {md_output_filename}"
-    
+    manifest_filename = f"022-webscan-{target}-{port}-wget-manifest.jsonl"
+
+    if not os.path.isdir(target_dir):
+        print(f"Error: The target directory {target_dir} does not exist.")
+        return False
+
     try:
-        result = subprocess.run(ls_command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        with open(md_output_filename, 'w') as listing, open(manifest_filename, 'w') as manifest:
+            list_directory(target_dir, listing, manifest)
+    except OSError as e:
+        print(f"Error: {e}")
+        return False
+
+    html_file = convert_md_to_html(md_output_filename, notebook_dir)
 
-        if os.path.exists(md_output_filename):            
-            html_file = convert_md_to_html(md_output_filename, notebook_dir)
-        else:
-            print(f"Error: Markdown file {md_output_filename} was not created.")
-    
-    except subprocess.CalledProcessError as e:
-        print(f"Error: {e.stderr}")
 
-def run_feroxbuster(target, url, port, notebook_dir):
+class Hit:
+    # One discovered URL, from any brute-forcer
+    __slots__ = ("url", "status", "length", "words", "lines", "source")
+
+    def __init__(self, url, status=None, length=None, words=None, lines=None, source=None):
+        self.url = url
+        self.status = status
+        self.length = length
+        self.words = words
+        self.lines = lines
+        self.source = source
+
+    def to_json(self):
+        return json.dumps({name: getattr(self, name) for name in self.__slots__}, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, line):
+        record = json.loads(line)
+        return cls(**{name: record.get(name) for name in cls.__slots__})
+
+def parse_ferox_record(line):
+    # Only "response" objects are hits
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or record.get("type") != "response" or not record.get("url"):
+        return None
+    return Hit(record["url"], record.get("status"), record.get("content_length"), record.get("word_count"), record.get("line_count"), "feroxbuster")
+
+def parse_ffuf_record(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or not record.get("url"):
+        return None
+    return Hit(record["url"], record.get("status"), record.get("length"), record.get("words"), record.get("lines"), "ffuf")
+
+def ffuf_record_input(line):
+    # ffuf base64-encodes input values
+    value = json.loads(line).get("input", {}).get("FUZZ", "")
+    try:
+        return base64.b64decode(value, validate=True).decode()
+    except (ValueError, UnicodeDecodeError):
+        return value
+
+GOBUSTER_LINE = re.compile(r'^(\S+)\s+\(Status: (\d+)\)(?:\s+\[Size: (\d+)\])?')
+
+def parse_gobuster_line(line):
+    match = GOBUSTER_LINE.match(line.strip())
+    if not match:
+        return None
+    url, status, size = match.groups()
+    return Hit(url, int(status), int(size) if size else None, source="gobuster")
+
+def format_ffuf_hit(hit, word, duration_ms, redirect=''):
+    lines = [
+        f"[Status: {hit.status}, Size: {hit.length}, Words: {hit.words}, Lines: {hit.lines}, Duration: {duration_ms}ms]",
+        f"| URL | {hit.url}",
+    ]
+    if redirect:
+        lines.append(f"| --> | {redirect}")
+    lines.append(f"    * FUZZ: {word}")
+    return "\n".join(lines) + "\n\n"
+
+def format_gobuster_hit(hit):
+    return f"{hit.url:<60} (Status: {hit.status}) [Size: {hit.length}]\n"
+
+def render_ffuf_record(line, hit):
+    record = json.loads(line)
+    return format_ffuf_hit(hit, ffuf_record_input(line), int(record.get("duration", 0)) // 1000000, record.get("redirectlocation", ''))
+
+def normalize_escapes(text):
+    # Normalize percent escapes
+    def replace(match):
+        character = chr(int(match.group(1), 16))
+        return character if character in UNRESERVED_CHARACTERS else match.group(0).upper()
+    return PERCENT_ESCAPE.sub(replace, text)
+
+def canonical_url(url):
+    # Canonical form for deduplication
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    netloc = host if port in (None, DEFAULT_PORTS.get(scheme)) else f"{host}:{port}"
+
+    segments = []
+    for segment in normalize_escapes(parts.path).split("/"):
+        if segment == "..":
+            if segments:
+                segments.pop()
+        elif segment not in ("", "."):
+            segments.append(segment)
+    path = "/" + "/".join(segments)
+
+    query = "&".join(sorted(normalize_escapes(pair) for pair in parts.query.split("&") if pair))
+    return f"{scheme}://{netloc}{path}" + (f"?{query}" if query else "")
+
+class UrlIndex:
+    # URL set deduplicated on canonical forms, stored as a trie of origin and path segments
+    def __init__(self):
+        self.root = {}
+        self.originals = []
+
+    @staticmethod
+    def _split(url):
+        origin, _, rest = url.partition("://")
+        netloc, _, path_query = rest.partition("/")
+        path, _, query = path_query.partition("?")
+        return [f"{origin}://{netloc}"] + (path.split("/") if path else []), "?" + query
+
+    def add(self, url):
+        # Returns the URL if it is new, else None
+        url = url.strip()
+        segments, query = self._split(canonical_url(url))
+        node = self.root
+        for position, segment in enumerate(segments):
+            child = node.get(segment)
+            last = position == len(segments) - 1
+            if child is None and last and query == "?":
+                node[sys.intern(segment)] = len(self.originals)
+                self.originals.append(url)
+                return url
+            if child is None:
+                child = node[sys.intern(segment)] = {}
+            elif not isinstance(child, dict):
+                if last and query == "?":
+                    return None
+                child = node[segment] = {"?": child}
+            node = child
+        if query in node:
+            return None
+        node[query] = len(self.originals)
+        self.originals.append(url)
+        return url
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def __contains__(self, url):
+        segments, query = self._split(canonical_url(url))
+        node = self.root
+        for segment in segments:
+            if not isinstance(node, dict) or segment not in node:
+                return False
+            node = node[segment]
+        return query in node if isinstance(node, dict) else query == "?"
+
+    def __len__(self):
+        return len(self.originals)
+
+    def _walk(self, node):
+        # Depth-first, in insertion order
+        for key in sorted(node):
+            child = node[key]
+            if isinstance(child, dict):
+                yield from self._walk(child)
+            else:
+                yield child
+
+    def iter_sorted(self):
+        for number in self._walk(self.root):
+            yield self.originals[number]
+
+    def __iter__(self):
+        return iter(self.originals)
+
+class UrlCollector:
+    # URL set the brute-forcers feed while they run; wildcard hits are only counted
+    def __init__(self, output_file, hits_file, producers, resume=False, calibration=None):
+        self.output_file = output_file
+        self.hits_file = hits_file
+        self.pending_producers = set(producers)
+        self.urls = UrlIndex()
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.handle = None
+        self.hits_handle = None
+        self.finished = False
+        self.calibration = calibration
+        self.wildcards = 0
+
+        # Keep the hits of skipped stages
+        self.resume = resume and os.path.exists(hits_file)
+        if self.resume:
+            self.urls.update(hit.url for hit in iter_hits(hits_file))
+
+    def _open(self):
+        if self.handle is None:
+            mode = 'a' if self.resume else 'w'
+            self.hits_handle = open(self.hits_file, mode)
+            self.handle = open(self.output_file, 'w')
+            self.handle.writelines(url + '\n' for url in self.urls)
+            self.handle.flush()
+
+    def add(self, hit):
+        with self.lock:
+            if self.calibration and self.calibration.matches_hit(hit):
+                self.wildcards += 1
+                return False
+            self._open()
+            self.hits_handle.write(hit.to_json() + '\n')
+            self.hits_handle.flush()
+            url = self.urls.add(hit.url)
+            if url is None:
+                return False
+            self.handle.write(url + '\n')
+            self.handle.flush()
+            profile_count("hits")
+            budget_hit()
+            for subscriber, _, hits in self.subscribers:
+                subscriber.put(hit if hits else url)
+            return True
+
+    def subscribe(self, name=None, hits=False):
+        # Yields the URLs collected so far, then new ones until the producers are done
+        subscriber = queue.Queue()
+        with self.lock:
+            for url in self.urls:
+                subscriber.put(Hit(url) if hits else url)
+            if self.finished or not self.pending_producers - {name}:
+                subscriber.put(None)
+            else:
+                self.subscribers.append((subscriber, name, hits))
+
+        while True:
+            try:
+                url = subscriber.get(timeout=1)
+            except queue.Empty:
+                if STOP.is_set():
+                    return
+                continue
+            if url is None:
+                return
+            yield url
+
+    def producer_done(self, name):
+        with self.lock:
+            self.pending_producers.discard(name)
+            for subscription in [subscription for subscription in self.subscribers if not self.pending_producers - {subscription[1]}]:
+                subscription[0].put(None)
+                self.subscribers.remove(subscription)
+            if self.pending_producers or self.finished:
+                return
+            self.finished = True
+            # Nothing new, keep the last run's files
+            if self.handle is None and self.resume:
+                return
+            self._open()
+            self.handle.close()
+            self.hits_handle.close()
+
+def iter_hits(path, parse_record=Hit.from_json):
+    with open(path, 'r', errors='replace') as records:
+        for line in records:
+            hit = parse_record(line)
+            if hit:
+                yield hit
+
+def follow_file(path, process, poll_interval=0.2):
+    # Follow a file until the process has exited
+    handle = None
+    partial = ''
+    try:
+        while True:
+            running = process.poll() is None
+            if handle is None and os.path.exists(path):
+                handle = open(path, 'r', errors='replace')
+            while handle:
+                line = handle.readline()
+                if not line:
+                    break
+                if not line.endswith('\n'):
+                    partial += line
+                    continue
+                yield partial + line
+                partial = ''
+            if not running:
+                break
+            time.sleep(poll_interval)
+    finally:
+        if handle:
+            handle.close()
+    if partial:
+        yield partial
+
+FFUF_PROGRESS = re.compile(rb'Progress: \[(\d+)/(\d+)\]')
+
+def watch_progress(stream, callback):
+    # ffuf redraws its progress line with carriage returns
+    tail = b''
+    for chunk in iter(lambda: os.read(stream.fileno(), 4096), b''):
+        tail = (tail + chunk)[-256:]
+        matches = FFUF_PROGRESS.findall(tail)
+        if matches:
+            callback(int(matches[-1][0]), int(matches[-1][1]))
+
+class YieldMonitor:
+    # Stops a brute-forcer once the last window requests found fewer than min_yield new URLs
+    def __init__(self, name, min_yield, window=DEFAULT_YIELD_WINDOW):
+        self.name = name
+        self.min_yield = min_yield
+        self.window = window
+        self.requests = 0
+        self.hits = 0
+        self.recent = collections.deque()
+        self.reason = None
+        self.lock = threading.Lock()
+
+    @property
+    def policy(self):
+        return f"stop when fewer than {self.min_yield} new hits arrive in {self.window} requests"
+
+    def hit(self):
+        with self.lock:
+            self.hits += 1
+            self.recent.append(self.requests)
+
+    def progress(self, requests):
+        with self.lock:
+            self.requests = max(self.requests, requests)
+            while self.recent and self.recent[0] <= self.requests - self.window:
+                self.recent.popleft()
+            if self.reason is None and self.requests >= self.window and len(self.recent) < self.min_yield:
+                self.reason = (f"{len(self.recent)} new hits in the last {self.window} requests, "
+                               f"{self.hits} in {self.requests} requests overall")
+            return self.reason is not None
+
+    def summary(self):
+        if self.reason:
+            return f"[webscan] {self.name} stopped early ({self.policy}): {self.reason}\n"
+        return f"[webscan] {self.name} completed ({self.policy}): {self.hits} new hits in {self.requests} requests\n"
+
+def stream_command(command, output_filename, parse_line=None, collector=None, render=None, append=False, progress=None, monitor=None):
+    # Hand every hit to the collector as soon as the tool prints it
+    with open(output_filename, 'a' if append else 'w') as output_file:
+        process = ProfiledPopen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE if progress else STDERR_TAIL,
+                                text=True, errors='replace', bufsize=1)
+        requests = 0
+
+        def on_progress(done, total):
+            nonlocal requests
+            requests = done
+            progress(done, total)
+            if monitor and monitor.progress(done):
+                process.terminate()
+
+        watcher = None
+        if progress:
+            watcher = threading.Thread(target=watch_progress, args=(process.stderr, on_progress), daemon=True)
+            watcher.start()
+        try:
+            for line in process.stdout:
+                hit = parse_line(line) if parse_line else None
+                if render:
+                    if hit:
+                        output_file.write(render(line, hit))
+                else:
+                    output_file.write(line)
+                if hit and (collector.add(hit) if collector else True) and monitor:
+                    monitor.hit()
+        finally:
+            process.stdout.close()
+            process.wait()
+            if watcher:
+                watcher.join()
+                process.stderr.close()
+            if monitor:
+                output_file.write(monitor.summary())
+            profile_count("requests", requests)
+
+    # Stopped on purpose, not failed
+    if process.returncode != 0 and not (monitor and monitor.reason) and not budget_expired():
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+def stream_json_output(command, output_filename, json_filename, parse_record, collector=None):
+    # For tools that only write JSON to a file
+    if os.path.exists(json_filename):
+        os.remove(json_filename)
+
+    with open(output_filename, 'w') as output_file:
+        process = ProfiledPopen(command, stdout=output_file, stderr=STDERR_TAIL)
+        try:
+            for line in follow_file(json_filename, process):
+                hit = parse_record(line)
+                if hit and collector:
+                    collector.add(hit)
+        finally:
+            process.wait()
+
+    if process.returncode != 0 and not budget_expired():
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+def candidate_share_path(tool):
+    return os.path.join(CACHE_DIR, "candidates", f"{tool}.txt")
+
+class HitStats:
+    # Hit counts of words over past runs, once per host
+    def __init__(self, path=HIT_STATS_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS found (word TEXT, host TEXT, PRIMARY KEY (word, host))")
+
+    def record(self, host, urls):
+        words = set()
+        for url in urls:
+            words.update(unquote(segment) for segment in urlsplit(url).path.split("/") if segment)
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO found (word, host) VALUES (?, ?)", ((word, host) for word in words))
+        return len(words)
+
+    def ranking(self):
+        rows = self.connection.execute("SELECT word FROM found GROUP BY word ORDER BY COUNT(*) DESC, word LIMIT ?", (HIT_STATS_LIMIT,))
+        return {word: rank for rank, (word,) in enumerate(rows)}
+
+    def close(self):
+        self.connection.close()
+
+def compile_wordlist(candidates, output_path, ranking):
+    # Compile a wordlist, ranked words first, with an .idx of line offsets
+    temporary_path = f"{output_path}.cold"
+    hot = []
+    with open(temporary_path, 'w') as cold:
+        for word in candidates:
+            if word in ranking:
+                hot.append((ranking[word], word))
+            else:
+                cold.write(word + '\n')
+    hot.sort()
+
+    offsets = array.array('Q', [0])
+    with open(output_path, 'wb') as output:
+        for _, word in hot:
+            line = word.encode() + b'\n'
+            output.write(line)
+            offsets.append(offsets[-1] + len(line))
+        with open(temporary_path, 'rb') as cold:
+            for line in cold:
+                output.write(line)
+                offsets.append(offsets[-1] + len(line))
+    os.remove(temporary_path)
+
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    with open(f"{output_path}.idx", 'wb') as index:
+        offsets.tofile(index)
+    return len(offsets) - 1, len(hot)
+
+class CompiledWordlist:
+    # Memory-mapped compiled wordlist
+    def __init__(self, path):
+        self.path = path
+        self.handles = [open(path, 'rb'), open(f"{path}.idx", 'rb')]
+        self.maps = [mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(handle.fileno()).st_size else b''
+                     for handle in self.handles]
+        self.data = self.maps[0]
+        self.offsets = memoryview(self.maps[1]).cast('Q') if self.maps[1] else [0]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.data[self.offsets[index]:self.offsets[index + 1] - 1].decode(errors='ignore')
+
+    def byte_offset(self, index):
+        return self.offsets[min(index, len(self))]
+
+    def iter_from(self, start=0):
+        for index in range(start, len(self)):
+            yield self[index]
+
+    def close(self):
+        if isinstance(self.offsets, memoryview):
+            self.offsets.release()
+        for mapped in self.maps:
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for handle in self.handles:
+            handle.close()
+
+def open_compiled_wordlist(path):
+    try:
+        if os.path.getmtime(f"{path}.idx") >= os.path.getmtime(path) and sys.byteorder == "little":
+            return CompiledWordlist(path)
+    except OSError:
+        pass
+    return None
+
+def iter_candidates(path, extensions=(), start=0):
+    # Candidates from position start on
+    compiled = None if extensions else open_compiled_wordlist(path)
+    if compiled is None:
+        yield from itertools.islice(iter_wordlist(path, extensions), start, None)
+        return
+    try:
+        yield from compiled.iter_from(start)
+    finally:
+        compiled.close()
+
+def plan_discovery_candidates(dedup=True, reorder=True):
+    # Split the candidates between the tools, past hits first
+    plan_dir = os.path.join(CACHE_DIR, "candidates")
+    manifest_path = os.path.join(plan_dir, "manifest.json")
+
+    sources = {}
+    for tool, wordlist, extensions in DISCOVERY_WORDLISTS:
+        path = os.path.join(WORDLIST_DIR, wordlist)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Wordlist {path} not found.")
+        info = os.stat(path)
+        sources[tool] = [path, info.st_size, info.st_mtime, extensions]
+
+    stats = HitStats()
+    try:
+        ranking = stats.ranking()
+    finally:
+        stats.close()
+    ranking_digest = hashlib.sha256(json.dumps(sorted(ranking.items(), key=lambda item: item[1])).encode()).hexdigest()
+    plan = {"sources": sources, "dedup": dedup, "ranking": ranking_digest}
+
+    try:
+        with open(manifest_path, 'r') as manifest:
+            planned = json.load(manifest)
+        if not reorder:
+            planned["ranking"] = ranking_digest
+        if planned == plan and all(open_compiled_wordlist(candidate_share_path(tool)) for tool in sources):
+            return {tool: candidate_share_path(tool) for tool in sources}
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        pass
+
+    os.makedirs(plan_dir, exist_ok=True)
+    print_informational_message("Planning discovery candidates across feroxbuster, gobuster and ffuf")
+
+    seen = set()
+    requested = 0
+    total = 0
+
+    def candidates(source, extensions):
+        nonlocal requested
+        for word in iter_wordlist(source, extensions):
+            requested += 1
+            if word not in seen:
+                seen.add(word)
+                yield word
+
+    for tool, wordlist, extensions in DISCOVERY_WORDLISTS:
+        if not dedup:
+            seen = set()
+        share, ranked = compile_wordlist(candidates(sources[tool][0], extensions), candidate_share_path(tool), ranking)
+        total += share
+        print_informational_message(f"{tool}: {RESET}{share} candidates, {ranked} moved up by past hits")
+
+    with open(manifest_path, 'w') as manifest:
+        json.dump(plan, manifest)
+
+    print_informational_message(f"Planned {total} candidates out of {requested} requests")
+    return {tool: candidate_share_path(tool) for tool in sources}
+
+def run_feroxbuster(target, url, port, notebook_dir, wordlist=None, collector=None, rate=None, calibration=None, recursion=False, controller=None):
     import os
     import subprocess
 
     hostname = extract_hostname(url)
     md_output_filename = f"023-webscan-{hostname}-{port}-ferox_basic_files.md"
+    json_output_filename = f"023-webscan-{hostname}-{port}-ferox_basic_files.json"
+
+    extension_args = [] if wordlist else ["-x", "php,html"]
+    rate_args = ["--rate-limit", str(rate)] if rate else []
+    filter_args = calibration.tool_args("feroxbuster") if calibration else []
+    depth_args = ["--no-recursion"] if recursion else ["--depth", "2"]
+    # Limited to what --budget has time for
+    full_wordlist = wordlist or os.path.expanduser("~/.local/bin/wordlists/common.txt")
+    limit = budget_limit(wordlist_size(full_wordlist)) if current_budget() else None
+    ferox_wordlist = resume_wordlist(full_wordlist, 0, limit) if limit is not None else full_wordlist
 
     feroxbuster_command = [
         "feroxbuster",
         "-u", url,
         "-k",
-        "--depth", "2",
-        "--wordlist", os.path.expanduser("~/.local/bin/wordlists/common.txt"),
-        "-s", "200", "302",
-        "--threads", "150",
+        *depth_args,
+        "--wordlist", ferox_wordlist,
+        # Match what ffuf and gobuster report
+        "-s", *(str(status) for status in sorted(NATIVE_MATCH_STATUS)),
+        "--threads", str(tool_threads(controller, 150)),
         "--extract-links",
         "-E",
         "-B",
         "-g",
-        "-x", "php,html",
-        "-o", md_output_filename
+        *extension_args,
+        *rate_args,
+        *filter_args,
+        "--json",
+        "-o", json_output_filename
     ]
 
+    if controller:
+        controller.join()
     try:
         print_informational_message(f"Running Feroxbuster: {RESET}{' '.join(feroxbuster_command)}")
-        with open(md_output_filename, 'w') as output_file:
-            subprocess.run(feroxbuster_command, stdout=output_file, stderr=subprocess.DEVNULL, check=True, text=True)
+        stream_json_output(feroxbuster_command, md_output_filename, json_output_filename, parse_ferox_record, collector)
         
         # Convert Markdown to HTML
         html_output = convert_md_to_html(md_output_filename, notebook_dir)
 
     except subprocess.CalledProcessError as e:
         print(f"Error running feroxbuster: {e}")
+        return False
     except Exception as e:
         print(f"Error during processing: {e}")
+        return False
+    finally:
+        if ferox_wordlist != full_wordlist:
+            os.remove(ferox_wordlist)
+        if controller:
+            controller.leave()
 
 
-def run_ffuf(url, target, port, notebook_dir):    
+def run_ffuf(url, target, port, notebook_dir, wordlist=None, collector=None, checkpoint=None, rate=None, calibration=None, monitor=None, controller=None):    
     output_filename = f"024-webscan-{target}-{port}-ffuf_wordlist.md"
     url = url.rstrip("/")
+    wordlist = wordlist or os.path.expanduser("~/.local/bin/wordlists/directory-list-2.3-medium.txt")
+    threads = tool_threads(controller, 150)
+
+    # Pick up where an interrupted run left off
+    offset = checkpoint.offset if checkpoint else 0
+    # Limited to what --budget has time for
+    limit = budget_limit(wordlist_size(wordlist) - offset) if current_budget() else None
+    ffuf_wordlist = resume_wordlist(wordlist, offset, limit) if offset or limit is not None else wordlist
 
     ffuf_command = [
         "ffuf",
         "-u", f"{url}/FUZZ",
-        "-w", os.path.expanduser("~/.local/bin/wordlists/directory-list-2.3-medium.txt"),
-        "-ac",
-        "-v",
-        "-t", "150"
+        "-w", ffuf_wordlist,
+        # Use the shared calibration when there is one
+        *(calibration.tool_args("ffuf") if calibration and calibration.probed else ["-ac"]),
+        "-json",
+        "-t", str(threads),
+        *(["-rate", str(rate)] if rate else [])
     ]
+
+    def progress(done, total):
+        # Requests still in flight below the reported position
+        if checkpoint:
+            checkpoint.update(offset + max(0, done - threads))
+        budget_progress(done)
     
+    if controller:
+        controller.join()
     try:
+        if offset:
+            print_informational_message(f"Resuming FFUF at wordlist line {offset}")
         print_informational_message(f"Running FFUF: {RESET}{' '.join(ffuf_command)}")
-        with open(output_filename, 'w') as output_file:
-            subprocess.run(ffuf_command, stdout=output_file, stderr=subprocess.DEVNULL, check=True, text=True)
+        # Render ffuf's JSON in the -v layout
+        stream_command(ffuf_command, output_filename, parse_ffuf_record, collector, render=render_ffuf_record,
+                       append=bool(offset), progress=progress if checkpoint or monitor or current_budget() else None, monitor=monitor)
+        if monitor and monitor.reason:
+            print_informational_message(f"FFUF stopped early: {RESET}{monitor.reason}")
 
         html_output = convert_md_to_html(output_filename, notebook_dir)
     
     except subprocess.CalledProcessError as e:
         print(f"Error occurred while running ffuf: {e}")
+        return False
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+        return False
+    finally:
+        if checkpoint:
+            checkpoint.update(checkpoint.offset, force=True)
+        if ffuf_wordlist != wordlist:
+            os.remove(ffuf_wordlist)
+        if controller:
+            controller.leave()
 
 
-def run_gobuster(full_url, target, port, notebook_dir):
+def run_gobuster(full_url, target, port, notebook_dir, wordlist=None, collector=None, rate=None, calibration=None, controller=None):
     if not target or not port:
         raise ValueError("Target and port must be defined")
 
     output_file = f"025-webscan-{target}-{port}-gobuster_wc_big.md"
 
+    extension_args = [] if wordlist else ["-x", "php,txt,html,jpg"]
+    threads = tool_threads(controller, 150)
+    # gobuster only knows a per-thread delay
+    rate_args = ["--delay", f"{threads * 1000 // rate}ms"] if rate else []
+    # Limited to what --budget has time for
+    full_wordlist = wordlist or os.path.expanduser("~/.local/bin/wordlists/big.txt")
+    limit = budget_limit(wordlist_size(full_wordlist)) if current_budget() else None
+    gobuster_wordlist = resume_wordlist(full_wordlist, 0, limit) if limit is not None else full_wordlist
+
     gobuster_command = [
         "gobuster", "dir",
-        "-w", os.path.expanduser("~/.local/bin/wordlists/big.txt"),
-        "-x", "php,txt,html,jpg",
-        "-t", "150",
-        "-q", "-n", "-e", "-k",
+        "-w", gobuster_wordlist,
+        *extension_args,
+        *rate_args,
+        *(calibration.tool_args("gobuster") if calibration else []),
+        "-t", str(threads),
+        "-q", "-e", "-k",
         "-u", full_url,
         "--no-error"
     ]
 
+    if controller:
+        controller.join()
     try:
         print_informational_message(f"Running Gobuster: {RESET}{' '.join(gobuster_command)}")
-        with open(output_file, 'w') as output_f:
-            subprocess.run(gobuster_command, stdout=output_f, stderr=subprocess.DEVNULL, check=True, text=True)
+        stream_command(gobuster_command, output_file, parse_gobuster_line, collector)
 
     except subprocess.CalledProcessError as e:
         print(f"Error running gobuster: {e}")
+        return False
     except Exception as e:
         print(f"Unexpected error: {e}")
+        return False
+    finally:
+        if gobuster_wordlist != full_wordlist:
+            os.remove(gobuster_wordlist)
+        if controller:
+            controller.leave()
+
+
+def tool_threads(controller, default):
+    # Thread count for an external tool, fixed once it starts
+    return controller.share(DISCOVERY_TOOLS_PER_HOST) if controller else default
+
+def iter_wordlist(path, extensions=()):
+    with open(path, 'r', errors='ignore') as wordlist:
+        for line in wordlist:
+            word = line.strip()
+            if not word or word.startswith('#'):
+                continue
+            yield word
+            for extension in extensions:
+                yield f"{word}.{extension}"
+
+def body_digest(body, reflected=''):
+    # Hash pages without the requested name they echo back
+    if reflected:
+        body = body.replace(reflected.encode(errors='ignore'), b'')
+    return hashlib.sha256(body).hexdigest()
+
+class Calibration:
+    # Soft-404 and wildcard signatures of one host, shared by every discovery stage
+    def __init__(self):
+        self.signatures = {"paths": [], "vhosts": []}
+        self.created = None
+
+    @property
+    def probed(self):
+        return any(self.signatures.values())
+
+    @staticmethod
+    def build_signatures(probes):
+        signatures = []
+        for status in sorted({probe[0] for probe in probes}):
+            group = [probe for probe in probes if probe[0] == status]
+            signature = {"status": status}
+            for index, field in enumerate(("size", "words", "lines"), start=1):
+                values = {probe[index] for probe in group}
+                signature[field] = values.pop() if len(values) == 1 else None
+            signature["digests"] = sorted({probe[4] for probe in group})
+            signatures.append(signature)
+        return signatures
+
+    def matches(self, status, size, words=None, lines=None, digest=None, kind="paths"):
+        for signature in self.signatures[kind]:
+            if signature["status"] != status:
+                continue
+            if digest and digest in signature["digests"]:
+                return True
+            checks = [(signature["size"], size), (signature["words"], words), (signature["lines"], lines)]
+            known = [(expected, actual) for expected, actual in checks if expected is not None and actual is not None]
+            if known and all(expected == actual for expected, actual in known):
+                return True
+        return False
 
+    def matches_hit(self, hit, kind="paths"):
+        return self.matches(hit.status, hit.length, hit.words, hit.lines, kind=kind)
+
+    def matches_response(self, response, reflected='', kind="paths"):
+        return self.matches(response.status, len(response.body), response.words, response.lines, body_digest(response.body, reflected), kind)
+
+    def filters(self, kind="paths"):
+        # Most specific field of each signature, for tools that filter on one number
+        filters = {"size": set(), "words": set(), "lines": set()}
+        for signature in self.signatures[kind]:
+            if signature["status"] == 404 and kind == "paths":
+                continue
+            for field in ("size", "words", "lines"):
+                if signature[field] is not None:
+                    filters[field].add(signature[field])
+                    break
+        return filters
+
+    def tool_args(self, tool, kind="paths"):
+        filters = self.filters(kind)
+        flags = {
+            "ffuf": {"size": "-fs", "words": "-fw", "lines": "-fl"},
+            "feroxbuster": {"size": "--filter-size", "words": "--filter-words", "lines": "--filter-lines"},
+            "gobuster": {"size": "--exclude-length"},
+        }[tool]
+        args = []
+        for field, flag in flags.items():
+            if filters[field]:
+                args += [flag, ",".join(str(value) for value in sorted(filters[field]))]
+        return args
+
+    def load(self, path, max_age=CALIBRATION_MAX_AGE):
+        try:
+            with open(path, 'r') as cached:
+                data = json.load(cached)
+        except (FileNotFoundError, ValueError):
+            return False
+        if max_age is not None and time.time() - data.get("created", 0) > max_age:
+            return False
+        self.signatures = data["signatures"]
+        self.created = data.get("created")
+        return True
 
+    def save(self, path):
+        # Keep the age of a loaded calibration
+        if self.created is None:
+            self.created = time.time()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as cached:
+            json.dump({"created": self.created, "signatures": self.signatures}, cached, indent=2)
+
+async def probe_calibration(base_url, domain=None, timeout=DEFAULT_ENGINE_TIMEOUT):
+    # Random names and virtual hosts to probe
+    pool = HttpConnectionPool(base_url, 4, timeout)
+    base_path = urlsplit(base_url).path.rstrip('/')
+    extensions = sorted({extension for _, _, tool_extensions in DISCOVERY_WORDLISTS for extension in tool_extensions})
+
+    path_probes = []
+    for length in CALIBRATION_LENGTHS:
+        token = random_token(length)
+        path_probes += [(token, f"{base_path}/{token}"), (token, f"{base_path}/{token}/")]
+        path_probes += [(f"{token}.{extension}", f"{base_path}/{token}.{extension}") for extension in extensions]
+
+    vhost_probes = []
+    if domain:
+        vhost_probes = [(token, f"{token}.{domain}") for token in (random_token(length) for length in CALIBRATION_LENGTHS)]
 
-def process_webscan_files(target, port):
-    output_file = f'webscan-urls-{target}-{port}.md'
-    unique_urls = set()
-    
-    file_mappings = {
-        '023': f'023-webscan-{target}-{port}-ferox_basic_files.md',
-        '024': f'024-webscan-{target}-{port}-ffuf_wordlist.md',
-        '025': f'025-webscan-{target}-{port}-gobuster_wc_big.md'
-    }
+    async def probe(name, path, headers=None):
+        try:
+            response = await pool.request(path, headers=headers)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+            return None
+        return (response.status, len(response.body), response.words, response.lines, body_digest(response.body, name))
+
+    try:
+        paths = await asyncio.gather(*(probe(token, path) for token, path in path_probes))
+        vhosts = await asyncio.gather(*(probe(host, f"{base_path}/", {"Host": host}) for token, host in vhost_probes))
+    finally:
+        await pool.close()
+
+    calibration = Calibration()
+    calibration.signatures["paths"] = Calibration.build_signatures([probe for probe in paths if probe])
+    calibration.signatures["vhosts"] = Calibration.build_signatures([probe for probe in vhosts if probe])
+    return calibration
+
+def calibration_cache_path(target, port):
+    return os.path.join(CACHE_DIR, "calibration", f"{target}-{port}.json")
+
+def run_calibration(full_url, target, port, domain, calibration):
+    # Per-target copy for the journal, shared cache for later scans
+    cache_path = calibration_cache_path(target, port)
+    record_path = f"webscan-calibration-{target}-{port}.json"
+    if calibration.load(cache_path):
+        print_informational_message(f"Using cached calibration for {target}:{port}")
+        calibration.save(record_path)
+        return
+
+    print_informational_message(f"Calibrating soft-404 and wildcard responses: {RESET}{full_url}")
+    try:
+        probed = run_async(probe_calibration(full_url.rstrip('/'), target if domain else None))
+    except OSError as e:
+        print_error_message(f"Calibration could not reach {full_url}: {e}")
+        return False
+
+    calibration.signatures = probed.signatures
+    calibration.created = None
+    calibration.save(cache_path)
+    calibration.save(record_path)
+    for kind, signatures in calibration.signatures.items():
+        for signature in signatures:
+            if signature["status"] != 404:
+                print_informational_message(f"Wildcard {kind} response: {RESET}status {signature['status']}, size {signature['size']}, "
+                                            f"words {signature['words']}, lines {signature['lines']}")
+
+def run_native_discovery(full_url, target, port, notebook_dir, tool, wordlist=None, connections=DEFAULT_ENGINE_CONNECTIONS, collector=None, checkpoint=None, rate=None, calibration=None, monitor=None, controller=None):
+    if tool == "ffuf":
+        output_filename = f"024-webscan-{target}-{port}-ffuf_wordlist.md"
+        default_wordlist, extensions = "directory-list-2.3-medium.txt", []
+    else:
+        output_filename = f"025-webscan-{target}-{port}-gobuster_wc_big.md"
+        default_wordlist, extensions = "big.txt", ["php", "txt", "html", "jpg"]
+
+    if wordlist:
+        extensions = []
+    wordlist = wordlist or os.path.join(WORDLIST_DIR, default_wordlist)
+    base_url = full_url.rstrip("/")
+    origin = f"{urlsplit(base_url).scheme}://{urlsplit(base_url).netloc}"
+
+    offset = checkpoint.offset if checkpoint else 0
+
+    if offset:
+        print_informational_message(f"Resuming native {tool} engine at candidate {offset}")
+    print_informational_message(f"Running native {tool} engine: {RESET}{base_url}/FUZZ -w {wordlist} -c {connections}")
+
+    async def discover():
+        nonlocal calibration
+        if calibration is None:
+            calibration = await probe_calibration(base_url)
+        started = time.monotonic()
+        hits = 0
+
+        with open(output_filename, 'a' if offset else 'w') as output_file:
+            def on_response(word, path, response):
+                nonlocal hits
+                if response.status not in NATIVE_MATCH_STATUS or calibration.matches_response(response, word):
+                    return
+                hits += 1
+                hit = Hit(origin + path, response.status, len(response.body), response.words, response.lines, f"native-{tool}")
+                if tool == "ffuf":
+                    output_file.write(format_ffuf_hit(hit, word, int((time.monotonic() - started) * 1000), response.headers.get("location", '')))
+                else:
+                    output_file.write(format_gobuster_hit(hit))
+                output_file.flush()
+                if (collector.add(hit) if collector else True) and monitor:
+                    monitor.hit()
+
+            def on_progress(position):
+                if checkpoint:
+                    checkpoint.update(position)
+                budget_progress(position - offset)
+                # The rest waits for the next run
+                if budget_expired():
+                    return True
+                return monitor.progress(position - offset) if monitor else False
+
+            candidates = iter_candidates(wordlist, extensions, offset)
+            requests_sent, errors = await fuzz_paths(base_url, candidates, on_response, connections, start=offset,
+                                                     on_progress=on_progress, rate=rate, controller=controller)
+            if monitor:
+                output_file.write(monitor.summary())
+
+        return requests_sent, errors, hits, time.monotonic() - started
 
-    for prefix, filename in file_mappings.items():
+    try:
+        requests_sent, errors, hits, elapsed = run_async(discover())
+    except OSError as e:
+        print_error_message(f"Native {tool} engine could not reach {base_url}: {e}")
+        return False
+    finally:
+        if checkpoint:
+            checkpoint.update(checkpoint.offset, force=True)
+
+    rate = requests_sent / elapsed if elapsed else 0
+    print_informational_message(f"Native {tool} engine: {RESET}{requests_sent} requests, {errors} errors, {hits} hits in {elapsed:.1f}s ({rate:.0f} req/s)")
+    if monitor and monitor.reason:
+        print_informational_message(f"Native {tool} engine stopped early: {RESET}{monitor.reason}")
+    if controller:
+        print_informational_message(f"Concurrency against {target}:{port}: {RESET}{controller.describe()}")
+
+    if tool == "ffuf":
+        convert_md_to_html(output_filename, notebook_dir)
+    return output_filename
+
+class RecursionQueue:
+    # Directories waiting to be brute-forced, lowest priority value first
+    def __init__(self, base_url, max_depth):
+        parts = urlsplit(base_url)
+        self.origin = canonical_url(f"{parts.scheme}://{parts.netloc}/").rstrip('/')
+        self.base_path = parts.path.rstrip('/') + '/'
+        self.max_depth = max_depth
+        self.heap = []
+        self.seen = {self.base_path}
+        self.order = itertools.count()
+
+    @staticmethod
+    def priority(depth, status, size, name, guessed):
+        # Shallow, normally answered and promising names first
+        priority = depth * 10
+        if status in (401, 403):
+            priority += 3
+        if status == 200 and size == 0:
+            priority += 2
+        if guessed:
+            priority += 4
+        if name.lower() in RECURSION_INTERESTING:
+            priority -= 5
+        elif name.lower() in RECURSION_BORING:
+            priority += 15
+        return priority
+
+    def offer(self, hit):
+        # Queue the directory a hit stands for; returns its priority or None
+        url = canonical_url(hit.url)
+        if not url.startswith(self.origin + '/'):
+            return None
+        path = url[len(self.origin):].partition('?')[0]
+        name = path.rsplit('/', 1)[-1]
+        if not name:
+            return None
+        if urlsplit(hit.url).path.endswith('/') or '.' not in name and (hit.status in RECURSION_REDIRECTS or hit.status in (401, 403)):
+            guessed = False
+        elif '.' not in name and hit.status in (None, 200):
+            guessed = True
+        else:
+            return None
+
+        directory = path + '/'
+        if not directory.startswith(self.base_path) or directory in self.seen:
+            return None
+        depth = directory[len(self.base_path):].count('/')
+        if depth > self.max_depth:
+            return None
+        self.seen.add(directory)
+        priority = self.priority(depth, hit.status, hit.length, unquote(name), guessed)
+        heapq.heappush(self.heap, [priority, next(self.order), directory, depth, 0, None])
+        return priority
+
+def run_recursive_discovery(full_url, target, port, collector, calibration=None, connections=DEFAULT_ENGINE_CONNECTIONS, rate=None,
+                            max_depth=DEFAULT_RECURSION_DEPTH, max_requests=DEFAULT_RECURSION_REQUESTS, controller=None):
+    # Brute-forces every directory found, from one priority queue with the native engine
+    output_filename = f"028-webscan-{target}-{port}-recursion.md"
+    wordlist, extensions = RECURSION_WORDLIST
+    wordlist = os.path.join(WORDLIST_DIR, wordlist)
+    if not os.path.exists(wordlist):
+        raise FileNotFoundError(f"Wordlist {wordlist} not found.")
+
+    # Past hit words first
+    stats = HitStats()
+    try:
+        ranking = stats.ranking()
+    finally:
+        stats.close()
+    words = list(dict.fromkeys(iter_wordlist(wordlist, extensions)))
+    words.sort(key=lambda word: ranking.get(word, len(ranking)))
+
+    base_url = full_url.rstrip('/')
+    origin = f"{urlsplit(base_url).scheme}://{urlsplit(base_url).netloc}"
+    calibration = calibration or Calibration()
+    directories = RecursionQueue(base_url, max_depth)
+    stopped = threading.Event()
+    print_informational_message(f"Running recursive discovery: {RESET}{base_url}/**/FUZZ -w {wordlist} --depth {max_depth} --requests {max_requests}")
+
+    async def discover():
+        loop = asyncio.get_running_loop()
+        pool = HttpConnectionPool(base_url, connections, DEFAULT_ENGINE_TIMEOUT, RateLimiter(rate) if rate else None, controller)
+        wake = asyncio.Event()
+        feeding = True
+        in_flight = 0
+        counts = {"explored": 0, "skipped": 0, "hits": 0}
+
+        def offer(hit):
+            if directories.offer(hit) is not None:
+                wake.set()
+
+        def feed_done():
+            nonlocal feeding
+            feeding = False
+            wake.set()
+
+        def feed():
+            # Hand the other tools' hits over to the loop
+            for hit in collector.subscribe("recursion", hits=True):
+                if stopped.is_set():
+                    return
+                loop.call_soon_threadsafe(offer, hit)
+            if not stopped.is_set():
+                loop.call_soon_threadsafe(feed_done)
+
+        async def probe(directory):
+            # Probe random names to detect a catch-all directory
+            probes = []
+            for length in CALIBRATION_LENGTHS[:2]:
+                token = random_token(length)
+                try:
+                    response = await pool.request(directory + token)
+                except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                    continue
+                probes.append((response.status, len(response.body), response.words, response.lines, body_digest(response.body, token)))
+            local = Calibration()
+            local.signatures["paths"] = Calibration.build_signatures(probes)
+            statuses = {probe[0] for probe in probes}
+            catch_all = len(probes) == 2 and len(statuses) == 1 and bool(statuses & ({200} | RECURSION_REDIRECTS))
+            return local, catch_all, statuses
+
+        async def worker(output_file):
+            nonlocal in_flight
+            while pool.requests_sent < max_requests and not budget_expired():
+                if not directories.heap:
+                    if not feeding and not in_flight:
+                        wake.set()
+                        return
+                    wake.clear()
+                    # Notice when --budget stops the stage
+                    try:
+                        await asyncio.wait_for(wake.wait(), BUDGET_TICK if current_budget() else None)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                entry = directories.heap[0]
+                priority, _, directory, depth, position, local = entry
+                if local is None:
+                    heapq.heappop(directories.heap)
+                    in_flight += 1
+                    local, catch_all, statuses = await probe(directory)
+                    in_flight -= 1
+                    if catch_all:
+                        counts["skipped"] += 1
+                        output_file.write(f"[webscan] {directory}: skipped, answers every name with status {statuses.pop()}\n")
+                    else:
+                        counts["explored"] += 1
+                        entry[5] = local
+                        heapq.heappush(directories.heap, entry)
+                        output_file.write(f"[webscan] {directory}: depth {depth}, priority {priority}\n")
+                    output_file.flush()
+                    wake.set()
+                    continue
+
+                entry[4] += 1
+                if entry[4] == len(words):
+                    heapq.heappop(directories.heap)
+                word = words[position]
+                path = directory + quote(word, safe=URL_SAFE_CHARACTERS)
+                in_flight += 1
+                try:
+                    response = await pool.request(path)
+                except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                    response = None
+                in_flight -= 1
+                if not in_flight:
+                    wake.set()
+                if (not response or response.status not in NATIVE_MATCH_STATUS or calibration.matches_response(response, word)
+                        or local.matches_response(response, word)):
+                    continue
+                counts["hits"] += 1
+                hit = Hit(origin + path, response.status, len(response.body), response.words, response.lines, "recursion")
+                output_file.write(format_gobuster_hit(hit))
+                output_file.flush()
+                if collector.add(hit):
+                    offer(hit)
+
+        started = time.monotonic()
+        threading.Thread(target=feed, daemon=True).start()
         try:
-            with open(filename, 'r') as file:
-                for line in file:
-                    url = ''
-                    if prefix == '023':  # Feroxbuster
-                        parts = line.split()
-                        if len(parts) > 5:
-                            url = parts[5]
-
-                    elif prefix == '024':  # FFUF
-                        if 'http' in line:
-                            parts = line.split()
-                            if len(parts) > 3:
-                                url = parts[3]
-
-                    elif prefix == '025':  # Gobuster
-                        parts = line.split()
-                        if len(parts) > 0:
-                            url = parts[0]
-
-                    if url:
-                        #print(f"Extracted URL from {filename}: {url}")  # Debugging
-                        unique_urls.add(url)
-        except FileNotFoundError:
-            print(f"File {filename} not found, skipping.")
+            with open(output_filename, 'w') as output_file:
+                await asyncio.gather(*(worker(output_file) for _ in range(connections)))
+                counts["left"] = len(directories.heap)
+                output_file.write(f"[webscan] recursion: {counts['explored']} directories explored, {counts['skipped']} catch-alls skipped, "
+                                  f"{counts['left']} left, {counts['hits']} hits in {pool.requests_sent} requests\n")
+        finally:
+            stopped.set()
+            await pool.close()
+            budget_progress(pool.requests_sent)
+        return counts, pool.requests_sent, pool.errors, time.monotonic() - started
+
+    counts, requests_sent, errors, elapsed = run_async(discover())
+    print_informational_message(f"Recursive discovery: {RESET}{counts['explored']} directories explored, {counts['skipped']} catch-alls skipped, "
+                                f"{requests_sent} requests, {errors} errors, {counts['hits']} hits in {elapsed:.1f}s")
+    if counts["left"]:
+        budget = "time" if budget_expired() else "request"
+        print_informational_message(f"Recursive discovery hit its {budget} budget: {RESET}{counts['left']} directories left unexplored")
+    if controller:
+        print_informational_message(f"Concurrency against {target}:{port}: {RESET}{controller.describe()}")
+    return output_filename
+
+def work_shard(connection, claimed, worker, calibrations, connections, rate):
+    shard, job, position, end, url, wordlist, _ = claimed
+    starts, words = read_shard(wordlist, position, end)
+    origin = f"{urlsplit(url).scheme}://{urlsplit(url).netloc}"
+    results = []
+    flushed_at = time.monotonic()
+
+    def on_response(word, path, response):
+        if response.status in NATIVE_MATCH_STATUS and not calibrations[job].matches_response(response, word):
+            results.append((word, Hit(origin + path, response.status, len(response.body), response.words, response.lines, "shard")))
+
+    def on_progress(index):
+        nonlocal flushed_at
+        if time.monotonic() - flushed_at >= CHECKPOINT_INTERVAL:
+            flushed_at = time.monotonic()
+            if not flush_shard(connection, shard, job, worker, starts[index] if index < len(starts) else end, results):
+                raise ShardLost(shard)
+
+    async def fuzz():
+        if job not in calibrations:
+            calibrations[job] = await probe_calibration(url)
+        await fuzz_paths(url, words, on_response, connections, on_progress=on_progress, rate=rate)
+
+    try:
+        run_async(fuzz())
+    except ShardLost:
+        print_error_message(f"Shard {shard} was reassigned to another worker")
+        return False
+    return flush_shard(connection, shard, job, worker, end, results, status='done')
+
+def run_shard_worker(queue_path, connections=DEFAULT_ENGINE_CONNECTIONS, rate=None):
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    connection = open_shard_queue(queue_path)
+    calibrations = {}
+    # Jobs whose wordlist is missing or differs here
+    unusable = set()
+    checked = set()
+    idle_since = time.monotonic()
+
+    print_informational_message(f"Shard worker {worker} polling {RESET}{queue_path}")
+    while True:
+        claimed = claim_shard(connection, worker, unusable)
+        if claimed and claimed[1] not in checked:
+            shard, job, _, _, _, wordlist, digest = claimed
+            checked.add(job)
+            if not os.path.exists(wordlist) or hash_file(wordlist) != digest:
+                print_error_message(f"Shard worker {worker}: {wordlist} is missing or differs from the coordinator's copy, leaving job {job} to other workers")
+                unusable.add(job)
+                connection.execute("UPDATE shards SET status = 'pending', worker = NULL, lease_until = 0 WHERE id = ? AND worker = ?", (shard, worker))
+                continue
+        if not claimed:
+            if time.monotonic() - idle_since > WORKER_IDLE_TIMEOUT:
+                print_informational_message(f"Shard worker {worker}: {RESET}no work for {WORKER_IDLE_TIMEOUT}s, exiting")
+                return
+            time.sleep(1)
             continue
 
+        work_shard(connection, claimed, worker, calibrations, connections, rate)
+        idle_since = time.monotonic()
+
+def run_sharded_discovery(full_url, target, port, notebook_dir, queue_path, wordlist=None, shard_size=DEFAULT_SHARD_SIZE,
+                          local_workers=0, collector=None, connections=DEFAULT_ENGINE_CONNECTIONS, rate=None, remote_workers=False):
+    output_filename = f"024-webscan-{target}-{port}-ffuf_wordlist.md"
+    wordlist = os.path.abspath(wordlist or os.path.join(WORDLIST_DIR, "directory-list-2.3-medium.txt"))
+    base_url = full_url.rstrip("/")
+
+    connection = open_shard_queue(queue_path)
+    job = create_shard_job(connection, base_url, wordlist, shard_size)
+    total = connection.execute("SELECT COUNT(*) FROM shards WHERE job = ?", (job,)).fetchone()[0]
+    print_informational_message(f"Sharding {wordlist} for {base_url}: {RESET}{total} shards in {queue_path}")
+
+    worker_command = [sys.executable, os.path.abspath(__file__), "--worker", queue_path, "--connections", str(connections)]
+    if rate:
+        worker_command += ["--rate", str(rate)]
+    workers = [ProfiledPopen(worker_command, stdout=subprocess.DEVNULL, stderr=STDERR_TAIL) for _ in range(local_workers)]
+
+    last_result = 0
+    reported = -1
+    stranded = False
+    try:
+        with open(output_filename, 'w') as output_file:
+            while True:
+                # Checked before reading the queue, so the workers' last writes are seen
+                exited = not remote_workers and all(process.poll() is not None for process in workers)
+                rows = connection.execute("SELECT id, word, hit FROM results WHERE job = ? AND id > ? ORDER BY id", (job, last_result)).fetchall()
+                for last_result, word, record in rows:
+                    hit = Hit.from_json(record)
+                    output_file.write(format_ffuf_hit(hit, word, 0))
+                    if collector:
+                        collector.add(hit)
+                output_file.flush()
+
+                done = connection.execute("SELECT COUNT(*) FROM shards WHERE job = ? AND status = 'done'", (job,)).fetchone()[0]
+                if done != reported:
+                    print_informational_message(f"Sharded ffuf: {RESET}{done}/{total} shards done")
+                    reported = done
+                if done == total and not rows or STOP.is_set():
+                    break
+                # No local worker is left to take the pending shards
+                if exited:
+                    print_error_message(f"Sharded ffuf: all {len(workers)} local workers exited with {total - done} shards left")
+                    stranded = True
+                    break
+                time.sleep(1)
+    finally:
+        connection.execute("UPDATE jobs SET done = 1 WHERE id = ?", (job,))
+        for process in workers:
+            process.terminate()
+            process.wait()
+
+    if stranded:
+        return False
+    convert_md_to_html(output_filename, notebook_dir)
+    return output_filename
+
+
+def process_webscan_files(target, port, collector=None):
+    output_file = f'webscan-urls-{target}-{port}.md'
+    hits_file = f'webscan-hits-{target}-{port}.jsonl'
+
+    # Rewrite the collected URLs in sorted order
+    if collector:
+        unique_urls = collector.urls
+        if collector.wildcards:
+            print(f"Dropped {collector.wildcards} hits matching the soft-404/wildcard calibration")
+    elif os.path.exists(hits_file):
+        unique_urls = UrlIndex()
+        unique_urls.update(hit.url for hit in iter_hits(hits_file))
+    else:
+        print(f"File {hits_file} not found, skipping.")
+        return
+
     with open(output_file, 'w') as file:
-        for url in unique_urls:
+        for url in unique_urls.iter_sorted():
             file.write(url + '\n')
     
     print(f"Extracted {len(unique_urls)} unique URLs and wrote to {output_file}")
 
+    stats = HitStats()
+    try:
+        stats.record(f"{target}:{port}", unique_urls)
+    finally:
+        stats.close()
+
 
 
 def convert_webscan_urls_to_html(target, port, notebook_dir):
@@ -379,7 +2412,7 @@ def convert_webscan_urls_to_html(target, port, notebook_dir):
         try:
             # Running the shell command directly
             command = f"cat {file_path} | awk '{{print $6}}'"
-            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            result = run_process(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
             
             # Print the result of the command
             print(result.stdout)
@@ -390,157 +2423,384 @@ def convert_webscan_urls_to_html(target, port, notebook_dir):
         # Return None after handling the error
         return None
 
-    with open(url_output_filename, 'r') as file:
-        lines = file.readlines()
-
-    unique_lines = list(set(lines))
-
-    with open(url_output_filename, 'w') as file:
-        file.writelines(unique_lines)
-
+    # collect-urls already wrote the file deduplicated and sorted
     output_html_file = os.path.join(notebook_dir, f"webscan-urls-{target}-{port}.html")
-    ansi2html_command = f"ansi2html < {url_output_filename} > {output_html_file}"
-    subprocess.run(ansi2html_command, shell=True, check=True)
-
-    return output_html_file
-
-def fuzz_subdomains(domain, target, port, notebook_dir):
-    output_md_filename = f"026-webscan-{target}-{port}-ffuf-subdomains-output.md"
-    output_md_filepath = os.path.join(os.getcwd(), output_md_filename)
-    output_html_filename = f"026-webscan-{target}-{port}-ffuf-subdomains-output.html"
-    output_html_filepath = os.path.join(notebook_dir, output_html_filename)
-    
-    ffuf_command = [
-        "ffuf",
-        "-w", os.path.expanduser("~/.local/bin/wordlists/dnslist.txt:FUZZ"),  # Wordlist with FUZZ placeholder
-        "-u", f"http://FUZZ.{domain}",                 # Target URL with subdomain placeholder
-        "-mc", "all", 
-        "-t", "150",                                   # Threads
-    ]
-    
-    print_informational_message(f"Running Subdomain Fuzzing: {RESET}{' '.join(ffuf_command)}")
+    return ansi_to_html(url_output_filename, output_html_file)
+
+def normalize_body(body, path):
+    # Mask what differs between requests for the same page
+    text = body.decode("utf-8", errors="replace")
+    if path and path != "/":
+        text = text.replace(path, "").replace(unquote(path), "")
+    text = VOLATILE_TOKENS.sub("#", text)
+    return " ".join(text.split())
+
+async def fingerprint_urls(urls, connections=SCREEN_DEDUP_CONNECTIONS, rate=None, controller=None):
+    # One GET per URL, without following redirects
+    pools = {}
+    rate_limiter = RateLimiter(rate) if rate else None
+
+    async def fingerprint(url):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in pools:
+            pools[origin] = HttpConnectionPool(origin, connections, rate_limiter=rate_limiter, controller=controller)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        try:
+            response = await pools[origin].request(path)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+            return None
+        if 300 <= response.status < 400:
+            return f"{response.status} {urljoin(url, response.headers.get('location', ''))}"
+        return f"{response.status} {hashlib.sha256(normalize_body(response.body, parts.path).encode()).hexdigest()}"
 
     try:
-        with open(output_md_filepath, 'w') as output_file:
-            subprocess.run(ffuf_command, stdout=output_file, stderr=output_file, check=True)
-        
-        with open(output_md_filepath, 'r') as md_file, open(output_html_filepath, 'w') as html_file:
-            subprocess.run(['ansi2html'], stdin=md_file, stdout=html_file, check=True)
-        
-        with open(output_html_filepath, 'r') as html_file:
-            lines = html_file.readlines()
-        
-        with open(output_html_filepath, 'w') as html_file:
-            for line in lines:
-                if "Progress:" not in line:
-                    html_file.write(line)
-
-        return output_md_filepath, output_html_filepath
-    except subprocess.CalledProcessError as e:
-        print_error_message(f"Error running FFUF for subdomains: {e}")
-        return None, None
-    except Exception as e:
-        print_error_message(f"Error during HTML conversion: {e}")
-        return None, None
-
-def fuzz_vhosts(domain, target, port, notebook_dir):
-    # Output filenames
-    output_md_filename = f"027-webscan-{target}-{port}-ffuf_vhosts-output.md"
-    output_md_filepath = os.path.join(os.getcwd(), output_md_filename)
-    output_html_filename = f"027-webscan-{target}-{port}-ffuf_vhosts-output.html"
-    output_html_filepath = os.path.join(notebook_dir, output_html_filename)
-    
-    ffuf_command = [
-        "ffuf",
-        "-H", f"Host: FUZZ.{domain}",                  # Host header with FUZZ placeholder
-        "-ac",
-        "-mc", "all",                                         # Auto-calibrate to ignore baseline responses
-        "-w", os.path.expanduser("~/.local/bin/wordlists/dnslist.txt"),      # Wordlist with FUZZ placeholder
-        "-u", f"http://{domain}"                       # Target URL
-    ]
-    
-    print_informational_message(f"Running Vhost Fuzzing: {RESET}{' '.join(ffuf_command)}")
+        return await asyncio.gather(*(fingerprint(url) for url in urls))
+    finally:
+        for pool in pools.values():
+            await pool.close()
+
+def dedup_screenshot_urls(target, port, rate=None, controller=None):
+    url_filename = f"webscan-urls-{target}-{port}.md"
+    screen_filename = f"webscan-screen-urls-{target}-{port}.md"
+    groups_filename = f"webscan-url-groups-{target}-{port}.json"
+
+    with open(url_filename, 'r') as url_file:
+        urls = sorted({line.strip() for line in url_file if line.strip()}, key=lambda url: (len(url), url))
+
+    print_informational_message(f"Fingerprinting {len(urls)} URLs before screenshotting")
+    fingerprints = run_async(fingerprint_urls(urls, rate=rate, controller=controller))
+
+    # Keep the shortest URL of each group
+    groups = {}
+    for url, fingerprint in zip(urls, fingerprints):
+        groups.setdefault(fingerprint or url, []).append(url)
+
+    with open(screen_filename, 'w') as screen_file:
+        for members in groups.values():
+            screen_file.write(members[0] + '\n')
+    with open(groups_filename, 'w') as groups_file:
+        json.dump({members[0]: members[1:] for members in groups.values()}, groups_file, indent=2)
+
+    print_informational_message(f"Screenshotting {len(groups)} unique pages out of {len(urls)} URLs: {RESET}{screen_filename}")
+
+def dns_cache_path(nameserver, domain):
+    host, port = nameserver
+    return os.path.join(CACHE_DIR, "dns", f"{host.replace(':', '-')}-{port}-{domain}.json")
+
+def host_signature(response, host):
+    # Status, normalized body and redirect target, without the requested name
+    location = response.headers.get("location", "").replace(host, "")
+    return response.status, hashlib.sha256(normalize_body(response.body, host).encode()).hexdigest(), location
+
+class HostProbe:
+    # Response signature and 026/027 line counts
+    __slots__ = ("status", "signature", "size", "words", "lines", "calibrated")
+
+    def __init__(self, response, host, calibration=None):
+        self.status = response.status
+        self.signature = host_signature(response, host)
+        self.size = len(response.body)
+        self.words = response.words
+        self.lines = response.lines
+        self.calibrated = bool(calibration and calibration.matches_response(response, host, kind="vhosts"))
+
+def host_line(label, probe, note=""):
+    # ffuf's layout
+    if probe is None:
+        return f"{label:<25} [no response]{note}\n"
+    return f"{label:<25} [Status: {probe.status}, Size: {probe.size}, Words: {probe.words}, Lines: {probe.lines}]{note}\n"
+
+async def probe_hosts(base_url, domain, labels, resolved, target_addresses, rate=None, calibration=None, monitor=None, controller=None,
+                      connections=DEFAULT_HOST_CONNECTIONS):
+    # Probe every candidate as a Host header, and subdomains hosted elsewhere at their own address
+    parts = urlsplit(base_url)
+    origin = HttpConnectionPool(f"{parts.scheme}://{parts.netloc}", connections, rate_limiter=RateLimiter(rate) if rate else None, controller=controller)
+    remote_pools = {}
+    vhosts = {}
+    subdomains = {}
+    seen = set()
+    labels = iter(labels)
+    requests = 0
+    budget = current_budget()
+
+    def remote_pool(address):
+        if address not in remote_pools:
+            host = f"[{address}]" if ':' in address else address
+            remote_pools[address] = HttpConnectionPool(f"{parts.scheme}://{host}:{origin.port}", HOST_REMOTE_CONNECTIONS)
+        return remote_pools[address]
+
+    async def fetch(pool, host):
+        try:
+            return await pool.request("/", headers={"Host": host})
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+            return None
+
+    async def worker():
+        nonlocal requests
+        for label in labels:
+            if budget_expired():
+                return
+            host = f"{label}.{domain}"
+            response = await fetch(origin, host)
+            probe = vhosts[label] = HostProbe(response, host, calibration) if response else None
+            requests += 1
+            addresses = resolved.get(label)
+            if addresses and target_addresses.isdisjoint(addresses):
+                response = await fetch(remote_pool(addresses[0]), host)
+                subdomains[label] = HostProbe(response, host) if response else None
+                requests += 1
+            elif addresses:
+                subdomains[label] = probe
+            budget_progress(len(vhosts))
+            if monitor or budget:
+                if probe and not probe.calibrated:
+                    if probe.signature not in seen:
+                        seen.add(probe.signature)
+                        budget_hit()
+                        if monitor:
+                            monitor.hit()
+                if monitor and monitor.progress(requests):
+                    return
 
     try:
-        with open(output_md_filepath, 'w') as output_file:
-            subprocess.run(ffuf_command, stdout=output_file, stderr=output_file, check=True)
-        
-        with open(output_md_filepath, 'r') as md_file, open(output_html_filepath, 'w') as html_file:
-            subprocess.run(['ansi2html'], stdin=md_file, stdout=html_file, check=True)
-        
-        with open(output_html_filepath, 'r') as html_file:
-            lines = html_file.readlines()
-        
-        filtered_lines = [line for line in lines if "Progress:" not in line]
-        
-        with open(output_html_filepath, 'w') as html_file:
-            html_file.writelines(filtered_lines)
-        
-        return output_md_filepath, output_html_filepath
-    except subprocess.CalledProcessError as e:
-        print_error_message(f"Error running FFUF for vhosts: {e}")
-        return None, None
-    except Exception as e:
-        print_error_message(f"Error during HTML processing: {e}")
-        return None, None
-
-def run_eyewitness(domain, target, port):
-    filename = os.path.join(os.getcwd(), f"webscan-urls-{target}-{port}.md")
-    
-    command = ["eyewitness", "--no-prompt", "-f", filename]
-
-    if domain:
-        full_command = f"{' '.join(command)} > /dev/null 2>&1 &"
-    else:
-        full_command = f"{' '.join(command)} > /dev/null 2>&1"
-    
-    print_informational_message(f"Running Eyewitness: {RESET}{' '.join(command)}")
+        await asyncio.gather(*(worker() for _ in range(connections)))
+    finally:
+        await origin.close()
+        for pool in remote_pools.values():
+            await pool.close()
+
+    return vhosts, subdomains
+
+def cluster_hosts(probes):
+    # Signatures of the default site
+    clusters = collections.Counter()
+    default = set()
+    for probe in probes.values():
+        if probe is None:
+            continue
+        clusters[probe.signature] += 1
+        if probe.calibrated:
+            default.add(probe.signature)
+    if clusters:
+        signature, count = clusters.most_common(1)[0]
+        if count >= HOST_CLUSTER_SIZE:
+            default.add(signature)
+    return default, clusters
+
+def run_host_discovery(full_url, domain, target, port, notebook_dir, nameserver=None, rate=None, calibration=None, monitor=None, controller=None):
+    subdomains_md = f"026-webscan-{target}-{port}-ffuf-subdomains-output.md"
+    vhosts_md = f"027-webscan-{target}-{port}-ffuf_vhosts-output.md"
+    resolved_filename = f"webscan-subdomains-{target}-{port}.txt"
+    wordlist = os.path.expanduser("~/.local/bin/wordlists/dnslist.txt")
+
+    labels = list(dict.fromkeys(label.lower().rstrip('.') for label in iter_wordlist(wordlist)))
+    labels = [label for label in labels if encode_dns_name(f"{label}.{domain}")]
+
+    # Names resolving to the wildcard's addresses are not subdomains
+    nameserver = nameserver or system_nameserver()
+    cache_path = dns_cache_path(nameserver, domain) if nameserver else None
+    cache = load_dns_cache(cache_path) if cache_path else {}
+    started = time.monotonic()
+    resolution = None
+    if nameserver:
+        print_informational_message(f"Resolving {len(labels)} subdomain candidates via {RESET}{nameserver[0]}:{nameserver[1]}")
+        try:
+            resolution = run_async(resolve_subdomains(domain, labels, DnsResolver(nameserver), cache))
+        except OSError as e:
+            print_error_message(f"Could not query nameserver {nameserver[0]}:{nameserver[1]}: {e}")
+        if resolution and resolution["unreachable"]:
+            print_error_message(f"Nameserver {nameserver[0]}:{nameserver[1]} did not answer")
+            resolution = None
+        if resolution:
+            save_dns_cache(cache_path, cache)
+    if not resolution:
+        print_informational_message(f"Resolving {len(labels)} subdomain candidates with the system resolver")
+        resolution = run_async(resolve_subdomains(domain, labels, SystemResolver(), {}))
+    resolved = resolution["resolved"]
+    wildcard_note = f" (wildcard DNS: {', '.join(resolution['wildcard_addresses'])})" if resolution["wildcard_addresses"] else ""
+    resolution_summary = (f"{len(resolved)} resolve, {len(resolution['wildcard'])} only match the wildcard{wildcard_note}, "
+                          f"{len(resolution['missing'])} do not exist, {len(resolution['failed'])} failed, {resolution['queries']} queries")
+    print_informational_message(f"Resolved subdomains in {time.monotonic() - started:.1f}s: {RESET}{resolution_summary}")
+    with open(resolved_filename, 'w') as resolved_file:
+        resolved_file.writelines(f"{label}\n" for label in resolved)
 
-    subprocess.run(full_command, shell=True)
+    try:
+        target_addresses = {info[4][0] for info in socket.getaddrinfo(target, port, type=socket.SOCK_STREAM)}
+    except socket.gaierror:
+        target_addresses = set()
 
-def copy_eyewitness_screens(notebook_dir, target, port):
-    current_year = str(datetime.now().year)
-    
-    retries = 10
-    while retries > 0:
-        eyewitness_dirs = [
-            d for d in os.listdir('.')
-            if os.path.isdir(d) and d.startswith(current_year)
-        ]
-        
-        if eyewitness_dirs:
-            break
-        
-        retries -= 1
-        if retries > 0:
-            time.sleep(1)
-        else:
-            print("No eyewitness directories found after 10 retries.")
+    print_informational_message(f"Probing {len(labels)} virtual hosts and {len(resolved)} subdomains of {domain} over {RESET}{full_url}")
+    started = time.monotonic()
+    try:
+        vhosts, subdomains = run_async(probe_hosts(full_url, domain, labels, resolved, target_addresses, rate, calibration, monitor, controller))
+    except OSError as e:
+        print_error_message(f"Host discovery could not reach {full_url}: {e}")
+        return False
+    default, clusters = cluster_hosts(vhosts)
+
+    with open(vhosts_md, 'w') as output_file:
+        output_file.write(f"Virtual hosts of {domain} on {full_url}, {len(vhosts)} candidates from {wordlist}\n\n")
+        found = 0
+        for label, probe in vhosts.items():
+            if probe and probe.signature not in default:
+                output_file.write(host_line(label, probe))
+                found += 1
+        default_names = sum(clusters[signature] for signature in default)
+        output_file.write(f"\n[webscan] {found} virtual hosts, {default_names} names answered with the default site, "
+                          f"{sum(1 for probe in vhosts.values() if probe is None)} without a response\n")
+        if monitor:
+            output_file.write(monitor.summary())
+
+    with open(subdomains_md, 'w') as output_file:
+        output_file.write(f"Subdomains of {domain} that resolve, {len(labels)} candidates from {wordlist}\n\n")
+        for label, probe in subdomains.items():
+            note = f" -> {', '.join(resolved[label])}"
+            if probe and probe.signature in default and not target_addresses.isdisjoint(resolved[label]):
+                note += " (default site)"
+            output_file.write(host_line(label, probe, note))
+        output_file.write(f"\n[webscan] {resolution_summary}\n")
+
+    print_informational_message(f"Host discovery finished in {time.monotonic() - started:.1f}s: {RESET}{found} virtual hosts, {len(subdomains)} subdomains probed")
+    if monitor and monitor.reason:
+        print_informational_message(f"Host discovery stopped early: {RESET}{monitor.reason}")
+    for md_file in (subdomains_md, vhosts_md):
+        ansi_to_html(md_file, os.path.join(notebook_dir, md_file.replace('.md', '.html')))
+
+class InotifyWatcher:
+    # Minimal inotify binding; raises OSError where it is unavailable
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True) if libc_name else None
+        if not self.libc or not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def add(self, path, mask):
+        if path in self.watches.values():
             return
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"cannot watch {path}")
+        self.watches[wd] = path
+
+    def wait(self, timeout, wake=()):
+        # (directory, name) events within timeout seconds
+        readable, _, _ = select.select([self.fd, *wake], [], [], timeout)
+        if self.fd not in readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+            offset += INOTIFY_EVENT.size + length
+            if wd in self.watches:
+                events.append((self.watches[wd], os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+def copy_screen(path, destination_dir, copied, clusters):
+    # Near-duplicates are only listed in their cluster
+    name = os.path.basename(path)
+    if name in copied or not os.path.isfile(path):
+        return
+    copied[name] = True
+    if clusters.add(path):
+        shutil.copy2(path, destination_dir)
 
-    eyewitness_dirs.sort(key=os.path.getmtime, reverse=True)
-    most_recent_dir = eyewitness_dirs[0]
-    
-    screens_dir = os.path.join(most_recent_dir, "screens")
-    if not os.path.exists(screens_dir):
-        print(f"No 'screens' directory found in {most_recent_dir}.")
+def copy_new_screens(screens_dir, destination_dir, copied, clusters, settled=None):
+    # With settled, only take files that stopped changing
+    if not os.path.isdir(screens_dir):
         return
+    with os.scandir(screens_dir) as entries:
+        for entry in entries:
+            if entry.name in copied or not entry.is_file():
+                continue
+            if settled is not None:
+                stat_result = entry.stat()
+                signature = (stat_result.st_size, stat_result.st_mtime_ns)
+                previous = settled.get(entry.name)
+                settled[entry.name] = signature
+                if previous != signature:
+                    continue
+            copy_screen(entry.path, destination_dir, copied, clusters)
+
+def run_eyewitness(target, port, notebook_dir):
+    filename = os.path.join(os.getcwd(), f"webscan-screen-urls-{target}-{port}.md")
+    output_dir = os.path.join(os.getcwd(), f"eyewitness-{target}-{port}")
+    screens_dir = os.path.join(output_dir, "screens")
+    destination_dir = os.path.join(notebook_dir, f"00-eyewitness-{target}-{port}")
+
+    # EyeWitness prompts before reusing a directory
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(destination_dir, exist_ok=True)
+
+    command = ["eyewitness", "--no-prompt", "-f", filename, "-d", output_dir]
+    print_informational_message(f"Running Eyewitness: {RESET}{' '.join(command)}")
+    try:
+        process = ProfiledPopen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=STDERR_TAIL)
+    except OSError as e:
+        print_error_message(f"Error starting Eyewitness: {e}")
+        return False
 
-    time.sleep(15)
+    try:
+        watcher = InotifyWatcher()
+    except OSError:
+        watcher = None
 
-    target_dir = os.path.join(notebook_dir, f"00-eyewitness-{target}-{port}")
-    os.makedirs(target_dir, exist_ok=True)
-    
-    for file_name in os.listdir(screens_dir):
-        full_file_path = os.path.join(screens_dir, file_name)
-        if os.path.isfile(full_file_path):
-            shutil.copy(full_file_path, target_dir)
+    # Readable once EyeWitness exits
+    try:
+        exited = [os.pidfd_open(process.pid)]
+    except (AttributeError, OSError):
+        exited = []
 
-def run_aquatone(target, port):
-    url_output_filename = f"webscan-urls-{target}-{port}.md"
+    copied = {}
+    clusters = ScreenClusters()
+    settled = None if watcher else {}
+    try:
+        # Watch down to screens/; files finished earlier are picked up after exit
+        while process.poll() is None:
+            if watcher:
+                for path in (os.getcwd(), output_dir):
+                    if os.path.isdir(path):
+                        watcher.add(path, INOTIFY_CREATE)
+                if os.path.isdir(screens_dir):
+                    watcher.add(screens_dir, INOTIFY_CLOSE_WRITE | INOTIFY_MOVED_TO)
+                for directory, name in watcher.wait(1, exited):
+                    if directory == screens_dir:
+                        copy_screen(os.path.join(screens_dir, name), destination_dir, copied, clusters)
+            else:
+                time.sleep(SCREENS_POLL_INTERVAL)
+                copy_new_screens(screens_dir, destination_dir, copied, clusters, settled)
+    finally:
+        if watcher:
+            watcher.close()
+        for fd in exited:
+            os.close(fd)
+
+    copy_new_screens(screens_dir, destination_dir, copied, clusters)
+    clusters.write(os.path.join(destination_dir, "screenshot-clusters.md"))
+    print_informational_message(f"Eyewitness finished: {RESET}{len(copied)} screenshots, {len(clusters.members)} unique pages in {destination_dir}")
+
+def run_aquatone(target, port, collector=None):
+    url_output_filename = f"webscan-screen-urls-{target}-{port}.md"
     aquatone_output_dir = f"aquatone-{target}-{port}"
+
+    if collector:
+        return stream_aquatone(collector, aquatone_output_dir)
     
-    # Ensure the webscan-urls file exists
+    # Ensure the webscan-screen-urls file exists
     if not os.path.exists(url_output_filename):
         raise FileNotFoundError(f"The file {url_output_filename} does not exist.")
     
@@ -555,10 +2815,36 @@ def run_aquatone(target, port):
     
     # Execute the command, but suppress the output (no output displayed on the console)
     try:
-        subprocess.run(aquatone_command, shell=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        run_process(aquatone_command, shell=True, check=True, stdout=subprocess.DEVNULL, stderr=STDERR_TAIL)
     except subprocess.CalledProcessError as e:
         pass
 
+def stream_aquatone(collector, aquatone_output_dir):
+    os.makedirs(aquatone_output_dir, exist_ok=True)
+    aquatone_command = ["aquatone", "-out", f"{aquatone_output_dir}/"]
+    print_informational_message(f"Running Aquatone (streaming): {RESET}{' '.join(aquatone_command)}")
+
+    try:
+        process = ProfiledPopen(aquatone_command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=STDERR_TAIL, text=True)
+    except OSError as e:
+        print_error_message(f"Error starting Aquatone: {e}")
+        for _ in collector.subscribe():
+            pass
+        return
+
+    try:
+        for url in collector.subscribe():
+            process.stdin.write(url + '\n')
+            process.stdin.flush()
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+
 def cleanup_geckodriver_log():
     log_file = "geckodriver.log"
     
@@ -568,31 +2854,824 @@ def cleanup_geckodriver_log():
         except Exception:
             pass
 
+class StageJournal:
+    # Per target record of completed stages, output hashes and wordlist offsets
+    def __init__(self, path, fresh=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {"stages": {}, "offsets": {}}
+        if not fresh:
+            try:
+                with open(path, 'r') as journal:
+                    self.data = json.load(journal)
+            except (FileNotFoundError, ValueError):
+                pass
+        self._save()
+
+    def _save(self):
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w') as journal:
+            json.dump(self.data, journal, indent=2)
+        os.replace(temporary_path, self.path)
+
+    @property
+    def resuming(self):
+        return bool(self.data["stages"] or self.data["offsets"])
+
+    def is_complete(self, stage):
+        entry = self.data["stages"].get(stage.name)
+        if not entry or entry["params"] != stage.params():
+            return False
+        for path, digest in entry["outputs"].items():
+            if not os.path.exists(path) or hash_file(path) != digest:
+                return False
+        return True
+
+    def mark_complete(self, stage):
+        # Output files missing, so not completed
+        if not all(os.path.exists(path) for path in stage.files):
+            return
+        outputs = {path: hash_file(path) for path in stage.files}
+        with self.lock:
+            self.data["stages"][stage.name] = {
+                "params": stage.params(),
+                "outputs": outputs,
+                "completed": datetime.now().isoformat(timespec="seconds"),
+            }
+            self.data["offsets"].pop(stage.name, None)
+            self._save()
+
+    def offset(self, name):
+        return self.data["offsets"].get(name) or 0
+
+    def save_offset(self, name, offset):
+        with self.lock:
+            if offset:
+                self.data["offsets"][name] = offset
+            else:
+                self.data["offsets"].pop(name, None)
+            self._save()
+
+    def checkpoint(self, name):
+        return Checkpoint(self, name)
+
+class Checkpoint:
+    # Wordlist offset of one stage, saved every CHECKPOINT_INTERVAL seconds
+    def __init__(self, journal, name):
+        self.journal = journal
+        self.name = name
+        self.offset = journal.offset(name)
+        self.saved_at = time.monotonic()
+
+    def update(self, offset, force=False):
+        self.offset = offset
+        now = time.monotonic()
+        if force or now - self.saved_at >= CHECKPOINT_INTERVAL:
+            self.journal.save_offset(self.name, offset)
+            self.saved_at = now
+
+def resume_wordlist(wordlist, offset, limit=None):
+    # Wordlist without its first offset lines, for tools that cannot seek
+    resume_dir = os.path.join(CACHE_DIR, "resume")
+    os.makedirs(resume_dir, exist_ok=True)
+    # Per thread, as targets may cut the same share
+    resumed_path = os.path.join(resume_dir, f"{os.path.basename(wordlist)}.{offset}" + (f"-{limit}" if limit is not None else "")
+                                + f".{os.getpid()}-{threading.get_ident()}")
+    end = None if limit is None else offset + limit
+    compiled = open_compiled_wordlist(wordlist)
+    if compiled:
+        start = compiled.byte_offset(offset)
+        length = None if end is None else compiled.byte_offset(end) - start
+        compiled.close()
+        with open(wordlist, 'rb') as source, open(resumed_path, 'wb') as output:
+            source.seek(start)
+            if length is None:
+                shutil.copyfileobj(source, output)
+            else:
+                output.write(source.read(length))
+        return resumed_path
+    with open(wordlist, 'r', errors='ignore') as source, open(resumed_path, 'w') as output:
+        output.writelines(itertools.islice(source, offset, end))
+    return resumed_path
+
+def wordlist_size(path):
+    compiled = open_compiled_wordlist(path)
+    if compiled:
+        try:
+            return len(compiled)
+        finally:
+            compiled.close()
+    try:
+        with open(path, 'rb') as wordlist:
+            return sum(1 for _ in wordlist)
+    except FileNotFoundError:
+        return 0
+
+def thread_write_bytes():
+    # Bytes written by this thread, None where unavailable
+    try:
+        with open("/proc/thread-self/io", 'rb') as io:
+            for line in io:
+                if line.startswith(b"write_bytes:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+class StageProfile:
+    # What one stage cost
+    def __init__(self, stage):
+        self.target = stage.group or ""
+        self.stage = stage.name
+        self.status = "pending"
+        self.ready = self.started = self.finished = None
+        self.thread_cpu = 0.0
+        self.child_user = 0.0
+        self.child_system = 0.0
+        self.child_max_rss = 0
+        self.bytes_written = 0
+        self.requests = 0
+        self.hits = 0
+        self.commands = []
+        self.lock = threading.Lock()
+
+    def charge(self, process, usage):
+        command = process.args if isinstance(process.args, str) else " ".join(str(arg) for arg in process.args)
+        with self.lock:
+            self.child_user += usage.ru_utime
+            self.child_system += usage.ru_stime
+            self.child_max_rss = max(self.child_max_rss, usage.ru_maxrss * 1024)
+            self.bytes_written += usage.ru_oublock * 512
+            self.commands.append({"command": command[:200], "exit_code": process.returncode, "wall": round(time.monotonic() - process.launched, 3),
+                                  "cpu": round(usage.ru_utime + usage.ru_stime, 3), "max_rss": usage.ru_maxrss * 1024,
+                                  "stderr": process.stderr_tail.decode(errors='replace')})
+
+    def to_dict(self, run_started):
+        # blocked: until inputs were ready; wait: ready without a job slot
+        def span(start, end):
+            return round(end - start, 3) if start is not None and end is not None else None
+        return {"target": self.target, "stage": self.stage, "status": self.status,
+                "blocked": span(run_started, self.ready), "wait": span(self.ready, self.started), "wall": span(self.started, self.finished),
+                "thread_cpu": round(self.thread_cpu, 3), "child_cpu_user": round(self.child_user, 3), "child_cpu_system": round(self.child_system, 3),
+                "child_max_rss": self.child_max_rss, "bytes_written": self.bytes_written, "requests": self.requests, "hits": self.hits,
+                "failed_commands": sum(1 for command in self.commands if command["exit_code"]), "commands": self.commands}
+
+class RunProfile:
+    # --profile: per-stage report as JSON and as a Prometheus textfile
+    METRICS = [
+        ("wall", "webscan_stage_wall_seconds", "Wall time the stage ran for."),
+        ("wait", "webscan_stage_wait_seconds", "Time the stage was ready but waiting for a job slot."),
+        ("blocked", "webscan_stage_blocked_seconds", "Time from the start of the run until the stage's inputs were ready."),
+        ("thread_cpu", "webscan_stage_cpu_seconds", "CPU time of the stage's own thread."),
+        ("child_max_rss", "webscan_stage_child_max_rss_bytes", "Peak resident set size of the stage's largest child process."),
+        ("bytes_written", "webscan_stage_written_bytes", "Bytes the stage and its child processes wrote to storage."),
+        ("requests", "webscan_stage_requests", "HTTP requests the stage sent, where known."),
+        ("hits", "webscan_stage_hits", "New URLs the stage added to the URL set."),
+        ("failed_commands", "webscan_stage_failed_commands", "Child processes of the stage that exited non-zero."),
+    ]
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.finished = None
+        self.stages = []
+        self.peak_running = 0
+        self.peak_waiting = 0
+
+    def add(self, stage):
+        profile = StageProfile(stage)
+        self.stages.append(profile)
+        return profile
+
+    def sample(self, running, waiting):
+        self.peak_running = max(self.peak_running, running)
+        self.peak_waiting = max(self.peak_waiting, waiting)
+
+    def report(self):
+        return {"started": datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+                "wall": round((self.finished or time.monotonic()) - self.started, 3),
+                "peak_running": self.peak_running, "peak_waiting": self.peak_waiting,
+                "stages": [profile.to_dict(self.started) for profile in self.stages]}
+
+    def prometheus(self):
+        def labels(**values):
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values.values())
+            return "{" + ",".join(f'{name}="{value}"' for name, value in zip(values, escaped)) + "}"
+
+        report = self.report()
+        lines = []
+        def metric(name, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{label} {value}" for label, value in samples)
+
+        metric("webscan_run_start_timestamp_seconds", "When the run started.", [("", round(self.started_at, 3))])
+        metric("webscan_run_wall_seconds", "Wall time of the whole run.", [("", report["wall"])])
+        metric("webscan_run_peak_running_stages", "Most stages running at once.", [("", self.peak_running)])
+        metric("webscan_run_peak_waiting_stages", "Most stages ready and waiting for a job slot at once.", [("", self.peak_waiting)])
+        stages = report["stages"]
+        metric("webscan_stage_status", "1 for the status the stage ended with.",
+               [(labels(target=stage["target"], stage=stage["stage"], status=stage["status"]), 1) for stage in stages])
+        for field, name, help_text in self.METRICS:
+            metric(name, help_text, [(labels(target=stage["target"], stage=stage["stage"]), stage[field]) for stage in stages if stage[field] is not None])
+        metric("webscan_stage_child_cpu_seconds", "CPU time of the stage's child processes.",
+               [(labels(target=stage["target"], stage=stage["stage"], mode=mode), stage[f"child_cpu_{mode}"]) for stage in stages for mode in ("user", "system")])
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        # Write and rename, so the collector never reads half a file
+        os.makedirs(self.directory, exist_ok=True)
+        paths = []
+        for name, content in ((PROFILE_JSON, json.dumps(self.report(), indent=2)), (PROFILE_PROMETHEUS, self.prometheus())):
+            path = os.path.join(self.directory, name)
+            with open(f"{path}.tmp", 'w') as output:
+                output.write(content)
+            os.replace(f"{path}.tmp", path)
+            paths.append(path)
+        return paths
+
+def load_stage_rates(path=BUDGET_RATES_PATH):
+    # Stage name -> past rate (candidates per second)
+    try:
+        with open(path, 'r') as rates:
+            return {name: float(rate) for name, rate in json.load(rates).items()}
+    except (FileNotFoundError, ValueError, TypeError, AttributeError):
+        return {}
+
+def save_stage_rates(rates, path=BUDGET_RATES_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w') as output:
+        json.dump(rates, output)
+    os.replace(f"{path}.tmp", path)
+
+class StageBudget:
+    # One stage's part of its target's --budget
+    def __init__(self, scan, name, estimate=None):
+        self.scan = scan
+        self.name = name
+        # Callable giving the stage's candidate count
+        self.estimate = estimate
+        self.candidates = None
+        self.share = None
+        self.started = self.finished = self.deadline = None
+        self.extended = 0.0
+        self.last_hit = None
+        self.done = None
+        self.kept = self.available = None
+        self.expired = False
+        self.outcome = None
+        self.processes = []
+
+    @property
+    def label(self):
+        return f"{self.scan.label}/{self.name}"
+
+    @property
+    def hard_deadline(self):
+        # Discovery makes way for the later stages
+        return self.scan.discovery_deadline if self.estimate else self.scan.deadline
+
+    @property
+    def cut(self):
+        return self.expired or (self.kept is not None and self.kept < self.available)
+
+    def out_of_time(self, now):
+        if self.scan.started is None:
+            return False
+        return now >= self.hard_deadline
+
+    def begin(self):
+        now = time.monotonic()
+        self.scan.start(now)
+        if not self.estimate:
+            self.deadline = self.hard_deadline
+            print_informational_message(f"Budget for {self.label}: {RESET}{format_duration(self.deadline - now)}")
+        else:
+            self.scan.plan(now, self)
+            self.deadline = min(now + self.share, self.hard_deadline)
+            rate = self.scan.rate(self.name)
+            print_informational_message(f"Budget for {self.label}: {RESET}{format_duration(self.deadline - now)}; its {self.candidates} candidates "
+                                        f"take about {format_duration(self.candidates / rate)} at {rate:.0f}/s")
+        self.started = now
+
+    def fit(self, available):
+        self.available = available
+        # No measured rate: every candidate, stopped at the deadline
+        if self.name not in self.scan.rates:
+            self.kept = available
+            return None
+        keep = max(0, int((self.deadline - time.monotonic()) * self.scan.rate(self.name)))
+        self.kept = min(keep, available)
+        if keep >= available:
+            return None
+        print_informational_message(f"Budget for {self.label}: {RESET}time for the first {keep} of {available} candidates")
+        return keep
+
+    def track(self, process):
+        self.processes.append(process)
+        if self.expired:
+            process.terminate()
+
+    def tick(self, now):
+        # Extend a stage still finding things, stop the others
+        if self.expired or self.deadline is None or now < self.deadline:
+            return
+        active = self.last_hit is not None and now - self.last_hit <= BUDGET_ACTIVE_WINDOW
+        extension = self.scan.borrow(min(BUDGET_EXTENSION, self.hard_deadline - now)) if active else 0
+        if extension:
+            self.extended += extension
+            self.deadline = now + extension
+            print_informational_message(f"Budget for {self.label}: {RESET}still finding URLs, {format_duration(extension)} more")
+            return
+        print_informational_message(f"Budget for {self.label}: {RESET}time is up, stopping it")
+        self.expired = True
+        for process in self.processes:
+            if process.returncode is None:
+                process.terminate()
+
+    def skip(self, reason):
+        self.outcome = f"skipped, {reason}"
+        if self.share:
+            self.scan.give(self.share)
+
+    def finish(self, outcome):
+        now = time.monotonic()
+        self.finished = now
+        self.outcome = outcome
+        if self.estimate and not self.expired:
+            self.scan.give(self.deadline - now)
+        done = self.done if self.done is not None else self.kept if outcome == "finished" else None
+        if done and now - self.started >= BUDGET_TICK:
+            self.scan.record_rate(self.name, done / (now - self.started))
+
+class ScanBudget:
+    # --budget for one target; discovery shares the first 1 - BUDGET_RESERVE
+    def __init__(self, label, seconds, slots, rates):
+        self.label = label
+        self.seconds = seconds
+        self.slots = slots
+        self.rates = rates
+        self.started = self.deadline = self.discovery_deadline = None
+        self.spare = 0.0
+        self.lent = 0.0
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def stage(self, name, estimate=None):
+        self.stages[name] = StageBudget(self, name, estimate)
+        return self.stages[name]
+
+    def rate(self, name):
+        return self.rates.get(name) or BUDGET_DEFAULT_RATE
+
+    def record_rate(self, name, rate):
+        with self.lock:
+            previous = self.rates.get(name)
+            self.rates[name] = rate if previous is None else previous + BUDGET_RATE_WEIGHT * (rate - previous)
+
+    def start(self, now):
+        with self.lock:
+            if self.started is None:
+                self.started = now
+                self.deadline = now + self.seconds
+                self.discovery_deadline = now + self.seconds * (1 - BUDGET_RESERVE)
+
+    def give(self, seconds):
+        with self.lock:
+            self.spare += max(0.0, seconds)
+
+    def borrow(self, seconds):
+        # Up to seconds of unused time
+        with self.lock:
+            seconds = min(seconds, self.spare)
+            if seconds < BUDGET_TICK:
+                return 0
+            self.spare -= seconds
+            self.lent += seconds
+            return seconds
+
+    def plan(self, now, current):
+        # Water-filling over the free job slots; only current's share is kept
+        with self.lock:
+            window = max(0.0, self.discovery_deadline - now)
+            waiting = [stage for stage in self.stages.values() if stage.estimate and stage.started is None and stage.outcome is None]
+            running = sum(1 for stage in self.stages.values() if stage.estimate and stage.started is not None and stage.finished is None)
+            needs = {}
+            for stage in waiting:
+                stage.candidates = stage.estimate()
+                needs[stage] = stage.candidates / self.rate(stage.name)
+            capacity = window * max(1, min(self.slots - running, len(waiting)))
+            for left, stage in enumerate(sorted(waiting, key=needs.get)):
+                share = min(needs[stage], capacity / (len(waiting) - left), window)
+                capacity -= share
+                if stage is current:
+                    current.share = share
+            current.share = min(window, current.share + capacity / len(waiting))
+
+    def report(self):
+        used = (max((stage.finished or 0) for stage in self.stages.values()) - self.started) if self.started else 0
+        lines = [f"Time budget for {self.label}: {format_duration(self.seconds)}, {format_duration(max(0, used))} used, "
+                 f"{format_duration(self.lent)} handed out as extensions\n\n",
+                 f"{'stage':<20} {'share':>7} {'ran':>7} {'extra':>7}  {'candidates':<24} outcome\n"]
+        losses = []
+        for stage in self.stages.values():
+            ran = format_duration(stage.finished - stage.started) if stage.finished else "-"
+            work = ""
+            if stage.kept is not None:
+                work = f"{stage.kept} of {stage.available} kept"
+            elif stage.done is not None and stage.candidates:
+                work = f"{stage.done} of {stage.candidates} done"
+            share = format_duration(stage.share) if stage.share is not None else "-"
+            extra = format_duration(stage.extended) if stage.extended else "-"
+            lines.append(f"{stage.name:<20} {share:>7} {ran:>7} {extra:>7}  {work:<24} {stage.outcome or 'not run'}\n")
+            if stage.outcome and stage.outcome.startswith("skipped"):
+                losses.append(f"{stage.name} was skipped")
+            elif stage.kept is not None and stage.kept < stage.available:
+                losses.append(f"{stage.name} left out {stage.available - stage.kept} candidates")
+            elif stage.expired:
+                progress = f" after {stage.done} of {stage.candidates}" if stage.done is not None and stage.candidates and stage.done < stage.candidates else ""
+                losses.append(f"{stage.name} was stopped at its deadline{progress}")
+        lines.append(f"\n[webscan] left out because of the budget: {'; '.join(losses) if losses else 'nothing'}\n")
+        return lines
+
+class Stage:
+    def __init__(self, name, func, *args, inputs=(), outputs=(), files=(), on_done=None):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        # Files the stage writes; their hashes go into the journal
+        self.files = list(files)
+        # Called once the stage has finished, failed or been skipped
+        self.on_done = on_done
+        # Target of the stage (None when shared) and its journal
+        self.group = None
+        self.journal = None
+        # Set when profiled or under --budget
+        self.profile = None
+        self.budget = None
+        # Set when a journaled stage depends on this one
+        self.feeds_journal = False
+        # Set when the stage left its files as they were
+        self.unchanged = False
+
+    @property
+    def label(self):
+        return f"{self.group}/{self.name}" if self.group else self.name
+
+    def snapshot(self):
+        if not self.files or not all(os.path.exists(path) for path in self.files):
+            return None
+        snapshot = {}
+        for path in self.files:
+            info = os.stat(path)
+            snapshot[path] = (info.st_size, info.st_mtime_ns)
+        return snapshot
+
+    def run(self):
+        if not self.feeds_journal:
+            return self._run_budgeted() if self.budget else self._run()
+        before = self.snapshot()
+        digests = {path: hash_file(path) for path in before} if before else None
+        result = self._run_budgeted() if self.budget else self._run()
+        # Nothing new for the next stages when the files did not change
+        after = self.snapshot() if before and result is not False else None
+        self.unchanged = after is not None and all(
+            after[path] == before[path] or after[path][0] == before[path][0] and hash_file(path) == digests[path] for path in after)
+        return result
+
+    def _run_budgeted(self):
+        STAGE_CONTEXT.budget = self.budget
+        self.budget.begin()
+        outcome = "failed"
+        try:
+            result = self._run()
+            outcome = "incomplete" if result is False else "finished"
+        except Exception as e:
+            if not self.budget.expired:
+                raise
+            print_informational_message(f"{self.label} stopped by its time budget: {RESET}{e}")
+            result = False
+        finally:
+            STAGE_CONTEXT.budget = None
+            self.budget.finish("stopped at its deadline" if self.budget.expired else outcome)
+        # Cut short, so the next run takes it up again
+        return False if self.budget.cut else result
+
+    def _run(self):
+        if not self.profile:
+            return self.func(*self.args)
+        STAGE_CONTEXT.profile = self.profile
+        written = thread_write_bytes()
+        cpu = time.thread_time()
+        self.profile.started = time.monotonic()
+        try:
+            return self.func(*self.args)
+        finally:
+            self.profile.finished = time.monotonic()
+            self.profile.thread_cpu = time.thread_time() - cpu
+            if written is not None:
+                profile_count("bytes_written", thread_write_bytes() - written)
+            STAGE_CONTEXT.profile = None
+
+    def params(self):
+        plain = (str, int, float, bool, type(None))
+        return [self.func.__name__] + [arg if isinstance(arg, plain) else type(arg).__name__ for arg in self.args]
+
+    def done(self):
+        if self.on_done:
+            self.on_done()
+
+def labels(stages):
+    return ', '.join(sorted(stage.label for stage in stages))
+
+def run_stages(stages, max_jobs, max_group_jobs=None, profiler=None):
+    # Run the stages as their inputs become ready; a stage returning False is retried next run
+    if profiler:
+        for stage in stages:
+            stage.profile = profiler.add(stage)
+    budgeted = any(stage.budget for stage in stages)
+
+    def mark(stage, status):
+        if stage.profile:
+            stage.profile.status = status
+            if stage.profile.ready is None and status in ("ready", "skipped"):
+                stage.profile.ready = time.monotonic()
+
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            producers.setdefault((stage.group, output), []).append(stage)
+
+    dependencies = {}
+    for stage in stages:
+        dependencies[stage] = set()
+        for name in stage.inputs:
+            found = producers.get((stage.group, name)) or producers.get((None, name), [])
+            dependencies[stage].update(producer for producer in found if producer is not stage)
+        if stage.journal:
+            for producer in dependencies[stage]:
+                producer.feeds_journal = True
+
+    order = {stage: index for index, stage in enumerate(stages)}
+    pending = list(stages)
+    completed = set()
+    failed = set()
+    executed = set()
+    running = {}
+    running_per_group = {}
+    started_per_group = {}
+
+    executor = ThreadPoolExecutor(max_workers=max_jobs)
+    try:
+        while pending or running:
+            ready = []
+            waiting = len(pending)
+            for stage in list(pending):
+                blocked_by = dependencies[stage] & failed
+                if blocked_by:
+                    print_error_message(f"Skipping {stage.label}: depends on failed stage(s) {labels(blocked_by)}")
+                    mark(stage, "blocked")
+                    failed.add(stage)
+                    pending.remove(stage)
+                    stage.done()
+                elif dependencies[stage] <= completed:
+                    if stage.journal and not dependencies[stage] & executed and stage.journal.is_complete(stage):
+                        print_informational_message(f"Skipping {stage.label}: {RESET}already completed")
+                        mark(stage, "skipped")
+                        completed.add(stage)
+                        pending.remove(stage)
+                        stage.done()
+                    elif stage.budget and stage.budget.out_of_time(time.monotonic()):
+                        print_informational_message(f"Skipping {stage.label}: {RESET}no time left in its budget")
+                        stage.budget.skip("no time left")
+                        mark(stage, "skipped")
+                        completed.add(stage)
+                        pending.remove(stage)
+                        stage.done()
+                    else:
+                        mark(stage, "ready")
+                        ready.append(stage)
+
+            # Fewest running and started stages first
+            ready.sort(key=lambda stage: (running_per_group.get(stage.group, 0), started_per_group.get(stage.group, 0), order[stage]))
+            for stage in ready:
+                if len(running) >= max_jobs:
+                    break
+                if max_group_jobs and stage.group and running_per_group.get(stage.group, 0) >= max_group_jobs:
+                    continue
+                running[executor.submit(stage.run)] = stage
+                running_per_group[stage.group] = running_per_group.get(stage.group, 0) + 1
+                started_per_group[stage.group] = started_per_group.get(stage.group, 0) + 1
+                executed.add(stage)
+                pending.remove(stage)
+                mark(stage, "running")
+            if profiler:
+                profiler.sample(len(running), sum(1 for stage in ready if stage in pending))
+
+            if not running:
+                if pending and len(pending) < waiting:
+                    continue
+                if pending:
+                    print_error_message(f"Unresolvable stage dependencies: {labels(pending)}")
+                    for stage in pending:
+                        mark(stage, "unresolved")
+                        stage.done()
+                break
+
+            finished, _ = wait(running, timeout=BUDGET_TICK if budgeted else None, return_when=FIRST_COMPLETED)
+            if budgeted:
+                now = time.monotonic()
+                for future, stage in running.items():
+                    if stage.budget and future not in finished:
+                        stage.budget.tick(now)
+            for future in finished:
+                stage = running.pop(future)
+                running_per_group[stage.group] -= 1
+                try:
+                    result = future.result()
+                    if result is not False and stage.journal:
+                        stage.journal.mark_complete(stage)
+                    if stage.unchanged:
+                        executed.discard(stage)
+                    mark(stage, "incomplete" if result is False else "completed")
+                    completed.add(stage)
+                except Exception as e:
+                    print_error_message(f"Stage {stage.label} failed: {e}")
+                    mark(stage, "failed")
+                    failed.add(stage)
+                stage.done()
+    except KeyboardInterrupt:
+        # Stop everything still running after Ctrl-C
+        if running:
+            print_error_message(f"Interrupted, stopping {labels(running.values())}")
+        stop_stages()
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return completed, failed
+
+def build_stages(args, scan, notebook_dir, journal=None, rates=None):
+    shares = {tool: candidate_share_path(tool) for tool, _, _ in DISCOVERY_WORDLISTS}
+    discovery_inputs = ["candidates"]
+    prefix = f"{scan.target}-{scan.port}"
+    target_dir = get_target_directory(scan.full_url)
+    # Equal share of the host's request budget each
+    rate = max(1, args.rate // DISCOVERY_TOOLS_PER_HOST) if args.rate else None
+    controller = ConcurrencyController(args.max_concurrency)
+
+    # Filled in by the calibrate stage
+    if args.fresh and os.path.exists(calibration_cache_path(scan.target, scan.port)):
+        os.remove(calibration_cache_path(scan.target, scan.port))
+    calibration = Calibration()
+    if journal and journal.resuming:
+        calibration.load(f"webscan-calibration-{prefix}.json", max_age=None)
+    discovery_inputs = discovery_inputs + ["calibration"]
+
+    recursion = args.recursion_depth > 0
+    producers = ["feroxbuster", "ffuf", "gobuster", "mirror"] + (["recursion"] if recursion else [])
+    collector = UrlCollector(f'webscan-urls-{prefix}.md', f'webscan-hits-{prefix}.jsonl', producers,
+                             resume=bool(journal and journal.resuming), calibration=calibration)
+    ffuf_checkpoint = journal.checkpoint("ffuf") if journal else None
+    gobuster_checkpoint = journal.checkpoint("gobuster") if journal else None
+
+    def producer_done(name):
+        return lambda: collector.producer_done(name)
+
+    def monitor(name):
+        return YieldMonitor(name, args.min_yield, args.yield_window) if args.min_yield else None
+
+    if args.engine == "native":
+        ffuf_stage = Stage("ffuf", run_native_discovery, scan.full_url, scan.target, scan.port, notebook_dir, "ffuf", shares["ffuf"], args.connections, collector, ffuf_checkpoint, rate, calibration, monitor("ffuf"), controller,
+                           inputs=discovery_inputs, outputs=["ffuf"], files=[f"024-webscan-{prefix}-ffuf_wordlist.md"], on_done=producer_done("ffuf"))
+        gobuster_stage = Stage("gobuster", run_native_discovery, scan.full_url, scan.target, scan.port, notebook_dir, "gobuster", shares["gobuster"], args.connections, collector, gobuster_checkpoint, rate, calibration, monitor("gobuster"), controller,
+                               inputs=discovery_inputs, outputs=["gobuster"], files=[f"025-webscan-{prefix}-gobuster_wc_big.md"], on_done=producer_done("gobuster"))
+    else:
+        ffuf_stage = Stage("ffuf", run_ffuf, scan.full_url, scan.target, scan.port, notebook_dir, shares["ffuf"], collector, ffuf_checkpoint, rate, calibration, monitor("ffuf"), controller,
+                           inputs=discovery_inputs, outputs=["ffuf"], files=[f"024-webscan-{prefix}-ffuf_wordlist.md"], on_done=producer_done("ffuf"))
+        gobuster_stage = Stage("gobuster", run_gobuster, scan.full_url, scan.target, scan.port, notebook_dir, shares["gobuster"], collector, rate, calibration, controller,
+                               inputs=discovery_inputs, outputs=["gobuster"], files=[f"025-webscan-{prefix}-gobuster_wc_big.md"], on_done=producer_done("gobuster"))
+
+    # Sharded ffuf stage
+    if args.shard_queue:
+        ffuf_stage = Stage("ffuf", run_sharded_discovery, scan.full_url, scan.target, scan.port, notebook_dir, args.shard_queue, shares["ffuf"], args.shard_size,
+                           args.local_workers, collector, args.connections, rate, args.remote_workers,
+                           inputs=discovery_inputs, outputs=["ffuf"], files=[f"024-webscan-{prefix}-ffuf_wordlist.md"], on_done=producer_done("ffuf"))
+
+    # After the brute-forcers, so they get a job slot first
+    recursion_stages = []
+    if recursion:
+        recursion_stages.append(Stage("recursion", run_recursive_discovery, scan.full_url, scan.target, scan.port, collector, calibration, args.connections, rate,
+                                      args.recursion_depth, args.recursion_requests, controller, inputs=discovery_inputs, outputs=["recursion"],
+                                      files=[f"028-webscan-{prefix}-recursion.md"], on_done=producer_done("recursion")))
+
+    # After the brute-forcers, so they get a job slot first
+    if args.stream:
+        aquatone_stage = Stage("aquatone", run_aquatone, scan.target, scan.port, collector, inputs=discovery_inputs, outputs=["aquatone"])
+    else:
+        aquatone_stage = Stage("aquatone", run_aquatone, scan.target, scan.port, inputs=["screen-urls"], outputs=["aquatone"])
+
+    stages = [
+        Stage("calibrate", run_calibration, scan.full_url, scan.target, scan.port, scan.domain, calibration, outputs=["calibration"],
+              files=[f"webscan-calibration-{prefix}.json"]),
+        Stage("nmap", run_nmap_scan, scan.target, scan.port, notebook_dir, outputs=["nmap"], files=[f"020-webscan-{prefix}-nmap-http.md"]),
+        Stage("whatweb", run_whatweb_scan, scan.target, scan.port, notebook_dir, outputs=["whatweb"], files=[f"021-webscan-{prefix}-whatweb-output.md"]),
+        Stage("mirror", run_mirror, scan.full_url, collector, args.mirror_connections, args.mirror_pages, args.mirror_size, rate, controller,
+              outputs=["site"], on_done=producer_done("mirror")),
+        Stage("copy-site", copy_site_to_notebook, target_dir, notebook_dir, args.sync_hash, inputs=["site"]),
+        Stage("site-listing", run_ls_and_tee, target_dir, scan.target, scan.port, notebook_dir, inputs=["site"], outputs=["manifest"],
+              files=[f"022-webscan-{prefix}-wget-directory-output.md", f"022-webscan-{prefix}-wget-manifest.jsonl"]),
+        Stage("feroxbuster", run_feroxbuster, scan.target, scan.full_url, scan.port, notebook_dir, shares["feroxbuster"], collector, rate, calibration, recursion, controller,
+              inputs=discovery_inputs, outputs=["ferox"], files=[f"023-webscan-{prefix}-ferox_basic_files.md", f"023-webscan-{prefix}-ferox_basic_files.json"],
+              on_done=producer_done("feroxbuster")),
+        ffuf_stage,
+        gobuster_stage,
+        *recursion_stages,
+        aquatone_stage,
+        Stage("collect-urls", process_webscan_files, scan.target, scan.port, collector, inputs=["ferox", "ffuf", "gobuster", "site", "recursion"], outputs=["urls"],
+              files=[f"webscan-urls-{prefix}.md", f"webscan-hits-{prefix}.jsonl"]),
+        Stage("urls-html", convert_webscan_urls_to_html, scan.target, scan.port, notebook_dir, inputs=["urls"], outputs=["url-list"]),
+        Stage("screen-urls", dedup_screenshot_urls, scan.target, scan.port, rate, controller, inputs=["url-list"], outputs=["screen-urls"],
+              files=[f"webscan-screen-urls-{prefix}.md", f"webscan-url-groups-{prefix}.json"]),
+        Stage("eyewitness", run_eyewitness, scan.target, scan.port, notebook_dir, inputs=["screen-urls"], outputs=["eyewitness"]),
+        Stage("geckodriver-cleanup", cleanup_geckodriver_log, inputs=["eyewitness", "aquatone"]),
+    ]
+
+    if scan.domain:
+        # --fresh resolves every name again
+        nameserver = args.nameserver or system_nameserver()
+        if args.fresh and nameserver and os.path.exists(dns_cache_path(nameserver, scan.target)):
+            os.remove(dns_cache_path(nameserver, scan.target))
+        stages.append(Stage("hosts", run_host_discovery, scan.full_url, scan.target, scan.target, scan.port, notebook_dir, args.nameserver, rate, calibration,
+                            monitor("hosts"), controller, inputs=["calibration"], outputs=["subdomains", "vhosts"],
+                            files=[f"026-webscan-{prefix}-ffuf-subdomains-output.md", f"027-webscan-{prefix}-ffuf_vhosts-output.md"]))
+
+    for stage in stages:
+        stage.group = prefix
+        stage.journal = journal
+
+    if args.budget:
+        # Counted when each planned stage starts
+        def share_size(tool, wordlist, extensions):
+            return lambda: wordlist_size(shares[tool]) or wordlist_size(os.path.join(WORDLIST_DIR, wordlist)) * (1 + len(extensions))
+        estimates = {tool: share_size(tool, wordlist, extensions) for tool, wordlist, extensions in DISCOVERY_WORDLISTS}
+        estimates.update({"recursion": lambda: args.recursion_requests, "mirror": lambda: args.mirror_pages,
+                          "hosts": lambda: wordlist_size(os.path.join(WORDLIST_DIR, "dnslist.txt"))})
+        budget = ScanBudget(prefix, args.budget, min(args.jobs, args.host_jobs), rates if rates is not None else {})
+        for stage in stages:
+            if stage.name not in BUDGET_EXEMPT_STAGES:
+                stage.budget = budget.stage(stage.name, estimates.get(stage.name) if stage.name in BUDGET_PLANNED_STAGES else None)
+
+    return stages
+
 def main():
     args = parse_arguments()
-   
-    print_informational_message(f"Analyzing target: {RESET}'{args.full_url}'")
+
+    if args.worker:
+        run_shard_worker(args.worker, args.connections, args.rate)
+        return
 
     notebook_dir = create_notebook_directory()
-    target_dir = get_target_directory(args.full_url)
-    run_nmap_scan(args.target, args.port, notebook_dir)
-    run_whatweb_scan(args.target, args.port, notebook_dir)
-    run_wget(args.full_url)
-    copy_site_to_notebook(target_dir, notebook_dir)
-    run_ls_and_tee(target_dir, args.target, args.port, notebook_dir)
-    run_feroxbuster(args.target, args.full_url, args.port, notebook_dir)
-    run_ffuf(args.full_url, args.target, args.port, notebook_dir)
-    run_gobuster(args.full_url, args.target, args.port, notebook_dir)
-    process_webscan_files(args.target, args.port)
-    convert_webscan_urls_to_html(args.target, args.port, notebook_dir)
-    run_eyewitness(args.domain, args.target, args.port)
-    copy_eyewitness_screens(notebook_dir, args.target, args.port)
-    run_aquatone(args.target, args.port)
-    cleanup_geckodriver_log()
-
-    if args.domain:
-        fuzz_subdomains(args.target, args.target, args.port, notebook_dir)
-        fuzz_vhosts(args.target, args.target, args.port, notebook_dir)
+
+    # Stages shared by every target
+    stages = []
+    journals = []
+    rates = load_stage_rates() if args.budget else None
+    for scan in args.scans:
+        print_informational_message(f"Analyzing target: {RESET}'{scan.full_url}'")
+        journal = StageJournal(f"webscan-journal-{scan.target}-{scan.port}.json", fresh=args.fresh)
+        journals.append(journal)
+        stages += build_stages(args, scan, notebook_dir, journal, rates)
+
+    # Reordering would invalidate the offsets of a resumed run
+    reorder = not any(journal.resuming for journal in journals)
+    plan_files = [os.path.join(CACHE_DIR, "candidates", "manifest.json")]
+    for tool, _, _ in DISCOVERY_WORDLISTS:
+        plan_files += [candidate_share_path(tool), f"{candidate_share_path(tool)}.idx"]
+    stages.insert(0, Stage("plan-candidates", plan_discovery_candidates, args.dedup, reorder, outputs=["candidates"], files=plan_files))
+
+    profiler = RunProfile(args.profile) if args.profile else None
+    run_stages(stages, args.jobs, args.host_jobs, profiler)
+
+    if profiler:
+        profiler.finished = time.monotonic()
+        for path in profiler.write():
+            print_informational_message(f"Profile written to {RESET}{path}")
+
+    if args.budget:
+        save_stage_rates(rates)
+        for budget in dict.fromkeys(stage.budget.scan for stage in stages if stage.budget):
+            report_path = f"webscan-budget-{budget.label}.md"
+            lines = budget.report()
+            with open(report_path, 'w') as report:
+                report.writelines(lines)
+            print_informational_message(f"Budget report written to {RESET}{report_path}")
+            print("".join(lines), end="")
+
     print_informational_message(f"{DARK_WHITE}Webscan Complete.")
 
 if __name__ == "__main__":
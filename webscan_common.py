@@ -0,0 +1,29 @@
+import hashlib
+import random
+import string
+import threading
+
+# Random name lengths for the catch-all probes
+CALIBRATION_LENGTHS = (8, 16, 24)
+
+# Profile and budget of the stage running on this thread
+STAGE_CONTEXT = threading.local()
+
+def current_profile():
+    return getattr(STAGE_CONTEXT, "profile", None)
+
+def profile_count(field, amount=1):
+    profile = current_profile()
+    if profile and amount:
+        with profile.lock:
+            setattr(profile, field, getattr(profile, field) + amount)
+
+def random_token(length=12):
+    return ''.join(random.choices(string.ascii_lowercase + string.digits, k=length))
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import struct
+import time
+
+from webscan_common import CALIBRATION_LENGTHS, random_token
+
+# Subdomain pre-resolution settings
+DEFAULT_DNS_CONCURRENCY = 500
+DNS_TIMEOUT = 0.5
+DNS_ATTEMPTS = 4
+DNS_MAX_TTL = 24 * 60 * 60
+DNS_NEGATIVE_TTL = 60 * 60
+DNS_TYPE_A = 1
+DNS_TYPE_SOA = 6
+DNS_TYPE_AAAA = 28
+DNS_NOERROR = 0
+DNS_NXDOMAIN = 3
+DNS_LABEL = re.compile(r"^[A-Za-z0-9_](?:[A-Za-z0-9_-]{0,61}[A-Za-z0-9_])?$")
+
+def system_nameserver():
+    # First nameserver in /etc/resolv.conf
+    try:
+        with open("/etc/resolv.conf", 'r') as resolv_conf:
+            for line in resolv_conf:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    return fields[1].split('%')[0], 53
+    except OSError:
+        pass
+    return None
+
+def parse_nameserver(value):
+    # HOST, HOST:PORT or [IPv6]:PORT
+    if value.startswith('['):
+        host, _, port = value[1:].partition(']')
+        port = port.lstrip(':')
+    elif value.count(':') == 1:
+        host, port = value.split(':')
+    else:
+        host, port = value, ''
+    if port and not port.isdigit():
+        raise ValueError(f"bad nameserver port in {value}")
+    return host, int(port) if port else 53
+
+def encode_dns_name(name):
+    labels = name.rstrip('.').split('.')
+    if not all(DNS_LABEL.match(label) for label in labels) or len(name) > 253:
+        return None
+    return b''.join(bytes([len(label)]) + label.encode('ascii') for label in labels) + b'\x00'
+
+def skip_dns_name(data, offset):
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += length + 1
+
+def parse_dns_response(data):
+    # rcode, addresses and how long the answer may be cached
+    _, flags, questions, answers, authorities, _ = struct.unpack(">HHHHHH", data[:12])
+    offset = 12
+    for _ in range(questions):
+        offset = skip_dns_name(data, offset) + 4
+    addresses = set()
+    ttls = []
+    negative_ttl = DNS_NEGATIVE_TTL
+    for index in range(answers + authorities):
+        offset = skip_dns_name(data, offset)
+        record_type, _, ttl, length = struct.unpack(">HHIH", data[offset:offset + 10])
+        record = data[offset + 10:offset + 10 + length]
+        offset += 10 + length
+        if index < answers and record_type in (DNS_TYPE_A, DNS_TYPE_AAAA) and len(record) in (4, 16):
+            addresses.add(socket.inet_ntop(socket.AF_INET if len(record) == 4 else socket.AF_INET6, record))
+            ttls.append(ttl)
+        elif index >= answers and record_type == DNS_TYPE_SOA and len(record) >= 20:
+            negative_ttl = min(ttl, struct.unpack(">I", record[-4:])[0])
+    return flags & 0x0F, sorted(addresses), min(ttls) if addresses else negative_ttl
+
+class DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, on_response):
+        self.on_response = on_response
+
+    def datagram_received(self, data, addr):
+        self.on_response(data)
+
+class DnsResolver:
+    # Stub resolver over one UDP socket; must be opened inside the running loop
+    def __init__(self, nameserver, timeout=DNS_TIMEOUT, attempts=DNS_ATTEMPTS):
+        self.nameserver = nameserver
+        self.timeout = timeout
+        self.attempts = attempts
+        self.pending = {}
+        self.transport = None
+        self.queries = 0
+        self.answers = 0
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        family = socket.AF_INET6 if ':' in self.nameserver[0] else socket.AF_INET
+        self.transport, _ = await loop.create_datagram_endpoint(lambda: DnsProtocol(self._received), remote_addr=self.nameserver, family=family)
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+    def _received(self, data):
+        if len(data) < 12:
+            return
+        waiter = self.pending.get(struct.unpack(">H", data[:2])[0])
+        if waiter and not waiter.done():
+            waiter.set_result(data)
+
+    async def query(self, name, record_type):
+        # (rcode, addresses, ttl), or None without a usable answer
+        question = encode_dns_name(name)
+        if question is None:
+            return DNS_NXDOMAIN, [], DNS_MAX_TTL
+        question += struct.pack(">HH", record_type, 1)
+        loop = asyncio.get_running_loop()
+        query_id = random.randrange(65536)
+        while query_id in self.pending:
+            query_id = random.randrange(65536)
+        packet = struct.pack(">HHHHHH", query_id, 0x0100, 1, 0, 0, 0) + question
+        waiter = self.pending[query_id] = loop.create_future()
+        timeout = self.timeout
+        try:
+            for _ in range(self.attempts):
+                self.queries += 1
+                try:
+                    self.transport.sendto(packet)
+                    data = await asyncio.wait_for(asyncio.shield(waiter), timeout)
+                except (asyncio.TimeoutError, OSError):
+                    timeout *= 2
+                    continue
+                # Same ID, different question
+                if data[12:12 + len(question)].lower() != question.lower():
+                    waiter = self.pending[query_id] = loop.create_future()
+                    continue
+                try:
+                    answer = parse_dns_response(data)
+                except (struct.error, IndexError, ValueError):
+                    waiter = self.pending[query_id] = loop.create_future()
+                    continue
+                self.answers += 1
+                return answer
+        finally:
+            del self.pending[query_id]
+        return None
+
+    async def resolve(self, name):
+        # (addresses, ttl), or None when the lookup failed
+        answer = await self.query(name, DNS_TYPE_A)
+        if answer and answer[0] == DNS_NOERROR and not answer[1]:
+            answer = await self.query(name, DNS_TYPE_AAAA) or answer
+        if answer is None or answer[0] not in (DNS_NOERROR, DNS_NXDOMAIN):
+            return None
+        return answer[1], min(answer[2], DNS_MAX_TTL)
+
+def load_dns_cache(path):
+    # Label -> [expiry timestamp, addresses]; "*" holds the wildcard answer of the domain
+    try:
+        with open(path, 'r') as cached:
+            return json.load(cached)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_dns_cache(path, cache):
+    # Drop stale entries; write and rename
+    now = time.time()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w') as output:
+        json.dump({label: entry for label, entry in cache.items() if entry[0] > now}, output)
+    os.replace(f"{path}.tmp", path)
+
+class SystemResolver:
+    # getaddrinfo fallback; nothing it answers is cached
+    def __init__(self):
+        self.queries = 0
+        self.answers = 0
+
+    async def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def resolve(self, name):
+        self.queries += 1
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(name, None, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if e.errno not in (socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)):
+                return None
+            self.answers += 1
+            return [], 0
+        self.answers += 1
+        return sorted({info[4][0] for info in infos}), 0
+
+async def resolve_subdomains(domain, labels, resolver, cache, concurrency=DEFAULT_DNS_CONCURRENCY):
+    # Sort labels into subdomains, wildcard matches, missing names and failures
+    await resolver.open()
+    now = time.time()
+    result = {"resolved": {}, "wildcard": [], "missing": [], "failed": []}
+
+    try:
+        # Wildcard DNS shows up as random names that resolve
+        wildcard = cache.get("*")
+        if not wildcard or wildcard[0] <= now:
+            probes = await asyncio.gather(*(resolver.resolve(f"{random_token(length)}.{domain}") for length in CALIBRATION_LENGTHS))
+            probes = [probe for probe in probes if probe is not None]
+            if probes:
+                wildcard = cache["*"] = [now + min(ttl for _, ttl in probes), sorted({address for addresses, _ in probes for address in addresses})]
+        wildcard_addresses = set(wildcard[1]) if wildcard else set()
+
+        labels = iter(labels)
+
+        async def worker():
+            for label in labels:
+                entry = cache.get(label)
+                if not entry or entry[0] <= now:
+                    answer = await resolver.resolve(f"{label}.{domain}")
+                    if answer is None:
+                        result["failed"].append(label)
+                        continue
+                    entry = cache[label] = [now + answer[1], answer[0]]
+                if not entry[1]:
+                    result["missing"].append(label)
+                elif wildcard_addresses and set(entry[1]) <= wildcard_addresses:
+                    result["wildcard"].append(label)
+                else:
+                    result["resolved"][label] = entry[1]
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        resolver.close()
+
+    result["wildcard_addresses"] = sorted(wildcard_addresses)
+    result["queries"] = resolver.queries
+    # Nameserver unreachable
+    result["unreachable"] = resolver.queries > 0 and resolver.answers == 0
+    return result
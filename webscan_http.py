@@ -0,0 +1,271 @@
+import asyncio
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit, quote
+
+from webscan_common import profile_count
+
+# Native discovery engine settings
+DEFAULT_ENGINE_CONNECTIONS = 50
+DEFAULT_ENGINE_TIMEOUT = 10
+ENGINE_USER_AGENT = "Mozilla/5.0 (compatible; webscan)"
+URL_SAFE_CHARACTERS = "/%:@!$&'()*+,;=~-._"
+
+# AIMD concurrency control per host
+DEFAULT_MAX_CONCURRENCY = 150
+AIMD_WINDOW = 50
+AIMD_DECREASE = 0.5
+AIMD_ERROR_RATE = 0.05
+AIMD_LATENCY_FACTOR = 2.0
+AIMD_BASELINE_DRIFT = 1.1
+AIMD_BACKOFF_STATUS = {429, 503}
+
+class HttpResponse:
+    __slots__ = ("status", "headers", "body", "keep_alive")
+
+    def __init__(self, status, headers, body, keep_alive):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.keep_alive = keep_alive
+
+    @property
+    def words(self):
+        return len(self.body.split())
+
+    @property
+    def lines(self):
+        return self.body.count(b"\n") + 1
+
+class RateLimiter:
+    # Spaces requests evenly at rate per second
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+            return slot - now
+
+class ConcurrencyController:
+    # AIMD limit on the requests in flight to one host, shared by its stages
+    def __init__(self, maximum=DEFAULT_MAX_CONCURRENCY):
+        self.maximum = maximum
+        self.limit = float(maximum)
+        self.users = 0
+        self.latencies = []
+        self.failures = 0
+        self.baseline = None
+        self.p50 = self.p95 = None
+        self.error_rate = 0.0
+        self.backoffs = 0
+        self.lock = threading.Lock()
+
+    def join(self):
+        with self.lock:
+            self.users += 1
+
+    def leave(self):
+        with self.lock:
+            self.users -= 1
+
+    def share(self, users=1):
+        # Floor on the stages to split between
+        return max(1, int(self.limit) // max(users, self.users))
+
+    def record(self, latency):
+        # latency None is a failure or a back-off status
+        with self.lock:
+            if latency is None:
+                self.failures += 1
+            else:
+                self.latencies.append(latency)
+            # Close the window after enough responses or too many failures
+            samples = len(self.latencies) + self.failures
+            window = max(AIMD_WINDOW, self.limit)
+            if samples < window and self.failures <= window * AIMD_ERROR_RATE:
+                return
+
+            latencies = sorted(self.latencies)
+            self.p50 = latencies[len(latencies) // 2] if latencies else None
+            self.p95 = latencies[int(len(latencies) * 0.95)] if latencies else None
+            self.error_rate = self.failures / samples
+            congested = self.error_rate > AIMD_ERROR_RATE
+            if self.p50 is not None:
+                # Let the baseline drift up slowly
+                if self.baseline is not None and self.p50 > self.baseline * AIMD_LATENCY_FACTOR:
+                    congested = True
+                self.baseline = min(self.p50, self.baseline * AIMD_BASELINE_DRIFT) if self.baseline else self.p50
+            if congested:
+                self.limit = max(1.0, self.limit * AIMD_DECREASE)
+                self.backoffs += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1)
+            self.latencies = []
+            self.failures = 0
+
+    def describe(self):
+        latency = f"p50 {self.p50 * 1000:.0f}ms, p95 {self.p95 * 1000:.0f}ms, " if self.p50 is not None else ""
+        return f"limit {int(self.limit)}/{self.maximum}, {latency}{self.error_rate:.1%} errors/429/503, {self.backoffs} backoffs"
+
+class HttpConnectionPool:
+    # Persistent HTTP/1.1 connections to one origin
+    def __init__(self, base_url, size=DEFAULT_ENGINE_CONNECTIONS, timeout=DEFAULT_ENGINE_TIMEOUT, rate_limiter=None, controller=None):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.scheme == "https" else 80)
+        self.host_header = parts.netloc
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(size)
+        self.rate_limiter = rate_limiter
+        self.idle = []
+        self.requests_sent = 0
+        self.errors = 0
+        self.controller = controller
+        self.active = 0
+        self.released = asyncio.Event()
+        if controller:
+            controller.join()
+
+        self.ssl_context = None
+        if self.scheme == "https":
+            self.ssl_context = ssl.create_default_context()
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+
+    async def _connect(self):
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl_context,
+                                    server_hostname=self.host if self.ssl_context else None),
+            self.timeout)
+
+    async def _exchange(self, reader, writer, method, path, headers):
+        request_headers = {"Host": self.host_header, "User-Agent": ENGINE_USER_AGENT, "Accept": "*/*", "Connection": "keep-alive"}
+        request_headers.update(headers or {})
+        request = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{name}: {value}\r\n" for name, value in request_headers.items()) + "\r\n"
+        writer.write(request.encode("latin-1"))
+        await writer.drain()
+
+        head = await reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head[:-4].decode("latin-1").split("\r\n")
+        version, status = status_line.split(" ", 2)[:2]
+        status = int(status)
+        response_headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        connection_header = response_headers.get("connection", "").lower()
+        keep_alive = connection_header != "close" if version == "HTTP/1.1" else connection_header == "keep-alive"
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif "chunked" in response_headers.get("transfer-encoding", "").lower():
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in response_headers:
+            body = await reader.readexactly(int(response_headers["content-length"]))
+        else:
+            body = await reader.read()
+            keep_alive = False
+
+        return HttpResponse(status, response_headers, body, keep_alive)
+
+    async def request(self, path, method="GET", headers=None):
+        async with self.slots:
+            if self.controller:
+                while self.active >= self.controller.share():
+                    self.released.clear()
+                    await self.released.wait()
+            if self.rate_limiter:
+                delay = self.rate_limiter.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.active += 1
+            started = time.monotonic()
+            try:
+                response = await self._send(path, method, headers)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                if self.controller:
+                    self.controller.record(None)
+                raise
+            finally:
+                self.active -= 1
+                self.released.set()
+            if self.controller:
+                self.controller.record(None if response.status in AIMD_BACKOFF_STATUS else time.monotonic() - started)
+            return response
+
+    async def _send(self, path, method, headers):
+        # Retry once on a fresh connection
+        for attempt in range(2):
+            reused = bool(self.idle)
+            reader, writer = self.idle.pop() if reused else await self._connect()
+            try:
+                self.requests_sent += 1
+                response = await asyncio.wait_for(self._exchange(reader, writer, method, path, headers), self.timeout)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                writer.close()
+                if reused and attempt == 0:
+                    continue
+                self.errors += 1
+                raise
+            if response.keep_alive:
+                self.idle.append((reader, writer))
+            else:
+                writer.close()
+            return response
+
+    async def close(self):
+        while self.idle:
+            _, writer = self.idle.pop()
+            writer.close()
+        profile_count("requests", self.requests_sent)
+        if self.controller:
+            self.controller.leave()
+            self.controller = None
+
+async def fuzz_paths(base_url, words, on_response, connections=DEFAULT_ENGINE_CONNECTIONS, timeout=DEFAULT_ENGINE_TIMEOUT, start=0, on_progress=None, rate=None, controller=None):
+    # on_progress returning True stops the run
+    pool = HttpConnectionPool(base_url, connections, timeout, RateLimiter(rate) if rate else None, controller)
+    base_path = urlsplit(base_url).path.rstrip('/')
+    words = enumerate(words, start)
+    in_flight = set()
+    next_index = start
+
+    async def worker():
+        nonlocal next_index
+        for index, word in words:
+            in_flight.add(index)
+            next_index = index + 1
+            path = f"{base_path}/{quote(word, safe=URL_SAFE_CHARACTERS)}"
+            try:
+                response = await pool.request(path)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                response = None
+            in_flight.discard(index)
+            if response:
+                on_response(word, path, response)
+            if on_progress and on_progress(min(in_flight) if in_flight else next_index):
+                return
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(connections)))
+    finally:
+        await pool.close()
+
+    return pool.requests_sent, pool.errors
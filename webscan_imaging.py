@@ -0,0 +1,159 @@
+import os
+import struct
+import zlib
+
+# PNG difference hash settings
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+DHASH_SIZE = (9, 8)
+DHASH_SAMPLES = 32
+DHASH_MARGIN = 2
+DHASH_DISTANCE = 4
+
+def png_dhash(path):
+    # Difference hash of a non-interlaced 8-bit PNG, or None
+    with open(path, 'rb') as png:
+        if png.read(8) != PNG_SIGNATURE:
+            return None
+        decompressor = zlib.decompressobj()
+        pending = bytearray()
+        previous = None
+        held = None
+        palette = None
+        row = 0
+        while True:
+            header = png.read(8)
+            if len(header) < 8:
+                return None
+            length, kind = struct.unpack(">I4s", header)
+            data = png.read(length)
+            png.read(4)
+
+            if kind == b"IHDR":
+                width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", data)
+                if depth != 8 or interlace or color_type not in PNG_CHANNELS or not width or not height:
+                    return None
+                channels = PNG_CHANNELS[color_type]
+                stride = width * channels
+                row_step = max(1, height // (DHASH_SIZE[1] * DHASH_SAMPLES))
+                columns = range(0, width, max(1, width // (DHASH_SIZE[0] * DHASH_SAMPLES)))
+                offsets = [column * channels for column in columns]
+                cell_columns = [column * DHASH_SIZE[0] // width for column in columns]
+                sums = [0] * (DHASH_SIZE[0] * DHASH_SIZE[1])
+                counts = [0] * (DHASH_SIZE[0] * DHASH_SIZE[1])
+            elif kind == b"PLTE":
+                palette = [sum(data[index:index + 3]) // 3 for index in range(0, len(data), 3)]
+            elif kind == b"IDAT":
+                pending += decompressor.decompress(data)
+                while len(pending) > stride and row < height:
+                    filter_type, raw = pending[0], bytes(pending[1:stride + 1])
+                    del pending[:stride + 1]
+                    # Up, Average and Paeth need the previous scanline
+                    if held and filter_type >= 2:
+                        previous = unfilter_scanline(*held, previous, channels)
+                    elif held:
+                        previous = None
+                    held = None
+                    if row % row_step:
+                        held = (filter_type, raw)
+                        row += 1
+                        continue
+                    line = previous = unfilter_scanline(filter_type, raw, previous, channels)
+                    if color_type == 3:
+                        if palette is None:
+                            return None
+                        grey = [palette[line[offset]] if line[offset] < len(palette) else 0 for offset in offsets]
+                    elif channels >= 3:
+                        grey = [(line[offset] + line[offset + 1] + line[offset + 2]) // 3 for offset in offsets]
+                    else:
+                        grey = [line[offset] for offset in offsets]
+                    base = row * DHASH_SIZE[1] // height * DHASH_SIZE[0]
+                    for column, value in zip(cell_columns, grey):
+                        sums[base + column] += value
+                        counts[base + column] += 1
+                    row += 1
+            elif kind == b"IEND":
+                break
+
+    if row < height:
+        return None
+    cells = [total / count if count else 0 for total, count in zip(sums, counts)]
+    bits = 0
+    for y in range(DHASH_SIZE[1]):
+        for x in range(DHASH_SIZE[0] - 1):
+            index = y * DHASH_SIZE[0] + x
+            bits = (bits << 1) | (cells[index] > cells[index + 1] + DHASH_MARGIN)
+    return bits
+
+def add_scanlines(first, second):
+    # Bytewise sum modulo 256 of two scanlines, as integers
+    length = len(first)
+    low, high = int.from_bytes(b"\x7f" * length, "little"), int.from_bytes(b"\x80" * length, "little")
+    first, second = int.from_bytes(first, "little"), int.from_bytes(second, "little")
+    return (((first & low) + (second & low)) ^ ((first ^ second) & high)).to_bytes(length, "little")
+
+def unfilter_scanline(filter_type, raw, previous, bpp):
+    if filter_type == 0:
+        return raw
+    if previous is None:
+        previous = bytes(len(raw))
+    if filter_type == 1:
+        line = raw
+        distance = bpp
+        while distance < len(line):
+            line = add_scanlines(line, bytes(distance) + line[:-distance])
+            distance *= 2
+        return line
+    if filter_type == 2:
+        return add_scanlines(raw, previous)
+    # Average and Paeth go byte by byte
+    line = bytearray(raw)
+    for index in range(bpp):
+        line[index] = (line[index] + (previous[index] >> 1 if filter_type == 3 else previous[index])) & 0xFF
+    if filter_type == 3:
+        for index in range(bpp, len(line)):
+            line[index] = (line[index] + ((line[index - bpp] + previous[index]) >> 1)) & 0xFF
+    elif filter_type == 4:
+        for index in range(bpp, len(line)):
+            left = line[index - bpp]
+            above = previous[index]
+            upper_left = previous[index - bpp]
+            distance_left = abs(above - upper_left)
+            distance_above = abs(left - upper_left)
+            distance_upper_left = abs(left + above - 2 * upper_left)
+            if distance_left <= distance_above and distance_left <= distance_upper_left:
+                predictor = left
+            elif distance_above <= distance_upper_left:
+                predictor = above
+            else:
+                predictor = upper_left
+            line[index] = (line[index] + predictor) & 0xFF
+    return line
+
+class ScreenClusters:
+    # Group screenshots within DHASH_DISTANCE bits
+    def __init__(self):
+        self.representatives = []
+        self.members = {}
+
+    def add(self, path):
+        name = os.path.basename(path)
+        try:
+            digest = png_dhash(path)
+        except (OSError, zlib.error, struct.error):
+            digest = None
+        if digest is not None:
+            for representative, representative_digest in self.representatives:
+                if bin(digest ^ representative_digest).count("1") <= DHASH_DISTANCE:
+                    self.members[representative].append(name)
+                    return False
+            self.representatives.append((name, digest))
+        self.members.setdefault(name, [])
+        return True
+
+    def write(self, path):
+        with open(path, 'w') as index:
+            for representative, duplicates in self.members.items():
+                index.write(f"- {representative}\n")
+                for duplicate in duplicates:
+                    index.write(f"    - {duplicate}\n")
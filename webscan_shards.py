@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import time
+
+from webscan_common import hash_file
+
+# Shard size (bytes) and lease (seconds)
+DEFAULT_SHARD_SIZE = 64 * 1024
+SHARD_LEASE_SECONDS = 60
+
+def open_shard_queue(path):
+    # Autocommit; transactions are explicit
+    connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, url TEXT, wordlist TEXT, digest TEXT, done INTEGER DEFAULT 0);
+        CREATE TABLE IF NOT EXISTS shards (id INTEGER PRIMARY KEY, job INTEGER, start INTEGER, end INTEGER, position INTEGER,
+                                           status TEXT DEFAULT 'pending', worker TEXT, lease_until REAL DEFAULT 0);
+        CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY, job INTEGER, shard INTEGER, word TEXT, hit TEXT);
+        CREATE INDEX IF NOT EXISTS shards_status ON shards (status, lease_until);
+        CREATE INDEX IF NOT EXISTS results_job ON results (job, id);
+        CREATE UNIQUE INDEX IF NOT EXISTS results_word ON results (job, word);
+    """)
+    return connection
+
+def split_wordlist(path, shard_size):
+    # Byte ranges ending on line boundaries
+    size = os.path.getsize(path)
+    start = 0
+    with open(path, 'rb') as wordlist:
+        while start < size:
+            wordlist.seek(min(start + shard_size, size))
+            wordlist.readline()
+            end = min(wordlist.tell(), size)
+            yield start, end
+            start = end
+
+def read_shard(path, position, end):
+    # Words of a byte range and their offsets
+    starts, words = [], []
+    with open(path, 'rb') as wordlist:
+        wordlist.seek(position)
+        while wordlist.tell() < end:
+            start = wordlist.tell()
+            word = wordlist.readline().decode(errors='ignore').strip()
+            if word and not word.startswith('#'):
+                starts.append(start)
+                words.append(word)
+    return starts, words
+
+def create_shard_job(connection, url, wordlist, shard_size):
+    connection.execute("BEGIN IMMEDIATE")
+    job = connection.execute("INSERT INTO jobs (url, wordlist, digest) VALUES (?, ?, ?)", (url, wordlist, hash_file(wordlist))).lastrowid
+    connection.executemany("INSERT INTO shards (job, start, end, position) VALUES (?, ?, ?, ?)",
+                           ((job, start, end, start) for start, end in split_wordlist(wordlist, shard_size)))
+    connection.execute("COMMIT")
+    return job
+
+def claim_shard(connection, worker, skip_jobs=()):
+    # Pending shards first, then expired leases
+    now = time.time()
+    skip_jobs = sorted(skip_jobs)
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        row = connection.execute(f"""
+            SELECT shards.id, shards.job, shards.position, shards.end, jobs.url, jobs.wordlist, jobs.digest
+            FROM shards JOIN jobs ON jobs.id = shards.job
+            WHERE jobs.done = 0 AND (shards.status = 'pending' OR (shards.status = 'claimed' AND shards.lease_until < ?))
+            AND jobs.id NOT IN ({', '.join('?' * len(skip_jobs))})
+            ORDER BY shards.id LIMIT 1""", (now, *skip_jobs)).fetchone()
+        if row:
+            connection.execute("UPDATE shards SET status = 'claimed', worker = ?, lease_until = ? WHERE id = ?",
+                               (worker, now + SHARD_LEASE_SECONDS, row[0]))
+        connection.execute("COMMIT")
+    except sqlite3.Error:
+        connection.execute("ROLLBACK")
+        raise
+    return row
+
+def flush_shard(connection, shard, job, worker, position, results, status='claimed'):
+    # Commit results and position together; repeated hits are dropped
+    connection.execute("BEGIN IMMEDIATE")
+    updated = connection.execute("UPDATE shards SET position = ?, status = ?, lease_until = ? WHERE id = ? AND worker = ?",
+                                 (position, status, time.time() + SHARD_LEASE_SECONDS, shard, worker)).rowcount
+    if updated:
+        connection.executemany("INSERT OR IGNORE INTO results (job, shard, word, hit) VALUES (?, ?, ?, ?)",
+                               ((job, shard, word, hit.to_json()) for word, hit in results))
+    connection.execute("COMMIT")
+    results.clear()
+    return bool(updated)
+
+class ShardLost(Exception):
+    pass